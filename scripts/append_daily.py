@@ -0,0 +1,342 @@
+import sys
+import zipfile
+import pandas as pd
+from scripts import (
+    build_equity_master,
+    build_index_master,
+    merge_bhavcopy,
+    merge_index,
+    raw_archive,
+    store,
+)
+from scripts.bhavcopy_reader import collect_sources
+from scripts.config import BASE_DIR, METADATA_DIR
+from scripts.logger import get_logger, setup_logging
+from scripts.manifest import read_json, write_json
+from scripts.securities import add_security_ids
+
+logger = get_logger("append_daily")
+
+# Trading dates already present in the processed store, per dataset
+INGESTED_FILE = METADATA_DIR / "ingested_dates.json"
+
+EQUITY_DIR = BASE_DIR / "data" / "processed" / "equity"
+INDEX_DIR = BASE_DIR / "data" / "processed" / "index"
+
+DATASETS = {
+    "equity": {
+        "dir": EQUITY_DIR,
+        "yearly_name": "nse_{year}.csv",
+        "yearly_glob": "nse_*.csv",
+        "master_prefix": "nse_master_",
+        "build_master": build_equity_master.build_master,
+        "keys": ["symbol", "trade_date"],
+    },
+    "index": {
+        "dir": INDEX_DIR,
+        "yearly_name": "nifty50_index_{year}.csv",
+        "yearly_glob": "nifty50_index_*.csv",
+        "master_prefix": "nifty50_index_master_",
+        "build_master": build_index_master.build_master,
+        "keys": ["trade_date"],
+    },
+}
+
+
+# -----------------------------------------
+# Manifest of ingested dates
+# -----------------------------------------
+def load_ingested(dataset):
+    """
+    ISO dates already ingested for a dataset. The first run seeds the
+    manifest from the trade_date column of the existing yearly files.
+    """
+    manifest = read_json(INGESTED_FILE)
+
+    if dataset in manifest:
+        return set(manifest[dataset])
+
+    cfg = DATASETS[dataset]
+    dates = set()
+
+    for file in (cfg["dir"] / "yearly").glob(cfg["yearly_glob"]):
+        trade_dates = pd.read_csv(file, usecols=["trade_date"])["trade_date"]
+        dates.update(trade_dates.astype(str).str[:10].unique())
+
+    logger.info(f"Seeded {dataset} manifest with {len(dates)} dates.")
+    return dates
+
+
+def save_ingested(dataset, dates):
+    manifest = read_json(INGESTED_FILE)
+    manifest[dataset] = sorted(dates)
+    write_json(INGESTED_FILE, manifest)
+
+
+# -----------------------------------------
+# Daily sources
+# -----------------------------------------
+def list_sources(dataset):
+    """
+    (trade_date, source) for every daily raw file of a dataset.
+    """
+    if dataset == "equity":
+        files = collect_sources().items()
+        parse = merge_bhavcopy.extract_date_from_filename
+    else:
+        files = raw_archive.sources("index").items()
+        parse = merge_index.extract_date_from_filename
+
+    sources = []
+    for name, source in files:
+        try:
+            sources.append((parse(name), source))
+        except ValueError:
+            logger.warning(f"Unknown filename format: {name}")
+
+    return sources
+
+
+def load_daily(dataset, source, trade_date):
+    if dataset == "equity":
+        return merge_bhavcopy.load_daily(source, trade_date)
+
+    df = merge_index.load_daily(source, trade_date)
+
+    if df is None or df.empty:
+        return None
+
+    return merge_index.clean_columns(df)
+
+
+# -----------------------------------------
+# Upsert into CSV stores
+# -----------------------------------------
+def upsert_csv(path, new_df, keys, replace):
+    """
+    Append new_df to a CSV. Only when replace is set (re-ingested
+    dates) is the file rewritten, dropping rows with matching keys.
+    """
+    if not path.exists():
+        new_df.to_csv(path, index=False)
+        return
+
+    # Follow the column order of the existing file
+    header = pd.read_csv(path, nrows=0).columns
+    new_df = new_df[list(header)]
+
+    if not replace:
+        new_df.to_csv(path, mode="a", header=False, index=False)
+        return
+
+    existing = pd.read_csv(path, parse_dates=["trade_date"])
+
+    replaced = existing.set_index(keys).index.isin(
+        new_df.set_index(keys).index
+    )
+
+    merged = pd.concat([existing[~replaced], new_df], ignore_index=True)
+    merged = merged.sort_values("trade_date", kind="stable")
+
+    merged.to_csv(path, index=False)
+
+
+def extend_year_range(path, prefix, new_df):
+    """
+    Rename a master whose year range the new rows extend (rename is
+    O(1), also for a Parquet master directory).
+    """
+    start_year, end_year = path.name[len(prefix):].split(".")[0].split("_")
+    new_end_year = max(int(end_year), int(new_df["trade_date"].dt.year.max()))
+
+    if new_end_year == int(end_year):
+        return path
+
+    renamed = path.with_name(f"{prefix}{start_year}_{new_end_year}{path.suffix}")
+    logger.info(f"Master renamed to: {renamed.name}")
+    return path.rename(renamed)
+
+
+def update_master(cfg, new_df, replace):
+    master_dir = cfg["dir"] / "master"
+    prefix = cfg["master_prefix"]
+
+    masters = sorted(master_dir.glob(f"{prefix}*.csv"))
+
+    if not masters:
+        # CSV master is an optional export of the master build
+        logger.info("No CSV master export found, skipped.")
+        return
+
+    master_path = extend_year_range(masters[-1], prefix, new_df)
+
+    upsert_csv(master_path, new_df, cfg["keys"], replace)
+
+
+def update_parquet_master(cfg, new_df, replace):
+    """
+    Add the new rows to the Parquet master as sections of their own;
+    the rows already in the master are not read. A single-file master
+    (older layout) is rebuilt once into yearly sections.
+    """
+    parquet_dir = cfg["dir"] / "parquet"
+    prefix = cfg["master_prefix"]
+
+    masters = sorted(parquet_dir.glob(f"{prefix}*.parquet"))
+
+    if not masters:
+        logger.info("No Parquet master found, skipped.")
+        return
+
+    if masters[-1].is_file():
+        logger.info(f"{masters[-1].name} is a single file, rebuilding it in yearly sections.")
+        cfg["build_master"]()
+
+        for path in masters:
+            if path.is_file():
+                path.unlink()
+        return
+
+    master_path = extend_year_range(masters[-1], prefix, new_df)
+
+    store.append_master(master_path, new_df, cfg["keys"], replace)
+
+
+# -----------------------------------------
+# Long-format index store
+# -----------------------------------------
+def append_index_long(pending):
+    """
+    Upsert every kept index of the pending daily files into the
+    long-format store (only built by merge_index --all-indices).
+    """
+    frames = []
+
+    for trade_date, source in pending:
+        try:
+            df = merge_index.load_indices(source, trade_date)
+
+            if df is not None:
+                frames.append(merge_index.long_rows(df))
+
+        except Exception as e:
+            logger.error(f"Error processing {source.name} - {e}")
+
+    if frames:
+        store.upsert_dataset("index_long", pd.concat(frames, ignore_index=True))
+
+
+# -----------------------------------------
+# Incremental append
+# -----------------------------------------
+def append_dataset(dataset, reingest=()):
+    """
+    Normalize only the daily files whose dates are not ingested yet
+    (plus any dates listed in reingest) and upsert them into the
+    yearly and master stores. Returns the number of dates added.
+    """
+    cfg = DATASETS[dataset]
+    keys = cfg["keys"]
+    reingest = set(reingest)
+
+    # New rows carry security ids: so must the yearly files they join
+    if dataset == "equity":
+        merge_bhavcopy.backfill_security_ids()
+
+    ingested = load_ingested(dataset)
+
+    pending = [
+        (trade_date, source)
+        for trade_date, source in list_sources(dataset)
+        if trade_date.strftime("%Y-%m-%d") not in ingested
+        or trade_date.strftime("%Y-%m-%d") in reingest
+    ]
+
+    if not pending:
+        logger.info(f"{dataset}: already up to date.")
+        save_ingested(dataset, ingested)
+        return 0
+
+    frames = []
+
+    # Every file read counts as ingested, with or without rows (an
+    # index file without NIFTY 50 is not read again); files that
+    # failed to read are retried on the next run
+    read_dates = set()
+
+    for trade_date, source in sorted(pending, key=lambda item: item[0]):
+        try:
+            df = load_daily(dataset, source, trade_date)
+            read_dates.add(trade_date.strftime("%Y-%m-%d"))
+
+            if df is None:
+                logger.warning(f"No usable rows in {source.name}")
+                continue
+
+            frames.append(df)
+
+        except zipfile.BadZipFile:
+            logger.error(f"Corrupt ZIP file: {source.name}")
+
+        except Exception as e:
+            logger.error(f"Error processing {source.name} - {e}")
+
+    if not frames:
+        logger.warning(f"{dataset}: no new rows to append.")
+        save_ingested(dataset, ingested | read_dates)
+        return 0
+
+    new_df = pd.concat(frames, ignore_index=True)
+    new_df = new_df.drop_duplicates(subset=keys, keep="last")
+
+    if dataset == "equity":
+        new_df = add_security_ids(new_df)
+
+    new_dates = set(new_df["trade_date"].dt.strftime("%Y-%m-%d"))
+    replaced_dates = new_dates & ingested
+
+    yearly_dir = cfg["dir"] / "yearly"
+    yearly_dir.mkdir(parents=True, exist_ok=True)
+
+    years = new_df["trade_date"].dt.year
+
+    for year, year_df in new_df.groupby(years):
+        year_dates = set(year_df["trade_date"].dt.strftime("%Y-%m-%d"))
+
+        upsert_csv(
+            yearly_dir / cfg["yearly_name"].format(year=year),
+            year_df,
+            keys,
+            replace=bool(year_dates & replaced_dates)
+        )
+
+    update_master(cfg, new_df, replace=bool(replaced_dates))
+    update_parquet_master(cfg, new_df, replace=bool(replaced_dates))
+
+    # Partitioned store: only the partitions holding new dates are rewritten
+    if store.DATASETS[dataset]["root"].exists():
+        store.upsert_dataset(dataset, new_df)
+
+    if dataset == "index" and store.DATASETS["index_long"]["root"].exists():
+        append_index_long(pending)
+
+    save_ingested(dataset, ingested | read_dates | new_dates)
+
+    logger.info(
+        f"{dataset}: appended {len(new_dates - replaced_dates)} new dates, "
+        f"re-ingested {len(replaced_dates)}, {len(new_df)} rows."
+    )
+    return len(new_dates)
+
+
+def main():
+    setup_logging()
+    # Optional YYYY-MM-DD arguments force those dates to be re-ingested
+    reingest = sys.argv[1:]
+
+    for dataset in DATASETS:
+        append_dataset(dataset, reingest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+import itertools
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scripts import feature_cache, panel
+from scripts.config import PROCESSED_DIR
+from scripts.cross_section import average_ranks, sort_rows, unsort
+from scripts.logger import get_logger, log_queue, setup_logging, timed, worker_logging
+
+logger = get_logger("backtest")
+
+# -----------------------------------------
+# Vectorized factor backtest on the (trade_date x symbol) panel
+#   python -m scripts.backtest [START END] [--factor F] [--top-n N | --quantile Q]
+#                              [--rebalance DAYS] [--long-only] [--ascending]
+#   python -m scripts.backtest [START END] --sweep [--processes N]
+#
+# Every step is a whole-grid array operation: the factor is ranked
+# per date (cross_section kernels), members of the top / bottom
+# bucket get equal weights on rebalance dates, weights are carried
+# forward between rebalances, and the daily P&L is the row sum of
+# held weights times the next day's returns. Weights are target
+# weights held constant between rebalances (drift is not
+# simulated).
+#
+# Timing: the factor at close t is traded lag days later at that
+# close and earns returns from the day after. Costs on each trade are
+# cost_bps plus square-root slippage impact * sqrt(notional /
+# tottrdval), with notional = capital * |weight change| and the
+# symbol's last traded value that day.
+#
+# Factors come from the equity feature store, so only the rows of
+# its liquid screen can be selected.
+# -----------------------------------------
+SWEEP_FILE = PROCESSED_DIR / "backtest" / "sweep.csv"
+
+TRADING_DAYS = 252
+
+DEFAULTS = {
+    "factor": "rank_pct",
+    "ascending": None,        # True: lower values are better; None: FACTOR_ASCENDING
+    "top_n": None,            # names per side; overrides quantile
+    "quantile": 0.1,          # share of the date's ranked names per side
+    "long_short": True,       # False: long-only
+    "rebalance_days": 5,
+    "lag": 1,
+    "cost_bps": 10.0,
+    "impact": 0.1,
+    "capital": 1e7,
+}
+
+# Direction of the feature-store factors whose best values are the
+# lowest (rank_momentum: 1 = strongest). Every other factor goes long
+# its highest values.
+FACTOR_ASCENDING = {
+    "rank_momentum": True,
+}
+
+# Default sweep: 3 factors x 5 buckets x 4 frequencies x 2 books x 2 lags.
+# rank_pct / rank_momentum rank return_20d per date, so they would
+# select the same books as return_20d: not swept alongside it.
+SWEEP_GRID = {
+    "factor": ["return_20d", "return_5d", "relative_strength"],
+    "quantile": [0.05, 0.1, 0.2, 0.3, 0.5],
+    "rebalance_days": [1, 5, 10, 21],
+    "long_short": [True, False],
+    "lag": [0, 1],
+}
+
+
+# -----------------------------------------
+# Grids (built once per process and window)
+# -----------------------------------------
+_grids = {}
+
+
+def forward_fill(grid):
+    """
+    Last non-NaN value down every column (NaN before the first).
+    """
+    rows = np.where(np.isnan(grid), 0, np.arange(len(grid))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+
+    filled = np.take_along_axis(grid, rows, axis=0)
+    filled[np.isnan(grid[0]) & (rows == 0)] = np.nan
+    return filled
+
+
+def market_grids(start=None, end=None):
+    """
+    {"dates", "symbols", "returns", "value"} for the window: daily
+    returns (0 where a symbol did not trade) and the last traded
+    value, both float64 (dates, symbols).
+
+    Returns are close / prevclose - 1 on traded days: NSE adjusts
+    prevclose for splits and bonus issues on the ex-date, where raw
+    close-to-close returns would show a fake loss.
+    """
+    key = (start, end)
+
+    if key not in _grids:
+        data = panel.load_panel(["close", "prevclose", "tottrdval"])
+        rows = panel.date_positions(data, start, end)
+
+        close = np.asarray(data["close"][rows], dtype=np.float64)
+        prevclose = np.asarray(data["prevclose"][rows], dtype=np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = close / prevclose - 1
+        returns[~np.isfinite(returns)] = 0.0
+
+        _grids[key] = {
+            "dates": data["dates"][rows],
+            "symbols": data["symbols"],
+            "returns": returns,
+            "value": forward_fill(np.asarray(data["tottrdval"][rows], dtype=np.float64)),
+            "factors": {},
+        }
+
+    return _grids[key]
+
+
+def factor_grid(grids, factor):
+    """
+    One feature-store column laid out on the panel's axes (NaN where
+    the store has no row: outside the liquid screen).
+    """
+    if factor not in grids["factors"]:
+        dates = grids["dates"]
+
+        rows = feature_cache.load(
+            "equity_features", start=str(dates[0]), end=str(dates[-1]),
+            columns=["symbol", "trade_date", factor],
+        )
+
+        symbols = rows["symbol"].astype(str).to_numpy()
+        axis = grids["symbols"]
+
+        date_index = np.searchsorted(dates, rows["trade_date"].to_numpy(dtype="datetime64[D]"))
+        symbol_index = np.searchsorted(axis, symbols).clip(max=len(axis) - 1)
+
+        inside = (axis[symbol_index] == symbols) & (date_index < len(dates))
+
+        grid = np.full((len(dates), len(grids["symbols"])), np.nan)
+        grid[date_index[inside], symbol_index[inside]] = rows[factor].to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )[inside]
+
+        grids["factors"][factor] = grid
+
+    return grids["factors"][factor]
+
+
+# -----------------------------------------
+# Simulation
+# -----------------------------------------
+def target_weights(factor, config):
+    """
+    Equal-weight books of one factor grid (rows = rebalance dates):
+    long the best bucket (weights sum to 1) and, long/short, short
+    the worst (sum to -1).
+    """
+    order, counts, tied = sort_rows(factor)
+    ranks = average_ranks(counts, tied, factor.shape)
+    ranks = unsort(ranks, order, factor.size).reshape(factor.shape)
+    ranks[np.isnan(factor)] = np.nan
+
+    # 1 = best
+    best = ranks if config["ascending"] else counts[:, None] + 1 - ranks
+
+    if config["top_n"] is not None:
+        size = np.minimum(config["top_n"], counts)
+    else:
+        size = np.ceil(config["quantile"] * counts)
+
+    size = size[:, None]
+    longs = best <= size
+    weights = longs / np.maximum(longs.sum(axis=1), 1)[:, None]
+
+    if config["long_short"]:
+        shorts = (best > counts[:, None] - size) & ~longs
+        weights -= shorts / np.maximum(shorts.sum(axis=1), 1)[:, None]
+
+    return weights
+
+
+def resolve(config):
+    """
+    config over DEFAULTS, with the factor's direction filled in from
+    FACTOR_ASCENDING unless ascending is given.
+    """
+    config = {**DEFAULTS, **config}
+
+    if config["ascending"] is None:
+        config["ascending"] = FACTOR_ASCENDING.get(config["factor"], False)
+
+    return config
+
+
+def simulate(grids, config):
+    """
+    Daily results of one configuration: DataFrame on trade_date with
+    gross, cost, net, turnover, equity and drawdown.
+    """
+    config = resolve(config)
+
+    factor = factor_grid(grids, config["factor"])
+    days = len(factor)
+
+    # Rebalance rows and the weights held on every row
+    rebalances = np.arange(0, days, config["rebalance_days"])
+    targets = target_weights(factor[rebalances], config)
+
+    held_index = np.repeat(np.arange(len(rebalances)), np.diff(np.append(rebalances, days)))
+    held = targets[held_index]
+
+    lag = config["lag"]
+    if lag:
+        held = np.vstack([np.zeros((lag, held.shape[1])), held[:-lag]])
+
+    trades = np.abs(np.diff(held, axis=0, prepend=0.0))
+    turnover = trades.sum(axis=1)
+
+    # Trades happen on a few rows only: cost just those
+    cost = np.zeros(days)
+    traded = np.flatnonzero(turnover)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        size = trades[traded]
+        participation = config["capital"] * size / grids["value"][traded]
+        participation[~np.isfinite(participation)] = 0.0
+
+        rate = config["cost_bps"] / 1e4 + config["impact"] * np.sqrt(participation)
+        cost[traded] = (size * rate).sum(axis=1)
+
+    gross = np.zeros(days)
+    gross[1:] = (held[:-1] * grids["returns"][1:]).sum(axis=1)
+
+    net = gross - cost
+    equity = np.cumprod(1 + net)
+
+    return pd.DataFrame({
+        "gross": gross,
+        "cost": cost,
+        "net": net,
+        "turnover": turnover,
+        "equity": equity,
+        "drawdown": equity / np.maximum.accumulate(equity) - 1,
+    }, index=pd.DatetimeIndex(grids["dates"], name="trade_date"))
+
+
+def summarize(daily):
+    """
+    Headline statistics of simulate()'s daily results.
+    """
+    net = daily["net"]
+    years = len(daily) / TRADING_DAYS
+    final = daily["equity"].iloc[-1] if len(daily) else 1.0
+
+    std = net.std()
+
+    return {
+        "days": len(daily),
+        "total_return": final - 1,
+        "cagr": final ** (1 / years) - 1 if years > 0 and final > 0 else np.nan,
+        "volatility": std * math.sqrt(TRADING_DAYS),
+        "sharpe": net.mean() / std * math.sqrt(TRADING_DAYS) if std > 0 else np.nan,
+        "max_drawdown": daily["drawdown"].min(),
+        "annual_turnover": daily["turnover"].mean() * TRADING_DAYS,
+        "cost_drag": daily["cost"].sum(),
+    }
+
+
+@timed("backtest")
+def run_backtest(config=None, start=None, end=None):
+    """
+    (daily results, summary) of one configuration (see DEFAULTS).
+    """
+    daily = simulate(market_grids(start, end), config or {})
+    return daily, summarize(daily)
+
+
+# -----------------------------------------
+# Parameter sweep
+# -----------------------------------------
+def parameter_grid(**options):
+    """
+    Every combination of the option lists, e.g.
+    parameter_grid(quantile=[0.1, 0.2], rebalance_days=[5, 21]).
+    """
+    names = list(options)
+    return [dict(zip(names, values)) for values in itertools.product(*options.values())]
+
+
+def _sweep_task(task):
+    config, start, end = task
+    config = resolve(config)
+    return {**config, **summarize(simulate(market_grids(start, end), config))}
+
+
+@timed("backtest_sweep")
+def sweep(configs, start=None, end=None, processes=None):
+    """
+    Summary of every configuration, one row each, best Sharpe first.
+    The grids are built here before the pool starts: forked workers
+    share them copy-on-write, spawned ones build them once each.
+    """
+    grids = market_grids(start, end)
+    for factor in {config.get("factor", DEFAULTS["factor"]) for config in configs}:
+        factor_grid(grids, factor)
+
+    tasks = [(config, start, end) for config in configs]
+    processes = processes or os.cpu_count()
+
+    if processes == 1:
+        rows = [_sweep_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=worker_logging, initargs=(log_queue(),)
+        ) as pool:
+            rows = list(pool.map(
+                _sweep_task, tasks, chunksize=max(1, len(tasks) // (processes * 4))
+            ))
+
+    logger.info(f"Sweep: {len(rows)} configurations")
+    return pd.DataFrame(rows).sort_values("sharpe", ascending=False, ignore_index=True)
+
+
+def main():
+    setup_logging()
+    args = sys.argv[1:]
+
+    options = {"--factor", "--top-n", "--quantile", "--rebalance", "--processes"}
+    positional = [
+        arg for i, arg in enumerate(args)
+        if not arg.startswith("--") and (i == 0 or args[i - 1] not in options)
+    ]
+    start, end = positional[:2] if len(positional) >= 2 else (None, None)
+
+    def option(name, cast):
+        return cast(args[args.index(name) + 1]) if name in args else None
+
+    if "--sweep" in args:
+        results = sweep(parameter_grid(**SWEEP_GRID), start, end, option("--processes", int))
+
+        SWEEP_FILE.parent.mkdir(parents=True, exist_ok=True)
+        results.to_csv(SWEEP_FILE, index=False)
+
+        print(results.head(10).to_string(index=False))
+        print(f"\n{len(results)} configurations -> {SWEEP_FILE}")
+        return
+
+    config = {
+        name: value for name, value in {
+            "factor": option("--factor", str),
+            "top_n": option("--top-n", int),
+            "quantile": option("--quantile", float),
+            "rebalance_days": option("--rebalance", int),
+        }.items()
+        if value is not None
+    }
+    if "--long-only" in args:
+        config["long_short"] = False
+    if "--ascending" in args:
+        config["ascending"] = True
+
+    config = resolve(config)
+    logger.info(
+        f"Backtest {config['factor']}: long the "
+        f"{'lowest' if config['ascending'] else 'highest'} values"
+    )
+
+    _, summary = run_backtest(config, start, end)
+
+    for name, value in summary.items():
+        print(f"{name:<16}{value:.4f}" if isinstance(value, float) else f"{name:<16}{value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from scripts.config import PROJECT_DIR
+from scripts.logger import cpu_seconds, get_logger, peak_rss_mb, setup_logging
+from scripts.manifest import read_json, write_json
+
+logger = get_logger("benchmark")
+
+# -----------------------------------------
+# Stage benchmark on synthetic data
+#   python -m scripts.benchmark                       (2022-2024, 500 symbols)
+#   python -m scripts.benchmark 2015 2024 --symbols 2000 --seed 1
+#   python -m scripts.benchmark ... --home DIR        (keep the tree in DIR)
+#   python -m scripts.benchmark ... --no-save         (do not record the run)
+#
+# The synthetic tree is generated once, then every stage runs in its
+# own child process with NSE_PIPELINE_HOME pointing at the tree, so
+# peak RSS is per stage and no stage inherits another's caches. Runs
+# are appended to benchmarks/history.json (committed), and each run
+# is compared with the last one recorded for the same parameters on
+# the same machine (MACHINE_FIELDS).
+# -----------------------------------------
+HISTORY_FILE = PROJECT_DIR / "benchmarks" / "history.json"
+
+# Flag a stage whose wall time grew by more than this
+REGRESSION_PCT = 25.0
+
+# Runs are only compared on the same machine: wall times from another
+# CPU count or platform are not a regression signal
+MACHINE_FIELDS = ("cpus", "platform")
+
+DEFAULT_YEARS = (2022, 2024)
+DEFAULT_SYMBOLS = 500
+
+
+# -----------------------------------------
+# Stages (run inside the child process)
+# Imports are deferred so config picks up NSE_PIPELINE_HOME.
+# -----------------------------------------
+def stage_extract(start_year, end_year):
+    from scripts import extract_bhavcopy
+    extract_bhavcopy.main()
+
+
+def stage_merge(start_year, end_year):
+    from scripts import merge_bhavcopy, merge_index
+    merge_bhavcopy.merge_years(start_year, end_year)
+    merge_index.merge_years(start_year, end_year)
+
+
+def stage_master(start_year, end_year):
+    from scripts import build_equity_master, build_index_master
+    return build_equity_master.build_master() + build_index_master.build_master()
+
+
+def stage_parquet(start_year, end_year):
+    from scripts import build_parquet
+    build_parquet.build_parquet()
+
+
+def stage_validate(start_year, end_year):
+    from scripts import validate_pipeline
+    report = validate_pipeline.validate(full=True)
+
+    if not report["passed"]:
+        logger.warning("Validation failed on the synthetic tree.")
+
+
+def stage_features(start_year, end_year):
+    from scripts import build_features
+    build_features.build(None)
+
+
+def text_rows(paths):
+    """
+    Data rows of CSV files (lines minus header).
+    """
+    rows = 0
+
+    for path in paths:
+        with open(path, "rb") as f:
+            rows += sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b"")) - 1
+
+    return rows
+
+
+def dataset_rows(*kinds):
+    from scripts.store import DATASETS, open_dataset
+
+    return sum(
+        open_dataset(kind).count_rows()
+        for kind in kinds
+        if any(DATASETS[kind]["root"].rglob("*.parquet"))
+    )
+
+
+def extracted_rows():
+    from scripts.config import EXTRACTED_DIR
+    return text_rows(sorted(EXTRACTED_DIR.glob("*.csv")))
+
+
+def yearly_rows():
+    from scripts.config import PROCESSED_DIR
+    return text_rows(sorted(PROCESSED_DIR.glob("*/yearly/*.csv")))
+
+
+# {stage: (run, rows processed)}; rows are counted after the clock
+# stops, from the stage's output
+STAGES = {
+    "extract": (stage_extract, extracted_rows),
+    "merge": (stage_merge, yearly_rows),
+    "master": (stage_master, None),
+    "parquet": (stage_parquet, lambda: dataset_rows("equity", "index")),
+    "validate": (stage_validate, lambda: dataset_rows("equity", "index")),
+    "features": (stage_features, lambda: dataset_rows("equity_features", "index_features")),
+}
+
+
+def run_stage(name, start_year, end_year):
+    """
+    Time one stage in this process. Returns the stage record.
+    """
+    run, count = STAGES[name]
+
+    wall = time.perf_counter()
+    cpu = cpu_seconds()
+
+    rows = run(start_year, end_year)
+
+    wall = time.perf_counter() - wall
+    cpu = cpu_seconds() - cpu
+
+    if count is not None:
+        rows = count()
+
+    return {
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "rows": rows,
+        "rows_per_s": round(rows / wall) if wall > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# -----------------------------------------
+# Harness (parent process)
+# -----------------------------------------
+def measure(name, home, start_year, end_year):
+    """
+    Run one stage in a child process against the tree at home.
+    """
+    result = subprocess.run(
+        [sys.executable, "-m", "scripts.benchmark", "--stage", name,
+         str(start_year), str(end_year)],
+        cwd=PROJECT_DIR,
+        env={**os.environ, "NSE_PIPELINE_HOME": str(home)},
+        capture_output=True,
+        text=True,
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Stage {name} failed:\n{result.stderr[-2000:]}")
+
+    # Stages may print; the record is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(history, entry):
+    """
+    Last recorded run with the same parameters on the same machine.
+    """
+    for previous in reversed(history.get("runs", [])):
+        if previous["params"] == entry["params"] and all(
+            previous.get(field) == entry[field] for field in MACHINE_FIELDS
+        ):
+            return previous
+    return None
+
+
+def regressions(entry, previous):
+    """
+    Stages whose wall time grew by more than REGRESSION_PCT.
+    """
+    if previous is None:
+        return []
+
+    slower = []
+    for name, stage in entry["stages"].items():
+        before = previous["stages"].get(name)
+
+        if before and before["wall_s"] > 0:
+            change = (stage["wall_s"] / before["wall_s"] - 1) * 100
+            if change > REGRESSION_PCT:
+                slower.append({"stage": name, "change_pct": round(change, 1)})
+
+    return slower
+
+
+def run_benchmark(start_year: int, end_year: int, symbols: int = DEFAULT_SYMBOLS,
+                  seed: int = 0, home=None, save: bool = True) -> dict:
+    """
+    Generate the synthetic tree (in a temporary directory unless home
+    is given), time every stage in order and, with save set, append
+    the run to HISTORY_FILE. Returns the run entry.
+    """
+    from scripts.synthetic import generate
+
+    params = {
+        "start_year": start_year,
+        "end_year": end_year,
+        "symbols": symbols,
+        "seed": seed,
+    }
+
+    with tempfile.TemporaryDirectory(prefix="nse_benchmark_") as scratch:
+        home = Path(home or scratch).resolve()
+
+        started = time.perf_counter()
+        raw = generate(home, start_year, end_year, symbols, seed)
+        raw["generate_s"] = round(time.perf_counter() - started, 3)
+
+        stages = {}
+        for name in STAGES:
+            stages[name] = measure(name, home, start_year, end_year)
+            logger.info(f"Benchmark {name}: {stages[name]}")
+
+    entry = {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "raw": raw,
+        "stages": stages,
+        "total_s": round(sum(stage["wall_s"] for stage in stages.values()), 3),
+    }
+
+    history = read_json(HISTORY_FILE, {"runs": []})
+    previous = previous_run(history, entry)
+    entry["regressions"] = regressions(entry, previous)
+
+    for slower in entry["regressions"]:
+        logger.warning(
+            f"Benchmark regression: {slower['stage']} +{slower['change_pct']}% wall time"
+        )
+
+    if save:
+        history["runs"].append(entry)
+        write_json(HISTORY_FILE, history)
+
+    report(entry, previous)
+    return entry
+
+
+def report(entry, previous):
+    print(f"{'stage':<10}{'wall s':>9}{'cpu s':>9}{'rows':>11}{'rows/s':>11}{'rss MB':>9}{'vs last':>9}")
+
+    for name, stage in entry["stages"].items():
+        change = ""
+        if previous and name in previous["stages"] and previous["stages"][name]["wall_s"]:
+            change = f"{(stage['wall_s'] / previous['stages'][name]['wall_s'] - 1) * 100:+.0f}%"
+
+        print(
+            f"{name:<10}{stage['wall_s']:>9.2f}{stage['cpu_s']:>9.2f}"
+            f"{stage['rows']:>11}{stage['rows_per_s'] or 0:>11}"
+            f"{stage['peak_rss_mb'] or '-':>9}{change:>9}"
+        )
+
+    print(f"{'total':<10}{entry['total_s']:>9.2f}")
+
+
+def main():
+    setup_logging()
+    args = sys.argv[1:]
+
+    if "--stage" in args:
+        position = args.index("--stage")
+        name, start_year, end_year = args[position + 1:position + 4]
+
+        print(json.dumps(run_stage(name, int(start_year), int(end_year))))
+        return
+
+    options = {"--symbols", "--seed", "--home"}
+    years = [
+        int(arg) for i, arg in enumerate(args)
+        if not arg.startswith("--") and (i == 0 or args[i - 1] not in options)
+    ]
+    start_year, end_year = years[:2] if len(years) >= 2 else DEFAULT_YEARS
+
+    symbols = int(args[args.index("--symbols") + 1]) if "--symbols" in args else DEFAULT_SYMBOLS
+    seed = int(args[args.index("--seed") + 1]) if "--seed" in args else 0
+    home = args[args.index("--home") + 1] if "--home" in args else None
+
+    entry = run_benchmark(start_year, end_year, symbols, seed, home, save="--no-save" not in args)
+    sys.exit(1 if entry["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import io
+import zipfile
+from scripts import raw_archive
+from scripts.config import EXTRACTED_DIR
+from scripts.logger import get_logger
+from scripts.schemas import parse_csv
+
+logger = get_logger("bhavcopy_reader")
+
+
+# -----------------------------------------
+# Source discovery
+# -----------------------------------------
+def collect_sources():
+    """
+    One source per daily bhavcopy, keyed by CSV name.
+    Zips are read in place, loose in RAW_DATA_DIR or inside a yearly
+    raw archive; CSVs already in EXTRACTED_DIR are only used for days
+    that have no zip.
+    """
+    sources = {}
+
+    for csv_file in EXTRACTED_DIR.glob("*.csv"):
+        sources[csv_file.name] = csv_file
+
+    for zip_file in raw_archive.sources("bhavcopy").values():
+        sources[zip_file.stem] = zip_file  # stem drops .zip
+
+    return sources
+
+
+# -----------------------------------------
+# Readers
+# -----------------------------------------
+def iter_zip_members(zip_path):
+    """
+    Yield (member_name, file object) for every CSV inside a zip (a
+    path or a file object). Members are streamed from the archive,
+    nothing touches disk.
+    """
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        for member in zip_ref.namelist():
+            if not member.lower().endswith(".csv"):
+                continue
+
+            with zip_ref.open(member) as f:
+                yield member, f
+
+
+def read_source(path):
+    """
+    Read a daily bhavcopy from a raw zip (loose or a raw_archive
+    ArchiveMember) or an extracted CSV.
+    Works for old cm*bhav.csv(.zip) and UDiFF BhavCopy_NSE_CM_* files.
+    Returns (format, typed DataFrame) as produced by the schema registry.
+    """
+    if path.suffix != ".zip":
+        return parse_csv(path.read_bytes())
+
+    if isinstance(path, raw_archive.ArchiveMember):
+        zip_file = io.BytesIO(path.read_bytes())
+    else:
+        zip_file = path
+
+    # A daily archive holds a single bhavcopy CSV
+    for _, f in iter_zip_members(zip_file):
+        return parse_csv(f.read())
+
+    raise ValueError(f"No CSV member in {path.name}")
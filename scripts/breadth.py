@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from scripts.equity_features import (
+    code_starts,
+    pct_change,
+    rolling_max,
+    rolling_means,
+    rolling_min,
+    symbol_order,
+)
+
+# -----------------------------------------
+# Market breadth from the equity store, one vectorized pass:
+# per-row flags on the symbol-sorted layout, then a single groupby
+# sum over trade_date for every indicator (no per-date Python calls).
+# -----------------------------------------
+MA_WINDOWS = [20, 50, 200]
+
+# A close equal to its moving average up to rounding is not "above"
+# (tick prices make exact ties common)
+MA_TOLERANCE = 1e-9
+HIGH_LOW_WINDOW = 252  # 52 weeks of sessions
+
+# Rows of history per symbol needed before the first new date
+WARMUP_ROWS = HIGH_LOW_WINDOW
+
+# Calendar days covering WARMUP_ROWS sessions
+WARMUP_DAYS = 400
+
+# Equity columns breadth reads
+COLUMNS = ["symbol", "trade_date", "close", "tottrdqty"]
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def compute_breadth(equity):
+    """
+    Date-indexed breadth table from equity rows (symbol, trade_date,
+    close, tottrdqty):
+
+    advances / declines / unchanged, advance_decline_ratio,
+    breadth_positive (share of all stocks with a positive return),
+    pct_above_ma20/50/200 (of stocks with a full window),
+    new_highs_52w / new_lows_52w, up_volume / down_volume and
+    up_down_volume_ratio. Returns one row per trade_date, with
+    trade_date as a column so it merges onto the index features.
+    """
+    # Only the arrays used are gathered into (symbol, trade_date) order
+    trade_dates = equity["trade_date"].to_numpy(dtype="datetime64[us]")
+    order, codes = symbol_order(equity["symbol"], trade_dates)
+
+    close = equity["close"].to_numpy(dtype=np.float64)
+    volume = equity["tottrdqty"].to_numpy(dtype=np.float64)
+
+    if order is not None:
+        codes, trade_dates = codes[order], trade_dates[order]
+        close, volume = close[order], volume[order]
+
+    starts = code_starts(codes)
+
+    returns = pct_change(close, starts, 1)
+
+    flags = {
+        "advances": returns > 0,
+        "declines": returns < 0,
+        "unchanged": returns == 0,
+        "stocks": np.ones(len(close), dtype=bool),
+    }
+
+    averages = rolling_means(close, starts, MA_WINDOWS)
+
+    # NaN averages (incomplete windows) compare False
+    for window in MA_WINDOWS:
+        average = averages[window]
+        flags[f"above_ma{window}"] = close > average * (1 + MA_TOLERANCE)
+        flags[f"full_ma{window}"] = ~np.isnan(average)
+
+    # New 52-week high/low: today's close is the extreme of the window
+    flags["new_highs_52w"] = close >= rolling_max(close, starts, HIGH_LOW_WINDOW)
+    flags["new_lows_52w"] = close <= rolling_min(close, starts, HIGH_LOW_WINDOW)
+
+    flags["up_volume"] = np.where(flags["advances"], volume, 0.0)
+    flags["down_volume"] = np.where(flags["declines"], volume, 0.0)
+
+    counts = pd.DataFrame(flags).groupby(trade_dates, sort=True).sum()
+
+    table = {
+        name: counts[name].to_numpy()
+        for name in ("advances", "declines", "unchanged")
+    }
+
+    table["advance_decline_ratio"] = _ratio(table["advances"], table["declines"])
+    table["breadth_positive"] = _ratio(table["advances"], counts["stocks"].to_numpy())
+
+    for window in MA_WINDOWS:
+        table[f"pct_above_ma{window}"] = _ratio(
+            counts[f"above_ma{window}"].to_numpy(), counts[f"full_ma{window}"].to_numpy()
+        )
+
+    for name in ("new_highs_52w", "new_lows_52w", "up_volume", "down_volume"):
+        table[name] = counts[name].to_numpy()
+
+    table["up_down_volume_ratio"] = _ratio(table["up_volume"], table["down_volume"])
+
+    breadth = pd.DataFrame(table)
+    breadth.insert(0, "trade_date", counts.index.to_numpy(dtype="datetime64[us]"))
+    return breadth
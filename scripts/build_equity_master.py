@@ -1,7 +1,9 @@
-import pandas as pd
+import sys
 from pathlib import Path
+from scripts import merge_bhavcopy
 from scripts.config import BASE_DIR
-from scripts.logger import get_logger
+from scripts.logger import get_logger, setup_logging
+from scripts.store import to_arrow, write_master
 import re
 
 logger = get_logger("equity_master")
@@ -9,9 +11,7 @@ logger = get_logger("equity_master")
 # 📂 Equity data is seperated yearly & master section
 EQUITY_YEARLY_DIR = BASE_DIR / "data" / "processed" / "equity" / "yearly"
 EQUITY_MASTER_DIR = BASE_DIR / "data" / "processed" / "equity" / "master"
-
-# Ensure master directory exists
-EQUITY_MASTER_DIR.mkdir(parents=True, exist_ok=True)
+EQUITY_PARQUET_DIR = BASE_DIR / "data" / "processed" / "equity" / "parquet"
 
 
 def extract_year(filename: str):
@@ -26,50 +26,65 @@ def extract_year(filename: str):
     return None
 
 
-def main():
-    # 🔄 Read from yearly folder
-    yearly_files = sorted(EQUITY_YEARLY_DIR.glob("nse_*.csv"))
-
-    all_data = []
-    years = []
-
-    for file in yearly_files:
-        try:
-            df = pd.read_csv(file)
-            all_data.append(df)
-            logger.info(f"Loaded: {file.name}")
-
-            year = extract_year(file.name)
-            if year:
-                years.append(year)
-
-        except Exception as e:
-            logger.error(f"Error loading {file.name} - {e}")
-
-    if not all_data:
+def build_master(frames: dict | None = None, export_csv: bool = False) -> int:
+    """
+    Build the equity master Parquet (plus the optional CSV export)
+    from the yearly CSVs, or from in-memory {year: DataFrame} as
+    returned by merge_bhavcopy.merge_years(..., save=False).
+    Returns the number of rows written.
+    """
+    if frames is None:
+        merge_bhavcopy.backfill_security_ids()
+
+        # 🔄 Read from yearly folder
+        sources = sorted(EQUITY_YEARLY_DIR.glob("nse_*.csv"))
+        sections = [
+            (extract_year(file.name), file) for file in sources
+            if extract_year(file.name)
+        ]
+    else:
+        sources = [(year, to_arrow(frames[year], "equity")) for year in sorted(frames)]
+        sections = sources
+
+    years = [year for year, _ in sections]
+
+    if not sources:
         logger.warning("No data found for master build.")
-        return
+        return 0
 
     if not years:
         logger.error("Could not detect year range from filenames.")
-        return
-
-    # 🔗 Merge all yearly data
-    master_df = pd.concat(all_data, ignore_index=True)
+        return 0
 
     # 📅 Detect year range
     start_year = min(years)
     end_year = max(years)
 
     # 📝 Dynamic master filename
-    master_filename = f"nse_master_{start_year}_{end_year}.csv"
-    master_path = EQUITY_MASTER_DIR / master_filename
+    master_name = f"nse_master_{start_year}_{end_year}"
+    parquet_path = EQUITY_PARQUET_DIR / f"{master_name}.parquet"
+    csv_path = EQUITY_MASTER_DIR / f"{master_name}.csv" if export_csv else None
+
+    # 🔗 Stream yearly sources straight into the master parquet
+    rows = write_master(sections, "equity_yearly", parquet_path, csv_path)
+
+    if rows == 0:
+        logger.warning("No data found for master build.")
+        return 0
 
-    # 💾 Save master file in master folder
-    master_df.to_csv(master_path, index=False)
+    logger.info(f"Master equity dataset created successfully: {parquet_path.name} ({rows} rows)")
 
-    logger.info(f"Master equity dataset created successfully: {master_filename}")
+    if csv_path:
+        logger.info(f"CSV master exported: {csv_path.name}")
+
+    return rows
+
+
+def main():
+    setup_logging()
+    # 📝 CSV master is an optional export: --csv
+    build_master(export_csv="--csv" in sys.argv[1:])
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
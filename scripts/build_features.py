@@ -0,0 +1,182 @@
+import sys
+import pandas as pd
+from scripts import breadth, equity_features, index_features, store
+from scripts.logger import get_logger, setup_logging, timed
+
+logger = get_logger("feature_builder")
+
+# -----------------------------------------
+# Incremental feature builder
+#   python -m scripts.build_features            (new dates only)
+#   python -m scripts.build_features --since YYYY-MM-DD
+#   python -m scripts.build_features --full
+#
+# Only dates after the newest feature row are computed, from the
+# new source rows plus the warm-up history each rolling window
+# needs. Only the feature partitions holding those dates are
+# rewritten (equity: year/month, index: year).
+# -----------------------------------------
+
+# Calendar days read back to find WARMUP_ROWS trading rows
+# (20 sessions plus weekends and holidays)
+WARMUP_DAYS = 45
+
+ONE_DAY = pd.Timedelta(days=1)
+
+
+def next_start():
+    """
+    First date without features in both stores (None: full build).
+    """
+    latest = [store.latest_date(kind) for kind in ("equity_features", "index_features")]
+
+    if any(date is None for date in latest):
+        return None
+
+    return min(latest) + ONE_DAY
+
+
+# -----------------------------------------
+# Source windows
+# -----------------------------------------
+def load_equity_window(since, warmup_rows=equity_features.WARMUP_ROWS,
+                       warmup_days=WARMUP_DAYS, columns=None):
+    """
+    Equity rows from since on, plus the last warmup_rows rows of
+    every symbol before it (looked for in the warmup_days calendar
+    days before since first).
+    """
+    new = store.load_equity(start=since, columns=columns)
+
+    if new.empty:
+        return new
+
+    symbols = [str(symbol) for symbol in new["symbol"].unique()]
+    window_start = since - pd.Timedelta(days=warmup_days)
+
+    history = store.load_equity(
+        symbols, start=window_start, end=since - ONE_DAY, columns=columns
+    )
+
+    # Symbols that traded on fewer days of the window need deeper history
+    counts = history.groupby("symbol", observed=True).size()
+    short = [
+        symbol for symbol in symbols
+        if counts.get(symbol, 0) < warmup_rows
+    ]
+
+    if short:
+        deeper = store.load_equity(
+            short, end=window_start - ONE_DAY, columns=columns
+        )
+        history = pd.concat([deeper, history], ignore_index=True)
+
+    history = (
+        equity_features.sort_by_symbol(history)
+        .groupby("symbol", observed=True)
+        .tail(warmup_rows)
+    )
+
+    logger.info(
+        f"Equity window: {len(new)} new rows, {len(history)} warm-up rows"
+    )
+    return pd.concat([history, new], ignore_index=True)
+
+
+def load_index_window(since):
+    """
+    Index rows from since on plus WARMUP_ROWS earlier rows, and the
+    highest close before since (drawdown's cummax state).
+    """
+    closes = store.load_index(end=since - ONE_DAY, columns=["closing_index_value"])
+    peak = closes["closing_index_value"].max() if not closes.empty else None
+
+    window = store.load_index(start=since - pd.Timedelta(days=WARMUP_DAYS))
+    window = window.sort_values("trade_date")
+
+    history = window[window["trade_date"] < since].tail(equity_features.WARMUP_ROWS)
+    new = window[window["trade_date"] >= since]
+
+    return pd.concat([history, new], ignore_index=True), peak
+
+
+# -----------------------------------------
+# Build
+# -----------------------------------------
+@timed("features")
+def build(since=None):
+    """
+    Compute equity and index features for dates >= since (all dates
+    when since is None) and write them to the feature store.
+    Returns the number of new trading dates.
+    """
+    if since is None:
+        equity = store.load_equity()
+        index, peak = store.load_index(), None
+    else:
+        index, peak = load_index_window(since)
+
+        if not (index["trade_date"] >= since).any():
+            logger.info("Features already up to date.")
+            return 0
+
+        equity = load_equity_window(since)
+
+    # Breadth needs a year of history per symbol (52-week highs/lows,
+    # 200-day averages), far more than the other equity features
+    if since is None:
+        market = breadth.compute_breadth(equity[breadth.COLUMNS])
+    else:
+        market = breadth.compute_breadth(
+            load_equity_window(
+                since, breadth.WARMUP_ROWS, breadth.WARMUP_DAYS, breadth.COLUMNS
+            )
+        )
+
+    equity = equity_features.compute_features(equity)
+    index = index_features.compute_features(index, peak)
+
+    # Warm-up rows only fed the rolling windows
+    if since is not None:
+        equity = equity[equity["trade_date"] >= since]
+        index = index[index["trade_date"] >= since]
+        market = market[market["trade_date"] >= since]
+
+    index = index.merge(market, on="trade_date", how="left")
+    equity = equity_features.screen_and_rank(equity, index)
+
+    if since is None:
+        store.write_dataset("index_features", index)
+        store.write_dataset("equity_features", equity)
+    else:
+        store.upsert_dataset("index_features", index, replace_dates=True)
+        store.upsert_dataset("equity_features", equity, replace_dates=True)
+
+    logger.info(
+        f"Features built for {index['trade_date'].nunique()} dates "
+        f"({len(equity)} equity rows)"
+    )
+    return index["trade_date"].nunique()
+
+
+def main():
+    setup_logging()
+    args = sys.argv[1:]
+
+    if "--full" in args:
+        since = None
+    elif "--since" in args:
+        since = pd.Timestamp(args[args.index("--since") + 1])
+    else:
+        since = next_start()
+
+    if since is None:
+        logger.info("Full feature build.")
+    else:
+        logger.info(f"Incremental feature build from {since.date()}")
+
+    build(since)
+
+
+if __name__ == "__main__":
+    main()
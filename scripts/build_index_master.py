@@ -1,7 +1,8 @@
-import pandas as pd
+import sys
 from pathlib import Path
 from scripts.config import BASE_DIR
-from scripts.logger import get_logger
+from scripts.logger import get_logger, setup_logging
+from scripts.store import to_arrow, write_master
 import re
 
 logger = get_logger("index_master")
@@ -9,9 +10,7 @@ logger = get_logger("index_master")
 # 📂 Equity data is seperated yearly & master section
 INDEX_YEARLY_DIR = BASE_DIR / "data" / "processed" / "index" / "yearly"
 INDEX_MASTER_DIR = BASE_DIR / "data" / "processed" / "index" / "master"
-
-# Ensure master directory exists
-INDEX_MASTER_DIR.mkdir(parents=True, exist_ok=True)
+INDEX_PARQUET_DIR = BASE_DIR / "data" / "processed" / "index" / "parquet"
 
 
 def extract_year(filename: str):
@@ -25,61 +24,69 @@ def extract_year(filename: str):
     return None
 
 
-def main():
-
-    # 🔄 Read from yearly folder
-    yearly_files = sorted(
-        INDEX_YEARLY_DIR.glob("nifty50_index_*.csv")
-    )
-
-    if not yearly_files:
+def build_master(frames: dict | None = None, export_csv: bool = False) -> int:
+    """
+    Build the index master Parquet (plus the optional CSV export)
+    from the yearly CSVs, or from in-memory {year: DataFrame} as
+    returned by merge_index.merge_years(..., save=False).
+    Returns the number of rows written.
+    """
+    if frames is None:
+        # 🔄 Read from yearly folder
+        sources = sorted(
+            INDEX_YEARLY_DIR.glob("nifty50_index_*.csv")
+        )
+        sections = [
+            (extract_year(file.name), file) for file in sources
+            if extract_year(file.name)
+        ]
+    else:
+        sources = [(year, to_arrow(frames[year], "index")) for year in sorted(frames)]
+        sections = sources
+
+    years = [year for year, _ in sections]
+
+    if not sources:
         logger.warning("No index yearly files found.")
-        return
-
-    all_data = []
-    years = []
-
-    for file in yearly_files:
-        try:
-            df = pd.read_csv(file)
-            all_data.append(df)
-            logger.info(f"Loaded: {file.name}")
-
-            year = extract_year(file.name)
-            if year:
-                years.append(year)
-
-        except Exception as e:
-            logger.error(f"Error loading {file.name} - {e}")
-
-    if not all_data:
-        logger.warning("No data found for index master build.")
-        return
+        return 0
 
     if not years:
         logger.error("Could not detect year range from filenames.")
-        return
-
-    # 🔗 Merge all data
-    master_df = pd.concat(all_data, ignore_index=True)
-
-    # 🧹 Remove duplicates (safe practice)
-    master_df.drop_duplicates(inplace=True)
+        return 0
 
     # 📅 Detect year range
     start_year = min(years)
     end_year = max(years)
 
     # 📝 Dynamic master filename
-    master_filename = f"nifty50_index_master_{start_year}_{end_year}.csv"
-    master_path = INDEX_MASTER_DIR / master_filename
+    master_name = f"nifty50_index_master_{start_year}_{end_year}"
+    parquet_path = INDEX_PARQUET_DIR / f"{master_name}.parquet"
+    csv_path = INDEX_MASTER_DIR / f"{master_name}.csv" if export_csv else None
+
+    # 🔗 Stream yearly sources into the master parquet
+    # 🧹 Remove duplicates per year (safe practice)
+    rows = write_master(
+        sections, "index_yearly", parquet_path, csv_path, dedupe=True
+    )
 
-    # 💾 Save master file
-    master_df.to_csv(master_path, index=False)
+    if rows == 0:
+        logger.warning("No data found for index master build.")
+        return 0
 
     logger.info("Index master dataset created successfully.")
-    logger.info(f"Saved to: {master_path}")
+    logger.info(f"Saved to: {parquet_path}")
+
+    if csv_path:
+        logger.info(f"CSV master exported: {csv_path}")
+
+    return rows
+
+
+def main():
+    setup_logging()
+    # 📝 CSV master is an optional export: --csv
+    build_master(export_csv="--csv" in sys.argv[1:])
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,60 +1,114 @@
 import pandas as pd
+import pyarrow as pa
 from pathlib import Path
+from scripts import merge_bhavcopy
 from scripts.config import BASE_DIR
-from scripts.logger import get_logger
+from scripts.logger import FileProgress, Telemetry, get_logger, setup_logging
+from scripts.schemas import read_csv_table
+from scripts.store import rebuilt_dataset, write_dataset
 
 logger = get_logger("parquet_builder")
 
 # -----------------------------
 # Directories
 # -----------------------------
-EQUITY_MASTER_DIR = BASE_DIR / "data" / "processed" / "equity" / "master"
-INDEX_MASTER_DIR = BASE_DIR / "data" / "processed" / "index" / "master"
+# Master parquet files are written directly by build_*_master.
+# This stage builds the partitioned datasets (scripts.store),
+# holding one year in memory at a time.
+EQUITY_YEARLY_DIR = BASE_DIR / "data" / "processed" / "equity" / "yearly"
+INDEX_YEARLY_DIR = BASE_DIR / "data" / "processed" / "index" / "yearly"
 
-EQUITY_PARQUET_DIR = BASE_DIR / "data" / "processed" / "equity" / "parquet"
-INDEX_PARQUET_DIR = BASE_DIR / "data" / "processed" / "index" / "parquet"
 
-EQUITY_PARQUET_DIR.mkdir(parents=True, exist_ok=True)
-INDEX_PARQUET_DIR.mkdir(parents=True, exist_ok=True)
+def build_dataset(kind: str, sources: list, fmt: str) -> int:
+    """
+    Rebuild one partitioned dataset from yearly sources: CSV paths,
+    Arrow tables or DataFrames (one per year). Every year is written
+    beside the old dataset, which is replaced only once all of them
+    are: a year that fails to load aborts the rebuild. Returns the
+    number of years written.
+    """
+    with Telemetry("build_dataset", dataset=kind) as telemetry:
+        progress = FileProgress(logger, "build_dataset", len(sources), verb="Partitioned")
+        written = 0
 
-# -----------------------------
-# Convert Equity Master
-# -----------------------------
-equity_files = sorted(EQUITY_MASTER_DIR.glob("nse_master_*.csv"))
+        with rebuilt_dataset(kind) as root:
+            for source in sources:
+                name = source.name if isinstance(source, Path) else f"{len(source)} rows"
 
-if equity_files:
-    equity_path = equity_files[-1]
-    df_equity = pd.read_csv(equity_path)
+                try:
+                    if isinstance(source, pa.Table):
+                        df = source.to_pandas()
+                    elif isinstance(source, pd.DataFrame):
+                        df = source
+                    else:
+                        table = read_csv_table(source, fmt)
 
-    df_equity['trade_date'] = pd.to_datetime(df_equity['trade_date'])
+                        if table is None:
+                            continue
 
-    parquet_path = EQUITY_PARQUET_DIR / equity_path.name.replace(".csv", ".parquet")
+                        df = table.to_pandas()
 
-    df_equity.to_parquet(parquet_path, index=False)
+                    write_dataset(kind, df, overwrite=False, root=root)
+                    written += 1
 
-    logger.info(f"Equity parquet created: {parquet_path.name}")
-    print("Equity Parquet Created ✅")
+                    telemetry.add(rows_out=len(df))
+                    progress.update(name, len(df))
 
-else:
-    logger.warning("No equity master found.")
+                except Exception as e:
+                    logger.error(f"Error partitioning {name} - {e}")
+                    raise
 
-# -----------------------------
-# Convert Index Master
-# -----------------------------
-index_files = sorted(INDEX_MASTER_DIR.glob("nifty50_index_master_*.csv"))
+        progress.close()
+
+    return written
+
+
+def build_parquet(equity: list | None = None, index: list | None = None) -> dict:
+    """
+    Build the equity and index datasets. Each argument is a list of
+    yearly sources (see build_dataset); None reads the yearly CSVs.
+    Returns {dataset: years written}.
+    """
+    if equity is None:
+        merge_bhavcopy.backfill_security_ids()
+        equity = sorted(EQUITY_YEARLY_DIR.glob("nse_*.csv"))
+
+    if index is None:
+        index = sorted(INDEX_YEARLY_DIR.glob("nifty50_index_*.csv"))
+
+    written = {}
+
+    # -----------------------------
+    # Equity dataset
+    # -----------------------------
+    written["equity"] = build_dataset("equity", equity, "equity_yearly") if equity else 0
+
+    if written["equity"]:
+        logger.info("Equity partitioned dataset created.")
+        print("Equity Parquet Created ✅")
+
+    else:
+        logger.warning("No equity yearly files found.")
+
+    # -----------------------------
+    # Index dataset
+    # -----------------------------
+    written["index"] = build_dataset("index", index, "index_yearly") if index else 0
+
+    if written["index"]:
+        logger.info("Index partitioned dataset created.")
+        print("Index Parquet Created ✅")
 
-if index_files:
-    index_path = index_files[-1]
-    df_index = pd.read_csv(index_path)
+    else:
+        logger.warning("No index yearly files found.")
 
-    df_index['trade_date'] = pd.to_datetime(df_index['trade_date'])
+    return written
 
-    parquet_path = INDEX_PARQUET_DIR / index_path.name.replace(".csv", ".parquet")
 
-    df_index.to_parquet(parquet_path, index=False)
+def main():
+    setup_logging()
+    build_parquet()
 
-    logger.info(f"Index parquet created: {parquet_path.name}")
-    print("Index Parquet Created ✅")
 
-else:
-    logger.warning("No index master found.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
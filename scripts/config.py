@@ -1,21 +1,37 @@
+import os
 from pathlib import Path
 
-# Base project directory
-BASE_DIR = Path(__file__).resolve().parent.parent
+# Project directory (scripts, notebooks)
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# Base directory of data/ and logs/. NSE_PIPELINE_HOME points the
+# whole pipeline at another tree, e.g. a synthetic benchmark dataset
+BASE_DIR = Path(os.environ.get("NSE_PIPELINE_HOME", PROJECT_DIR)).resolve()
 
 # Data directories
 RAW_DATA_DIR = BASE_DIR / "data" / "raw"
 EXTRACTED_DIR = BASE_DIR / "data" / "extracted"
 PROCESSED_DIR = BASE_DIR / "data" / "processed"
 METADATA_DIR = BASE_DIR / "data" / "metadata"
+FEATURES_DIR = BASE_DIR / "data" / "features"
+CACHE_DIR = BASE_DIR / "data" / "cache"
 
 # Log directory
 LOG_DIR = BASE_DIR / "logs"
 
-# Create directories if not exist
-for path in [RAW_DATA_DIR, EXTRACTED_DIR, PROCESSED_DIR, METADATA_DIR, LOG_DIR]:
-    path.mkdir(parents=True, exist_ok=True)
+# Directories are created by the code writing into them (or
+# ensure_dirs), never on import
+DATA_DIRS = [RAW_DATA_DIR, EXTRACTED_DIR, PROCESSED_DIR, METADATA_DIR, LOG_DIR]
+
+
+def ensure_dirs():
+    for path in DATA_DIRS:
+        path.mkdir(parents=True, exist_ok=True)
 
 # Date range (10 years)
 START_DATE = "2015-01-01"
 END_DATE   = "2025-12-31"
+
+# Indices kept by the long-format index store (merge_index --all-indices).
+# None keeps every index in ind_close_all, e.g. ["NIFTY 50", "NIFTY BANK"]
+INDEX_NAMES = None
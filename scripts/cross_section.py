@@ -0,0 +1,315 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------
+# Cross-sectional engine: rows are laid out once into a dense
+# (trade_date x slot) grid, NaN-padded to the widest date. Every
+# factor is then one row-wise sort of that grid, shared by all the
+# statistics taken from it (ranks, percentile ranks, quantiles).
+# -----------------------------------------
+OPERATIONS = [
+    "rank",        # 1..n ascending, ties get their average rank
+    "rank_desc",   # 1 = largest value
+    "pct_rank",    # rank / n, as rank(pct=True)
+    "zscore",      # (x - mean) / std (ddof=1) of the date
+    "winsorized",  # x clipped to the date's limits quantiles
+]
+
+# Default winsorizing quantiles
+LIMITS = (0.01, 0.99)
+
+
+# -----------------------------------------
+# Layout
+# -----------------------------------------
+def day_numbers(stamps):
+    """
+    Days since the epoch of a datetime64 array, by integer division
+    (much cheaper than a cast to datetime64[D]).
+    """
+    unit, count = np.datetime_data(stamps.dtype)
+    per_day = np.timedelta64(1, "D") // np.timedelta64(count, unit)
+    return stamps.view(np.int64) // per_day
+
+
+def date_layout(trade_dates, universe=None):
+    """
+    The rows in trade_date order (rows outside the universe mask left
+    out), their grid cells (increasing) and the (dates, width) grid
+    shape. Built once and shared by every factor ranked over the same
+    rows.
+    """
+    days = day_numbers(np.asarray(trade_dates, dtype="datetime64[us]"))
+
+    if universe is None:
+        members = None
+        offsets = days - days.min(initial=0)
+    else:
+        members = np.flatnonzero(np.asarray(universe, dtype=bool))
+        offsets = days[members] - days[members].min(initial=0)
+
+    # Small offsets take numpy's radix sort
+    if offsets.max(initial=0) < np.iinfo(np.int16).max:
+        offsets = offsets.astype(np.int16)
+
+    order = np.argsort(offsets, kind="stable")
+
+    # Per calendar-day offset: rows, date code (0..dates-1) and first
+    # sorted position. The k-th sorted row goes to slot k - first of
+    # its date's grid row.
+    sizes = np.bincount(offsets)
+    codes = np.cumsum(sizes > 0) - 1
+
+    shape = (
+        int(codes[-1]) + 1 if len(codes) else 0,
+        int(sizes.max(initial=0)),
+    )
+    base = codes * shape[1] - (np.cumsum(sizes) - sizes)
+
+    cells = base[offsets[order]] + np.arange(len(order))
+    rows = order if members is None else members[order]
+
+    return rows, cells, shape
+
+
+# -----------------------------------------
+# Kernels (one grid = one factor)
+# -----------------------------------------
+def sort_cells(values, cells, shape, grid=None):
+    """
+    Row-wise sort of a (dates, width) grid given as values at flat
+    cells (cells None: values is the whole grid, ravelled). Cells
+    without a value and NaN values are missing and sort last.
+
+    Returns (order, counts, tied): the index in values of each sorted
+    position (len(values) past the values, for cells without one),
+    the valid values per row and the flat sorted positions holding
+    the same value as the one before them (ties). grid is the values
+    already laid out, when the caller has built it.
+    """
+    dates, width = shape
+    size = dates * width
+
+    if cells is None:
+        grid = values.reshape(shape)
+    elif grid is None:
+        grid = np.full(size, np.nan)
+        grid[cells] = values
+        grid = grid.reshape(shape)
+
+    # argsort puts NaN last
+    order = np.argsort(grid, axis=1)
+    ordered = np.take_along_axis(grid, order, axis=1)
+    counts = width - np.isnan(grid).sum(axis=1)
+
+    # NaN never equals its neighbour: only valid values are tied
+    # (0.0 and -0.0 compare equal)
+    tied = np.flatnonzero(ordered[:, 1:] == ordered[:, :-1])
+    tied += tied // max(width - 1, 1) + 1
+
+    if len(order):
+        order += np.arange(0, size, width)[:, None]
+
+    if cells is not None:
+        inverse = np.full(size, len(values))
+        inverse[cells] = np.arange(len(values))
+        order = inverse[order]
+
+    return order, counts, tied
+
+
+def sort_rows(grid):
+    """
+    Row-wise sort of a grid (NaN = missing): (order, counts, tied) as
+    returned by sort_cells, order holding flat cells of the grid.
+    """
+    return sort_cells(grid.ravel(), None, grid.shape)
+
+
+def average_ranks(counts, tied, shape):
+    """
+    1-based ranks with ties averaged (rank(method="average")) of each
+    sorted position of a (dates, width) sort. Positions past their
+    row's count hold ranks too: mask them where it matters.
+    """
+    width = shape[1]
+    ranks = np.empty(shape)
+    ranks[:] = np.arange(1, width + 1, dtype=np.float64)
+
+    if not len(tied):
+        return ranks
+
+    # Runs of consecutive tied positions never cross rows (column 0
+    # is never tied); a run plus the position before it is one group
+    first = np.ones(len(tied), dtype=bool)
+    first[1:] = np.diff(tied) != 1
+    run = np.cumsum(first) - 1
+
+    starts = tied[first] - 1
+    ends = tied[np.append(np.flatnonzero(first)[1:], len(tied)) - 1]
+
+    average = (starts % width + ends % width) / 2 + 1
+
+    flat = ranks.ravel()
+    flat[tied] = average[run]
+    flat[starts] = average
+
+    return ranks
+
+
+def unsort(ordered, order, size):
+    """
+    Values of the sorted positions put back at their index (order as
+    returned by sort_cells): an array of the given size.
+    """
+    result = np.empty(size + 1)
+    result[order] = ordered
+    return result[:size]
+
+
+def quantiles(grid, values, order, counts, q):
+    """
+    Per-row quantile of the finite values (linear interpolation, as
+    Series.quantile) of the grid sorted into order, an index in
+    values. NaN for rows without finite values.
+    """
+    first = 0
+    finite = counts
+
+    # -inf sort first and +inf right after the finite values: leave
+    # both out
+    infinite = np.isinf(grid)
+    if infinite.any():
+        first = (grid == -np.inf).sum(axis=1)
+        finite = counts - infinite.sum(axis=1)
+
+    position = q * np.maximum(finite - 1, 0)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+
+    # Rows without finite values (all NaN or infinite) would index
+    # past their last position: clamp them to it, they are masked below
+    last = order.shape[1] - 1
+    rows = np.arange(len(order))
+    low = order[rows, np.minimum(first + lower, last)]
+    high = order[rows, np.minimum(first + upper, last)]
+
+    # Cells without a value point past the values
+    low = values.take(low, mode="clip")
+    high = values.take(high, mode="clip")
+
+    with np.errstate(invalid="ignore"):
+        result = low + (high - low) * (position - lower)
+    result[finite == 0] = np.nan
+
+    return result
+
+
+def zscores(grid):
+    """
+    (x - mean) / std per row, ddof=1 as Series.std. Rows with fewer
+    than two values or zero spread give NaN.
+    """
+    valid = ~np.isnan(grid)
+    counts = valid.sum(axis=1)
+    values = np.where(valid, grid, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = values.sum(axis=1) / counts
+        deviations = np.where(valid, grid - mean[:, None], 0.0)
+        std = np.sqrt((deviations * deviations).sum(axis=1) / (counts - 1))
+        std[std == 0] = np.nan
+
+        return (grid - mean[:, None]) / std[:, None]
+
+
+# -----------------------------------------
+# Batched pass
+# -----------------------------------------
+def factor_statistics(values, cells, shape, operations, limits):
+    """
+    {operation: values} of one factor, given as values at flat cells
+    of the (dates, width) grid. Results are aligned with values.
+    """
+    ranked = {"rank", "rank_desc", "pct_rank"} & set(operations)
+    grid = None
+
+    if "winsorized" in operations or "zscore" in operations:
+        grid = np.full(shape, np.nan)
+        grid.ravel()[cells] = values
+
+    if ranked or "winsorized" in operations:
+        order, counts, tied = sort_cells(values, cells, shape, grid)
+
+    statistics = {}
+
+    if ranked:
+        ranks = average_ranks(counts, tied, shape)
+        missing = np.isnan(values)
+
+        # Taken in sorted order, where a row's count is a broadcast:
+        # average ranks are symmetric, descending = n + 1 - ascending
+        sorted_statistics = {
+            "rank": lambda: ranks,
+            "rank_desc": lambda: (counts + 1.0)[:, None] - ranks,
+            "pct_rank": lambda: ranks / counts[:, None],
+        }
+        for op in operations:
+            if op in ranked:
+                # Dates without values divide by a zero count (their
+                # cells are all masked)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    statistic = unsort(sorted_statistics[op](), order, len(values))
+                statistic[missing] = np.nan
+                statistics[op] = statistic
+
+    if "winsorized" in operations:
+        # Dates without finite values are left as they are (Series.clip
+        # ignores NaN limits)
+        lower = quantiles(grid, values, order, counts, limits[0])
+        upper = quantiles(grid, values, order, counts, limits[1])
+        grid = np.clip(
+            grid,
+            np.nan_to_num(lower, nan=-np.inf)[:, None],
+            np.nan_to_num(upper, nan=np.inf)[:, None],
+        )
+        statistics["winsorized"] = grid.ravel()[cells]
+
+    if "zscore" in operations:
+        statistics["zscore"] = zscores(grid).ravel()[cells]
+
+    return statistics
+
+
+def cross_sectional(df, columns, operations=("pct_rank",), universe=None, limits=LIMITS):
+    """
+    Per-trade_date statistics of many factor columns over one shared
+    layout. Returns a DataFrame on df's index with a column
+    "{column}_{operation}" per factor and operation.
+
+    universe is an optional boolean row mask (e.g. the liquidity
+    filter): rows outside it get NaN and are left out of every date's
+    statistics. zscore is taken after winsorizing when "winsorized"
+    is requested too; ranks always use the raw values.
+    """
+    unknown = [op for op in operations if op not in OPERATIONS]
+    if unknown:
+        raise ValueError(f"Unknown operations: {unknown}")
+
+    rows, cells, shape = date_layout(df["trade_date"], universe)
+    outside = len(rows) < len(df)
+
+    result = {}
+
+    for column in columns:
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        statistics = factor_statistics(values[rows], cells, shape, operations, limits)
+
+        for op, statistic in statistics.items():
+            output = np.full(len(df), np.nan) if outside else np.empty(len(df))
+            output[rows] = statistic
+            result[f"{column}_{op}"] = output
+
+    # The columns are fresh arrays: no copy into one block
+    return pd.DataFrame(result, index=df.index, copy=False)
@@ -1,31 +1,16 @@
-import requests
-from datetime import datetime, timedelta
-import time
+from datetime import datetime
 import sys
+from scripts import raw_archive
 from scripts.config import RAW_DATA_DIR
-from scripts.logger import get_logger
+from scripts.downloader import DOWNLOADED, DownloadEngine, MISSING, summarize
+from scripts.logger import get_logger, setup_logging
+from scripts.trading_calendar import record_missing_dates, trading_days
 
 logger = get_logger("download")
 
-BASE_HOME = "https://www.nseindia.com"
-
 OLD_BASE = "https://archives.nseindia.com/content/historical/EQUITIES"
 NEW_BASE = "https://archives.nseindia.com/content/cm"
 
-# -----------------------------
-# CLI arguments
-# -----------------------------
-if len(sys.argv) != 3:
-    print("Usage: python -m scripts.download_bhavcopy START_YEAR END_YEAR")
-    sys.exit(1)
-
-start_year = int(sys.argv[1])
-end_year = int(sys.argv[2])
-
-START_DATE = f"{start_year}-01-01"
-END_DATE   = f"{end_year}-12-31"
-
-
 # -----------------------------
 # URL Builder
 # -----------------------------
@@ -48,22 +33,17 @@ def build_new_url(date):
 # -----------------------------
 # Main
 # -----------------------------
-def main():
-    start = datetime.strptime(START_DATE, "%Y-%m-%d")
-    end   = datetime.strptime(END_DATE, "%Y-%m-%d")
-
-    current = start
-
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Referer": BASE_HOME,
-        "Accept-Language": "en-US,en;q=0.9"
-    })
-
-    session.get(BASE_HOME)  # Initialize cookies
-
-    while current <= end:
+def build_tasks(start, end):
+    """
+    (url, save_path) for every trading day whose file is not stored yet
+    (loose with its recorded size, or in a yearly raw archive), plus a
+    save_path -> date lookup for recording 404s.
+    """
+    stored = raw_archive.stored_names("bhavcopy")
+    tasks = []
+    task_dates = {}
+
+    for current in trading_days(start, end, dataset="bhavcopy"):
 
         if current.year < 2024:
             url, file_name = build_old_url(current)
@@ -72,25 +52,63 @@ def main():
 
         save_path = RAW_DATA_DIR / file_name
 
-        try:
-            if not save_path.exists():
-                response = session.get(url)
+        if file_name not in stored:
+            tasks.append((url, save_path))
+            task_dates[save_path] = current
+
+    return tasks, task_dates
+
+
+def download(start_year: int, end_year: int) -> dict:
+    """
+    Fetch every missing daily bhavcopy of the year range.
+    Returns the outcome counts (downloaded / missing / failed).
+    """
+    start = datetime(start_year, 1, 1)
+    end = datetime(end_year, 12, 31)
+
+    RAW_DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+    tasks, task_dates = build_tasks(start, end)
+    logger.info(f"{len(tasks)} files to download.")
 
-                if response.status_code == 200:
-                    with open(save_path, "wb") as f:
-                        f.write(response.content)
-                    logger.info(f"Downloaded: {file_name}")
-                else:
-                    logger.warning(f"Skipped/Blocked: {file_name}")
+    engine = DownloadEngine()
 
-            current += timedelta(days=1)
-            time.sleep(1.5)
+    try:
+        results = engine.download_all(tasks)
+    finally:
+        engine.close()
 
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            current += timedelta(days=1)
+    urls = {save_path: url for url, save_path in tasks}
+    raw_archive.record_downloads("bhavcopy", [
+        (save_path, urls[save_path])
+        for save_path, outcome in results.items()
+        if outcome == DOWNLOADED
+    ])
+
+    missing = [
+        task_dates[save_path]
+        for save_path, outcome in results.items()
+        if outcome == MISSING
+    ]
+    cached = record_missing_dates("bhavcopy", missing)
+
+    counts = summarize(results)
+    logger.info(
+        f"Download Completed. downloaded={counts['downloaded']} "
+        f"missing={counts['missing']} (cached {cached}) "
+        f"failed={counts['failed']}"
+    )
+    return counts
+
+
+def main():
+    setup_logging()
+    if len(sys.argv) != 3:
+        print("Usage: python -m scripts.download_bhavcopy START_YEAR END_YEAR")
+        sys.exit(1)
 
-    logger.info("Download Completed.")
+    download(int(sys.argv[1]), int(sys.argv[2]))
 
 
 if __name__ == "__main__":
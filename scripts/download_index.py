@@ -1,31 +1,16 @@
 import sys
-import requests
-from datetime import datetime, timedelta
-import time
-from pathlib import Path
+from datetime import datetime
+from scripts import raw_archive
 from scripts.config import BASE_DIR
-from scripts.logger import get_logger
+from scripts.downloader import DOWNLOADED, DownloadEngine, MISSING, summarize
+from scripts.logger import get_logger, setup_logging
+from scripts.trading_calendar import record_missing_dates, trading_days
 
 logger = get_logger("index_download")
 
 BASE_ARCHIVE = "https://archives.nseindia.com/content/indices"
-BASE_HOME = "https://www.nseindia.com"
 
 INDEX_RAW_DIR = BASE_DIR / "data" / "raw" / "index"
-INDEX_RAW_DIR.mkdir(parents=True, exist_ok=True)
-
-# -----------------------------------
-# Accept START_YEAR and END_YEAR
-# -----------------------------------
-if len(sys.argv) != 3:
-    print("Usage: python -m scripts.download_index START_YEAR END_YEAR")
-    sys.exit(1)
-
-start_year = int(sys.argv[1])
-end_year = int(sys.argv[2])
-
-START_DATE = f"{start_year}-01-01"
-END_DATE   = f"{end_year}-12-31"
 
 
 def build_url(date):
@@ -35,46 +20,80 @@ def build_url(date):
     return url, file_name
 
 
-def main():
-    start = datetime.strptime(START_DATE, "%Y-%m-%d")
-    end   = datetime.strptime(END_DATE, "%Y-%m-%d")
+def build_tasks(start, end):
+    """
+    (url, save_path) for every trading day whose file is not stored yet
+    (loose with its recorded size, or in a yearly raw archive), plus a
+    save_path -> date lookup for recording 404s.
+    """
+    stored = raw_archive.stored_names("index")
+    tasks = []
+    task_dates = {}
 
-    current = start
+    for current in trading_days(start, end, dataset="index"):
+        url, file_name = build_url(current)
+        save_path = INDEX_RAW_DIR / file_name
 
-    session = requests.Session()
+        if file_name not in stored:
+            tasks.append((url, save_path))
+            task_dates[save_path] = current
 
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0",
-        "Referer": BASE_HOME,
-        "Accept-Language": "en-US,en;q=0.9"
-    })
+    return tasks, task_dates
 
-    # Initialize cookies
-    session.get(BASE_HOME)
 
-    while current <= end:
-        url, file_name = build_url(current)
-        save_path = INDEX_RAW_DIR / file_name
+def download(start_year: int, end_year: int) -> dict:
+    """
+    Fetch every missing daily index close file of the year range.
+    Returns the outcome counts (downloaded / missing / failed).
+    """
+    start = datetime(start_year, 1, 1)
+    end = datetime(end_year, 12, 31)
+
+    INDEX_RAW_DIR.mkdir(parents=True, exist_ok=True)
+
+    tasks, task_dates = build_tasks(start, end)
+    logger.info(f"{len(tasks)} index files to download.")
+
+    engine = DownloadEngine()
+
+    try:
+        results = engine.download_all(tasks)
+    finally:
+        engine.close()
 
-        try:
-            if not save_path.exists():
-                response = session.get(url)
+    urls = {save_path: url for url, save_path in tasks}
+    raw_archive.record_downloads("index", [
+        (save_path, urls[save_path])
+        for save_path, outcome in results.items()
+        if outcome == DOWNLOADED
+    ])
 
-                if response.status_code == 200:
-                    with open(save_path, "wb") as f:
-                        f.write(response.content)
-                    logger.info(f"Downloaded: {file_name}")
-                else:
-                    logger.warning(f"Skipped: {file_name}")
+    missing = [
+        task_dates[save_path]
+        for save_path, outcome in results.items()
+        if outcome == MISSING
+    ]
+    cached = record_missing_dates("index", missing)
 
-            current += timedelta(days=1)
-            time.sleep(1.5)
+    counts = summarize(results)
+    logger.info(
+        f"Index download completed. downloaded={counts['downloaded']} "
+        f"missing={counts['missing']} (cached {cached}) "
+        f"failed={counts['failed']}"
+    )
+    return counts
 
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            current += timedelta(days=1)
 
-    logger.info("Index download completed.")
+# -----------------------------------
+# Accept START_YEAR and END_YEAR
+# -----------------------------------
+def main():
+    setup_logging()
+    if len(sys.argv) != 3:
+        print("Usage: python -m scripts.download_index START_YEAR END_YEAR")
+        sys.exit(1)
+
+    download(int(sys.argv[1]), int(sys.argv[2]))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,264 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scripts.logger import FileProgress, Telemetry, get_logger
+
+logger = get_logger("downloader")
+
+BASE_HOME = "https://www.nseindia.com"
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Referer": BASE_HOME,
+    "Accept-Language": "en-US,en;q=0.9"
+}
+
+# -----------------------------
+# Engine defaults
+# -----------------------------
+MAX_WORKERS = 8               # Concurrent downloads in flight
+REQUESTS_PER_SECOND = 3.0     # Sustained rate allowed per host
+BURST = 6                     # Requests allowed back-to-back per host
+MAX_RETRIES = 4               # Attempts after the first one
+BACKOFF_SECONDS = 1.0         # Base delay, doubled on every retry
+TIMEOUT = (5, 30)             # (connect, read) seconds
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+AUTH_STATUS = {401, 403}
+
+# Download outcomes
+DOWNLOADED = "downloaded"
+MISSING = "missing"
+FAILED = "failed"
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    Refills at `rate` tokens per second up to `capacity`,
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class DownloadEngine:
+    """
+    Bounded-concurrency downloader over one pooled session.
+    Requests are rate limited per host, retried with exponential
+    backoff on 5xx/429/timeouts, and cookies are refreshed on 401/403.
+    """
+
+    def __init__(
+        self,
+        max_workers=MAX_WORKERS,
+        rate=REQUESTS_PER_SECOND,
+        burst=BURST,
+        max_retries=MAX_RETRIES,
+    ):
+        self.max_workers = max_workers
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=max_workers
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.buckets = {}
+        self.buckets_lock = threading.Lock()
+
+        self.cookie_lock = threading.Lock()
+        self.cookies_refreshed_at = 0.0
+
+    # -----------------------------
+    # Rate limiting
+    # -----------------------------
+    def wait_for_slot(self, url):
+        host = urlparse(url).netloc
+
+        with self.buckets_lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self.buckets[host] = bucket
+
+        bucket.acquire()
+
+    # -----------------------------
+    # Cookies
+    # -----------------------------
+    def refresh_cookies(self, stale_before=None):
+        """
+        Re-visit the home page to renew session cookies.
+        With stale_before set, skip the refresh if another worker
+        already renewed the cookies after that moment.
+        """
+        with self.cookie_lock:
+            if stale_before is not None and self.cookies_refreshed_at > stale_before:
+                return
+
+            try:
+                self.wait_for_slot(BASE_HOME)
+                self.session.get(BASE_HOME, timeout=TIMEOUT)
+                logger.info("Session cookies refreshed.")
+            except requests.RequestException as e:
+                logger.warning(f"Cookie refresh failed - {e}")
+
+            self.cookies_refreshed_at = time.monotonic()
+
+    # -----------------------------
+    # Single request with retries
+    # -----------------------------
+    def fetch(self, url):
+        """
+        Return the response for url, or None once retries are exhausted.
+        Non-retryable responses (e.g. 404) are returned as is.
+        """
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+
+            try:
+                self.wait_for_slot(url)
+                sent_at = time.monotonic()
+                response = self.session.get(url, timeout=TIMEOUT)
+
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if last_attempt:
+                    logger.error(f"Giving up on {url} - {e}")
+                    return None
+                self.backoff(attempt)
+                continue
+
+            if response.status_code in AUTH_STATUS and not last_attempt:
+                self.refresh_cookies(stale_before=sent_at)
+                continue
+
+            if response.status_code in RETRY_STATUS and not last_attempt:
+                self.backoff(attempt)
+                continue
+
+            return response
+
+        return None
+
+    def backoff(self, attempt):
+        delay = BACKOFF_SECONDS * (2 ** attempt)
+        time.sleep(delay + random.uniform(0, delay / 2))
+
+    # -----------------------------
+    # File download
+    # -----------------------------
+    def download(self, url, save_path):
+        response = self.fetch(url)
+
+        if response is None:
+            return FAILED
+
+        if response.status_code == 404:
+            return MISSING
+
+        if response.status_code != 200:
+            logger.warning(
+                f"Blocked ({response.status_code}): {save_path.name}"
+            )
+            return FAILED
+
+        # Write to a temp file first so an interrupted run never
+        # leaves a truncated file that looks complete
+        tmp_path = save_path.with_name(save_path.name + ".part")
+        with open(tmp_path, "wb") as f:
+            f.write(response.content)
+        tmp_path.replace(save_path)
+
+        return DOWNLOADED
+
+    def download_all(self, tasks):
+        """
+        tasks: iterable of (url, save_path).
+        Returns {save_path: outcome} for every task.
+        """
+        tasks = list(tasks)
+        results = {}
+
+        if not tasks:
+            return results
+
+        self.refresh_cookies()
+
+        with (
+            Telemetry("download", files=len(tasks)) as telemetry,
+            ThreadPoolExecutor(max_workers=self.max_workers) as pool,
+        ):
+            futures = {
+                pool.submit(self.download, url, save_path): save_path
+                for url, save_path in tasks
+            }
+            progress = FileProgress(logger, "download", len(futures), verb="Downloaded")
+
+            for future in as_completed(futures):
+                save_path = futures[future]
+
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logger.error(f"Error: {save_path.name} - {e}")
+                    outcome = FAILED
+
+                if outcome == DOWNLOADED:
+                    size = save_path.stat().st_size
+                    telemetry.add(bytes_written=size)
+                    progress.update(save_path.name, size=size)
+                elif outcome == MISSING:
+                    logger.warning(f"Skipped (not found): {save_path.name}")
+
+                results[save_path] = outcome
+
+            progress.close()
+
+        return results
+
+    def close(self):
+        self.session.close()
+
+
+def summarize(results):
+    counts = {DOWNLOADED: 0, MISSING: 0, FAILED: 0}
+    for outcome in results.values():
+        counts[outcome] += 1
+    return counts
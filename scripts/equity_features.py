@@ -0,0 +1,384 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scripts.cross_section import cross_sectional
+from scripts.logger import get_logger, setup_logging
+from scripts.store import load_equity
+
+logger = get_logger("equity_features")
+
+# -----------------------------------------
+# Equity features (notebooks/02_equity_feature_engineering)
+# computed on one symbol-sorted contiguous layout: every kernel
+# works on the flat arrays and resets at symbol boundaries using
+# the first row of every symbol segment.
+# -----------------------------------------
+VOLATILITY_WINDOW = 20
+LIQUIDITY_WINDOW = 20
+
+# Rows of history each symbol needs before the first new row for
+# every rolling feature to be complete (return_20d, volatility_20d)
+WARMUP_ROWS = 20
+
+# Tradable universe: Rs 5 crore average daily traded value, price > 20
+LIQUIDITY_THRESHOLD = 5e7
+MIN_PRICE = 20
+
+FEATURE_COLUMNS = [
+    "return_1d",
+    "return_5d",
+    "return_20d",
+    "volatility_20d",
+    "traded_value",
+    "avg_value_20d",
+]
+
+
+# -----------------------------------------
+# Layout
+# -----------------------------------------
+def symbol_codes(symbols):
+    """
+    Integer codes per symbol, ordered like sort_values orders them
+    (category order for categoricals, string order otherwise).
+    """
+    if isinstance(symbols.dtype, pd.CategoricalDtype):
+        return symbols.cat.codes.to_numpy().astype(np.int64)
+
+    codes, _ = pd.factorize(symbols, sort=True)
+    return codes.astype(np.int64)
+
+
+def symbol_order(symbols, trade_dates):
+    """
+    Row order that sorts by (symbol, trade_date), or None if the rows
+    are already in that order. Also returns the symbol codes.
+    """
+    codes = symbol_codes(symbols)
+    days = np.asarray(trade_dates, dtype="datetime64[D]").astype(np.int64)
+
+    if len(days):
+        days = days - days.min()
+
+    # One int64 key (symbol code in the high bits): a single argsort
+    # instead of a lexsort over two arrays
+    key = (codes << 32) | days
+
+    if np.all(key[1:] >= key[:-1]):
+        return None, codes
+
+    # Keys are unique per (symbol, trade_date): no stable sort needed
+    return np.argsort(key), codes
+
+
+def sort_by_symbol(df):
+    """
+    Rows ordered by (symbol, trade_date) with a fresh RangeIndex.
+    Already sorted frames are returned without reordering.
+    """
+    order, _ = symbol_order(df["symbol"], df["trade_date"])
+
+    if order is None:
+        return df.reset_index(drop=True)
+
+    return df.take(order).reset_index(drop=True)
+
+
+def code_starts(codes):
+    """
+    First row of each run of identical codes.
+    """
+    starts = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    return np.insert(starts, 0, 0) if len(codes) else starts
+
+
+def segment_starts(symbols):
+    """
+    First row of every symbol's run. Rows must be sorted.
+    """
+    if isinstance(symbols.dtype, pd.CategoricalDtype):
+        # Codes are only compared: no need to widen them (nor to copy
+        # them out of the Categorical, as .cat.codes does)
+        return code_starts(symbols.array.codes)
+
+    return code_starts(symbol_codes(symbols))
+
+
+def segment_heads(starts, rows, length):
+    """
+    Rows among the first `rows` of their symbol run. Runs shorter than
+    `rows` spill into the next run, whose rows there are within its
+    own first `rows` as well.
+    """
+    heads = (starts[:, None] + np.arange(rows)).ravel()
+    return heads[heads < length]
+
+
+# -----------------------------------------
+# Kernels
+# -----------------------------------------
+def pct_change(values, starts, periods=1):
+    """
+    Segmented values / values.shift(periods) - 1.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+
+    if periods < len(values):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[periods:] = values[periods:] / values[:-periods] - 1
+
+    out[segment_heads(starts, periods, len(values))] = np.nan
+    return out
+
+
+def _rolling(values, starts, window, statistic):
+    """
+    statistic(values, window) on the rows with a complete window of
+    their own symbol, NaN elsewhere. statistic gets the values with
+    inf as NaN (a window holding either is NaN, as in pandas rolling)
+    and returns one value per window ending at rows window - 1 on.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+
+    if window <= len(values):
+        out[window - 1:] = statistic(np.where(np.isinf(values), np.nan, values), window)
+
+    # Windows reaching back into the previous symbol are incomplete
+    out[segment_heads(starts, window - 1, len(values))] = np.nan
+    return out
+
+
+def _mean(values, window):
+    # Each window summed on its own: differences of one cumsum over
+    # the whole store carry its rounding error into every window
+    return sliding_window_view(values, window).sum(axis=1) / window
+
+
+def _std(values, window):
+    windows = sliding_window_view(values, window)
+
+    sums = windows.sum(axis=1)
+    squares = sliding_window_view(values * values, window).sum(axis=1)
+
+    variance = (squares - sums * sums / window) / (window - 1)
+    variance[np.ptp(windows, axis=1) == 0] = 0.0
+    return np.sqrt(np.maximum(variance, 0.0))
+
+
+def _max(values, window):
+    return sliding_window_view(values, window).max(axis=1)
+
+
+def _min(values, window):
+    return sliding_window_view(values, window).min(axis=1)
+
+
+def rolling_mean(values, starts, window):
+    """
+    Segmented rolling(window).mean().
+    """
+    return _rolling(values, starts, window, _mean)
+
+
+def rolling_means(values, starts, windows):
+    """
+    Segmented rolling means for several window sizes.
+    Returns {window: means}.
+    """
+    return {window: rolling_mean(values, starts, window) for window in windows}
+
+
+def rolling_std(values, starts, window):
+    """
+    Segmented rolling(window).std() (ddof=1), from the window sums of
+    the values and of their squares. The sum of squares minus the
+    squared sum cancels when a window's mean is large against its
+    spread, leaving few correct digits: fine for returns, not for
+    prices. Windows of equal values give exactly 0, as in pandas.
+    """
+    return _rolling(values, starts, window, _std)
+
+
+def rolling_max(values, starts, window):
+    """
+    Segmented rolling(window).max().
+    """
+    return _rolling(values, starts, window, _max)
+
+
+def rolling_min(values, starts, window):
+    """
+    Segmented rolling(window).min().
+    """
+    return _rolling(values, starts, window, _min)
+
+
+# -----------------------------------------
+# Features
+# -----------------------------------------
+def compute_features(df):
+    """
+    Add FEATURE_COLUMNS to an equity frame (symbol, trade_date, close,
+    tottrdqty). Returns a new frame sorted by (symbol, trade_date).
+    """
+    return add_features(sort_by_symbol(df))
+
+
+def add_features(df):
+    """
+    compute_features for a frame already sorted by (symbol, trade_date).
+    """
+    starts = segment_starts(df["symbol"])
+    close = df["close"].to_numpy(dtype=np.float64)
+
+    features = {
+        f"return_{period}d": pct_change(close, starts, period)
+        for period in (1, 5, 20)
+    }
+
+    features["volatility_20d"] = rolling_std(
+        features["return_1d"], starts, VOLATILITY_WINDOW
+    )
+
+    features["traded_value"] = close * df["tottrdqty"].to_numpy(dtype=np.float64)
+
+    features["avg_value_20d"] = rolling_mean(
+        features["traded_value"], starts, LIQUIDITY_WINDOW
+    )
+
+    # One concat shares every array: assigning the columns one by one
+    # would copy each of them
+    df = df.drop(columns=[name for name in FEATURE_COLUMNS if name in df.columns])
+
+    return pd.concat(
+        [df, pd.DataFrame(features, index=df.index, copy=False)], axis=1
+    )
+
+
+def screen_and_rank(df, index_df):
+    """
+    Notebook steps after the rolling features: liquidity/price
+    filters, relative strength vs the index return and the daily
+    cross-sectional momentum ranks.
+    """
+    df = df[(df["avg_value_20d"] > LIQUIDITY_THRESHOLD) & (df["close"] > MIN_PRICE)]
+
+    df = df.merge(
+        index_df[["trade_date", "return_1d"]],
+        on="trade_date",
+        suffixes=("", "_index")
+    )
+
+    df["relative_strength"] = df["return_1d"] - df["return_1d_index"]
+
+    ranks = cross_sectional(df, ["return_20d"], ["rank_desc", "pct_rank"])
+    df["rank_momentum"] = ranks["return_20d_rank_desc"]
+    df["rank_pct"] = ranks["return_20d_pct_rank"]
+
+    return df
+
+
+def reference_features(df):
+    """
+    The notebook's groupby implementation, kept for parity checks.
+    Expects the notebook layout (sorted by symbol, trade_date).
+    """
+    df = df.copy()
+    grouped = df.groupby("symbol", observed=True)
+
+    df["return_1d"] = grouped["close"].pct_change()
+    df["return_5d"] = grouped["close"].pct_change(5)
+    df["return_20d"] = grouped["close"].pct_change(20)
+
+    df["volatility_20d"] = (
+        df.groupby("symbol", observed=True)["return_1d"]
+          .rolling(VOLATILITY_WINDOW)
+          .std()
+          .reset_index(level=0, drop=True)
+    )
+
+    df["traded_value"] = df["close"] * df["tottrdqty"]
+
+    df["avg_value_20d"] = (
+        df.groupby("symbol", observed=True)["traded_value"]
+          .rolling(LIQUIDITY_WINDOW)
+          .mean()
+          .reset_index(level=0, drop=True)
+    )
+
+    return df
+
+
+def check_parity(df, rtol=1e-7):
+    """
+    Compare the engine with the notebook implementation on the same
+    sorted layout. Returns ({feature: max relative difference},
+    {feature: failure message}) and logs the timings (the layout sort
+    is shared by both and timed apart). A feature fails when its NaN
+    rows differ or a value is outside rtol.
+    """
+    started = time.perf_counter()
+    df = sort_by_symbol(df)
+    layout_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expected = reference_features(df)
+    reference_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = add_features(df)
+    engine_seconds = time.perf_counter() - started
+
+    differences = {}
+    failures = {}
+
+    for name in FEATURE_COLUMNS:
+        a = actual[name].to_numpy(dtype=np.float64)
+        b = expected[name].to_numpy(dtype=np.float64)
+
+        try:
+            np.testing.assert_array_equal(np.isnan(a), np.isnan(b), err_msg=f"{name} NaN rows")
+            np.testing.assert_allclose(a, b, rtol=rtol, atol=1e-12, err_msg=name)
+        except AssertionError as e:
+            failures[name] = str(e).strip()
+
+        valid = np.isfinite(a) & np.isfinite(b) & (b != 0)
+        differences[name] = float(
+            np.max(np.abs(a[valid] / b[valid] - 1), initial=0.0)
+        )
+
+    logger.info(
+        f"Parity {'FAILED' if failures else 'OK'} on {len(df)} rows: "
+        f"layout sort {layout_seconds:.2f}s, reference {reference_seconds:.2f}s, "
+        f"engine {engine_seconds:.2f}s "
+        f"({reference_seconds / max(engine_seconds, 1e-9):.1f}x)"
+    )
+    return differences, failures
+
+
+def main():
+    setup_logging()
+    # --check compares against the notebook implementation on the store
+    if "--check" not in sys.argv[1:]:
+        print("Usage: python -m scripts.equity_features --check")
+        sys.exit(1)
+
+    df = load_equity(columns=["symbol", "trade_date", "close", "tottrdqty"])
+    differences, failures = check_parity(df)
+
+    for name, difference in differences.items():
+        print(f"{name:<16}{difference:.2e}{'  FAILED' if name in failures else ''}")
+
+    for message in failures.values():
+        print(f"\n{message}")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,62 @@
+import io
 import zipfile
-from scripts.config import RAW_DATA_DIR, EXTRACTED_DIR
-from scripts.logger import get_logger
+from scripts import raw_archive
+from scripts.config import EXTRACTED_DIR
+from scripts.logger import FileProgress, Telemetry, get_logger, setup_logging
 
 logger = get_logger("extract")
 
+# Optional stage: merge_bhavcopy reads the raw zips in memory.
+# Run this only when the plain CSVs are needed on disk.
+
 def extract_zip(zip_path, extract_to):
+    """
+    Extract the members of one daily zip (loose, or a raw_archive
+    ArchiveMember) that are missing or differ in size from the
+    archive's record, e.g. left truncated by an interrupted run.
+    Returns the bytes written, 0 if nothing was extracted.
+    """
+    if isinstance(zip_path, raw_archive.ArchiveMember):
+        source = io.BytesIO(zip_path.read_bytes())
+    else:
+        source = zip_path
+
+    written = 0
+
     try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_to)
-        logger.info(f"Extracted: {zip_path.name}")
+        with zipfile.ZipFile(source, 'r') as zip_ref:
+            for member in zip_ref.infolist():
+                target = extract_to / member.filename
+
+                if target.exists() and target.stat().st_size == member.file_size:
+                    continue
+
+                zip_ref.extract(member, extract_to)
+                written += member.file_size
     except zipfile.BadZipFile:
         logger.error(f"Corrupt ZIP file: {zip_path.name}")
     except Exception as e:
         logger.error(f"Error extracting {zip_path.name} - {e}")
 
+    return written
+
 def main():
-    zip_files = list(RAW_DATA_DIR.glob("*.zip"))
+    setup_logging()
+    zip_files = list(raw_archive.sources("bhavcopy").values())
+    EXTRACTED_DIR.mkdir(parents=True, exist_ok=True)
+
+    with Telemetry("extract") as telemetry:
+        progress = FileProgress(logger, "extract", len(zip_files), verb="Extracted")
 
-    for zip_file in zip_files:
-        # Extract only if corresponding CSV not already extracted
-        expected_csv = zip_file.stem  # removes .zip
+        for zip_file in zip_files:
+            size = zip_file.stat().st_size
+            written = extract_zip(zip_file, EXTRACTED_DIR)
 
-        extracted_csv_path = EXTRACTED_DIR / expected_csv
+            if written:
+                telemetry.add(bytes_read=size, bytes_written=written)
+                progress.update(zip_file.name, size=size)
 
-        if not extracted_csv_path.exists():
-            extract_zip(zip_file, EXTRACTED_DIR)
+        progress.close()
 
     logger.info("Extraction Completed.")
 
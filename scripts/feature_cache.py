@@ -0,0 +1,325 @@
+import shutil
+import sys
+from collections import OrderedDict
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from scripts import store
+from scripts.config import CACHE_DIR
+from scripts.logger import get_logger, setup_logging
+
+logger = get_logger("feature_cache")
+
+# -----------------------------------------
+# Arrow IPC cache of store partitions
+#   cache/{kind}/year=YYYY[/month=M].arrow
+#
+#   python -m scripts.feature_cache                   (cache size)
+#   python -m scripts.feature_cache warm [KIND ...]   (materialize)
+#   python -m scripts.feature_cache clear
+#
+# A partition read through the cache is decoded from Parquet once
+# and written as an uncompressed Arrow IPC file; later reads
+# memory-map that file, so loading it copies nothing. Decoded tables
+# are also kept in an in-process LRU bounded by MAX_CACHE_BYTES.
+# Both levels are keyed on the source part-0.parquet (mtime, size):
+# a rewritten partition is decoded again on its next read.
+# -----------------------------------------
+MAX_CACHE_BYTES = 2 * 2**30
+
+DEFAULT_KINDS = ["equity_features", "index_features"]
+
+STAMP_KEY = b"source_stamp"
+
+
+def partition_key(kind, path):
+    """
+    Partition values of a part file, e.g. (2024, 3) for year=2024/month=3.
+    """
+    return tuple(
+        int(part.split("=")[1])
+        for part in path.parent.relative_to(store.DATASETS[kind]["root"]).parts
+    )
+
+
+def cache_path(kind, key):
+    names = store.DATASETS[kind]["partitions"]
+    parts = [f"{name}={value}" for name, value in zip(names, key)]
+    return CACHE_DIR.joinpath(kind, *parts[:-1], parts[-1] + ".arrow")
+
+
+def source_stamp(path):
+    stat = path.stat()
+    return f"{stat.st_mtime_ns}:{stat.st_size}".encode()
+
+
+# -----------------------------------------
+# In-process LRU
+# -----------------------------------------
+class TableCache:
+    """
+    LRU of Arrow tables bounded by their total buffer size. Entries
+    carry the stamp of their source; a get() with a different stamp
+    is a miss and drops the entry.
+    """
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.tables = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, stamp):
+        entry = self.tables.get(key)
+
+        if entry is None or entry[0] != stamp:
+            if entry is not None:
+                self.pop(key)
+            self.misses += 1
+            return None
+
+        self.tables.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, stamp, table):
+        if key in self.tables:
+            self.pop(key)
+
+        self.tables[key] = (stamp, table)
+        self.nbytes += table.nbytes
+
+        # The newest entry stays even when it alone exceeds the bound
+        while self.nbytes > self.max_bytes and len(self.tables) > 1:
+            self.pop(next(iter(self.tables)))
+
+    def pop(self, key):
+        _, table = self.tables.pop(key)
+        self.nbytes -= table.nbytes
+
+    def clear(self):
+        self.tables.clear()
+        self.nbytes = 0
+
+
+tables = TableCache()
+
+
+# -----------------------------------------
+# Arrow IPC files
+# -----------------------------------------
+def read_cached(path, stamp):
+    """
+    Memory-mapped table of a cache file, None if it is missing or
+    was written from another version of the source.
+    """
+    if not path.exists():
+        return None
+
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+
+        if (reader.schema.metadata or {}).get(STAMP_KEY) != stamp:
+            return None
+
+        return reader.read_all()
+
+
+def write_cached(path, stamp, table):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    metadata = {**(table.schema.metadata or {}), STAMP_KEY: stamp}
+    table = table.replace_schema_metadata(metadata)
+
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    tmp_path.replace(path)
+
+
+def partition_table(kind, source):
+    """
+    Every column of one store partition (partition columns excluded,
+    as in store.load): from the LRU, else the memory-mapped IPC file,
+    else decoded from Parquet and written to the IPC file.
+    """
+    key = partition_key(kind, source)
+    stamp = source_stamp(source)
+
+    table = tables.get((kind, key), stamp)
+    if table is not None:
+        return table
+
+    path = cache_path(kind, key)
+    table = read_cached(path, stamp)
+
+    if table is None:
+        logger.debug(f"Caching {kind} {key}")
+        write_cached(path, stamp, pq.read_table(source))
+        table = read_cached(path, stamp)
+
+    tables.put((kind, key), stamp, table)
+    return table
+
+
+# -----------------------------------------
+# Loading
+# -----------------------------------------
+def date_key(kind, date):
+    """
+    Partition of kind holding date, e.g. (2024, 3) for equity.
+    """
+    date = pd.Timestamp(date)
+    return (date.year, date.month)[:len(store.DATASETS[kind]["partitions"])]
+
+
+def partitions(kind, start=None, end=None):
+    """
+    Source part files of kind whose partition can hold dates in
+    [start, end], oldest first.
+    """
+    root = store.DATASETS[kind]["root"]
+    files = sorted(root.rglob("part-0.parquet"), key=lambda path: partition_key(kind, path))
+
+    return [
+        path for path in files
+        if (start is None or partition_key(kind, path) >= date_key(kind, start))
+        and (end is None or partition_key(kind, path) <= date_key(kind, end))
+    ]
+
+
+def load_table(kind, start=None, end=None, columns=None):
+    """
+    Arrow table of a store slice (dates inclusive). Partitions fully
+    inside the window are returned without a copy; only the edge
+    partitions are filtered on trade_date.
+    """
+    cfg = store.DATASETS[kind]
+
+    if not cfg["root"].exists():
+        raise FileNotFoundError(f"No {kind} dataset at {cfg['root']}")
+
+    bounds = []
+    if start is not None:
+        bounds.append((date_key(kind, start), pc.greater_equal,
+                       pa.scalar(pd.Timestamp(start), store.DATE_TYPE)))
+    if end is not None:
+        bounds.append((date_key(kind, end), pc.less_equal,
+                       pa.scalar(pd.Timestamp(end), store.DATE_TYPE)))
+
+    pieces = []
+    for source in partitions(kind, start, end):
+        table = partition_table(kind, source)
+        key = partition_key(kind, source)
+        edges = [bound for bound in bounds if bound[0] == key]
+
+        if columns is not None:
+            keep = list(columns) + (["trade_date"] if edges and "trade_date" not in columns else [])
+            table = table.select(keep)
+
+        for _, compare, value in edges:
+            table = table.filter(compare(table["trade_date"], value))
+
+        pieces.append(table if columns is None else table.select(list(columns)))
+
+    if not pieces:
+        schema = store.open_dataset(kind).schema
+        names = [name for name in schema.names if name not in cfg["partitions"]]
+        return schema.empty_table().select(list(columns or names))
+
+    return pa.concat_tables(pieces, promote_options="default")
+
+
+def load(kind, filter=None, start=None, end=None, columns=None, universe=None):
+    """
+    store.load served from the cache: same arguments, same rows in
+    the same (partition, then sort_by) order, e.g.
+    load("index_features", start="2024-01-01"). filter and universe
+    are applied to the cached partitions after the date window.
+    """
+    masked = filter is not None or universe is not None
+    table = load_table(kind, start, end, None if masked else columns)
+
+    if filter is not None:
+        table = table.filter(filter)
+
+    if universe is not None:
+        table = table.filter(store.universe_mask(
+            universe, table["trade_date"].to_numpy(), table["security_id"].to_numpy(), start, end
+        ))
+
+    if masked and columns is not None:
+        table = table.select(list(columns))
+
+    return table.to_pandas(split_blocks=True)
+
+
+# -----------------------------------------
+# Maintenance
+# -----------------------------------------
+def warm(kinds=None):
+    """
+    Materialize every partition of kinds as IPC files and drop cache
+    files whose source partition is gone.
+    """
+    for kind in kinds or DEFAULT_KINDS:
+        if not store.DATASETS[kind]["root"].exists():
+            logger.warning(f"No {kind} dataset to cache")
+            continue
+
+        files = partitions(kind)
+        live = {cache_path(kind, partition_key(kind, source)) for source in files}
+
+        for source in files:
+            partition_table(kind, source)
+
+        stale = [path for path in (CACHE_DIR / kind).rglob("*.arrow") if path not in live]
+        for path in stale:
+            path.unlink()
+
+        logger.info(f"Cached {kind}: {len(files)} partitions ({len(stale)} stale removed)")
+
+    tables.clear()
+
+
+def clear():
+    tables.clear()
+
+    if CACHE_DIR.exists():
+        shutil.rmtree(CACHE_DIR)
+
+    logger.info(f"Cache cleared: {CACHE_DIR}")
+
+
+def cache_size():
+    """
+    {kind: (files, bytes)} of the IPC files on disk.
+    """
+    sizes = {}
+
+    for kind in store.DATASETS:
+        files = list((CACHE_DIR / kind).rglob("*.arrow"))
+        if files:
+            sizes[kind] = (len(files), sum(path.stat().st_size for path in files))
+
+    return sizes
+
+
+def main():
+    setup_logging()
+    args = sys.argv[1:]
+
+    if args[:1] == ["warm"]:
+        warm(args[1:] or None)
+    elif args[:1] == ["clear"]:
+        clear()
+
+    for kind, (files, size) in cache_size().items():
+        print(f"{kind}: {files} files, {size / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
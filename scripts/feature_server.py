@@ -0,0 +1,297 @@
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from scripts import feature_cache, store
+from scripts.logger import get_logger, setup_logging
+
+logger = get_logger("feature_server")
+
+# -----------------------------------------
+# Local query service for the feature store
+#   python -m scripts.feature_server [--port N]       (serve)
+#
+#   from scripts.feature_server import query
+#   df = query("equity_features", ["trade_date", "close"],
+#              symbols=["TCS"], start="2024-01-01",
+#              filter=[["rank_pct", ">=", 0.9]])
+#
+# The server loads the feature partitions once (through the Arrow
+# cache, see scripts.feature_cache) and answers POST /query with an
+# Arrow IPC stream, one record batch at a time. Kernels on the same
+# box query it instead of each holding the full feature set. It
+# binds to localhost only; GET /status reports what is loaded.
+# -----------------------------------------
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://{HOST}:{DEFAULT_PORT}"
+
+# Rows per streamed record batch
+BATCH_ROWS = 64 * 1024
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+OPERATORS = {
+    "==": pc.equal,
+    "!=": pc.not_equal,
+    "<": pc.less,
+    "<=": pc.less_equal,
+    ">": pc.greater,
+    ">=": pc.greater_equal,
+    "in": lambda values, options: pc.is_in(values, value_set=options),
+    "not in": lambda values, options: pc.invert(pc.is_in(values, value_set=options)),
+}
+
+LIST_OPERATORS = {"in", "not in"}
+
+
+class QueryError(ValueError):
+    pass
+
+
+# -----------------------------------------
+# Query execution (server side)
+# -----------------------------------------
+# feature_cache's LRU is not thread safe; slicing the tables it
+# returns is
+cache_lock = threading.Lock()
+
+
+def entity_column(kind):
+    """
+    Column symbols= filters on (symbol, index_name), None for kinds
+    keyed by date only.
+    """
+    keys = [key for key in store.DATASETS[kind]["keys"] if key != "trade_date"]
+    return keys[0] if keys else None
+
+
+def check_clauses(clauses):
+    """
+    Every filter clause must be [column, op, value] with a known op
+    (a list value for in / not in).
+    """
+    if not isinstance(clauses, list):
+        raise QueryError(f"filter must be a list of [column, op, value], got {clauses!r}")
+
+    for clause in clauses:
+        if (
+            not isinstance(clause, (list, tuple))
+            or len(clause) != 3
+            or not isinstance(clause[0], str)
+            or clause[1] not in OPERATORS
+        ):
+            raise QueryError(f"Bad filter clause: {clause!r}")
+
+        if (clause[1] in LIST_OPERATORS) != isinstance(clause[2], list):
+            raise QueryError(f"Bad filter value for {clause[1]!r}: {clause!r}")
+
+
+def operand(column, op, value):
+    """
+    value cast to the column's type (dictionary columns compare on
+    their values), e.g. "2024-01-01" to timestamp[us].
+    """
+    target = column.type
+    if pa.types.is_dictionary(target):
+        target = target.value_type
+
+    try:
+        if op in LIST_OPERATORS:
+            return pa.array(value).cast(target)
+        return pa.scalar(value).cast(target)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+        raise QueryError(f"Cannot compare {column.type} with {value!r}: {e}") from None
+
+
+def run_query(request):
+    """
+    Arrow table answering one request:
+        {"kind", "columns", "symbols", "start", "end",
+         "filter": [[column, op, value], ...]}
+    Every key but kind is optional. Filter clauses are ANDed.
+    """
+    if not isinstance(request, dict):
+        raise QueryError(f"A query is a JSON object, got {request!r}")
+
+    kind = request.get("kind", "equity_features")
+    columns = request.get("columns")
+    symbols = request.get("symbols")
+    clauses = request.get("filter") or []
+
+    if kind not in store.DATASETS:
+        raise QueryError(f"Unknown dataset: {kind}")
+
+    check_clauses(clauses)
+
+    with cache_lock:
+        table = feature_cache.load_table(kind, request.get("start"), request.get("end"))
+
+    missing = [
+        name for name in (columns or []) + [clause[0] for clause in clauses]
+        if name not in table.column_names
+    ]
+    if missing:
+        raise QueryError(f"Unknown columns in {kind}: {missing}")
+
+    if symbols is not None:
+        column = entity_column(kind)
+        if column is None:
+            raise QueryError(f"{kind} has no symbol column")
+
+        table = table.filter(
+            OPERATORS["in"](table[column], operand(table[column], "in", list(symbols)))
+        )
+
+    for name, op, value in clauses:
+        table = table.filter(OPERATORS[op](table[name], operand(table[name], op, value)))
+
+    return table if columns is None else table.select(columns)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/status":
+            self.send_error(404)
+            return
+
+        loaded = {}
+        with cache_lock:
+            for kind, _ in feature_cache.tables.tables:
+                loaded[kind] = loaded.get(kind, 0) + 1
+
+            status = {
+                "partitions": loaded,
+                "bytes": feature_cache.tables.nbytes,
+                "hits": feature_cache.tables.hits,
+                "misses": feature_cache.tables.misses,
+            }
+
+        self.send_json(200, status)
+
+    def do_POST(self):
+        if self.path != "/query":
+            self.send_error(404)
+            return
+
+        started = time.perf_counter()
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            table = run_query(request)
+        except (QueryError, ValueError, pa.ArrowException) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except FileNotFoundError as e:
+            self.send_json(404, {"error": str(e)})
+            return
+        except Exception as e:
+            # Answer rather than drop the connection
+            logger.error(f"Query failed: {type(e).__name__}: {e}")
+            self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", ARROW_STREAM)
+        self.end_headers()
+
+        # HTTP/1.0: the stream ends when the connection closes
+        with pa.ipc.new_stream(self.wfile, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=BATCH_ROWS):
+                writer.write_batch(batch)
+
+        logger.debug(
+            f"Query {request.get('kind', 'equity_features')}: {table.num_rows} rows "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    def send_json(self, code, payload):
+        body = json.dumps(payload).encode()
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def serve(port=DEFAULT_PORT, kinds=None):
+    """
+    Load the feature partitions and serve queries until interrupted.
+    """
+    for kind in kinds or feature_cache.DEFAULT_KINDS:
+        if store.DATASETS[kind]["root"].exists():
+            feature_cache.load_table(kind)
+
+    server = ThreadingHTTPServer((HOST, port), QueryHandler)
+    logger.info(
+        f"Feature server on http://{HOST}:{port} "
+        f"({feature_cache.tables.nbytes / 2**20:.1f} MB loaded)"
+    )
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# -----------------------------------------
+# Client
+# -----------------------------------------
+def query(kind="equity_features", columns=None, symbols=None, start=None,
+          end=None, filter=None, url=DEFAULT_URL):
+    """
+    DataFrame of a feature-store slice, queried from a running server.
+    Dates are inclusive; filter is a list of [column, op, value]
+    clauses with op one of OPERATORS.
+    """
+    request = {
+        "kind": kind,
+        "columns": list(columns) if columns is not None else None,
+        "symbols": list(symbols) if symbols is not None else None,
+        "start": str(pd.Timestamp(start).date()) if start is not None else None,
+        "end": str(pd.Timestamp(end).date()) if end is not None else None,
+        "filter": filter,
+    }
+
+    http_request = urllib.request.Request(
+        f"{url}/query",
+        data=json.dumps(request).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+
+    try:
+        with urllib.request.urlopen(http_request) as response:
+            table = pa.ipc.open_stream(response).read_all()
+    except urllib.error.HTTPError as e:
+        raise QueryError(json.loads(e.read()).get("error", str(e))) from None
+
+    return table.to_pandas()
+
+
+def status(url=DEFAULT_URL):
+    with urllib.request.urlopen(f"{url}/status") as response:
+        return json.loads(response.read())
+
+
+def main():
+    setup_logging()
+    args = sys.argv[1:]
+    port = int(args[args.index("--port") + 1]) if "--port" in args else DEFAULT_PORT
+
+    serve(port)
+
+
+if __name__ == "__main__":
+    main()
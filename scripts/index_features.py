@@ -0,0 +1,41 @@
+import numpy as np
+
+# -----------------------------------------
+# Index features (notebooks/01_index_feature_engineering)
+# -----------------------------------------
+VOLATILITY_WINDOW = 20
+
+FEATURE_COLUMNS = [
+    "return_1d",
+    "return_5d",
+    "return_20d",
+    "volatility_20d",
+    "drawdown",
+    "volume_change",
+]
+
+
+def compute_features(df, peak=None):
+    """
+    Add FEATURE_COLUMNS to index rows. peak is the highest close
+    before the first row (drawdown's cummax state when only the
+    newest rows plus a warm-up window are passed in).
+    """
+    df = df.sort_values("trade_date").reset_index(drop=True)
+    close = df["closing_index_value"]
+
+    df["return_1d"] = close.pct_change()
+    df["return_5d"] = close.pct_change(5)
+    df["return_20d"] = close.pct_change(20)
+
+    df["volatility_20d"] = df["return_1d"].rolling(VOLATILITY_WINDOW).std()
+
+    running_max = close.cummax()
+    if peak is not None:
+        running_max = np.maximum(running_max, peak)
+    df["drawdown"] = close / running_max - 1
+
+    df["volume_change"] = df["volume"].pct_change(5)
+
+    return df
+
@@ -1,13 +1,295 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+from functools import wraps
 from scripts.config import LOG_DIR
 
+try:
+    import resource
+except ImportError:  # Windows: peak memory is not recorded
+    resource = None
+
 log_file = LOG_DIR / "pipeline.log"
+telemetry_file = LOG_DIR / "telemetry.jsonl"
+
+# Rotation: size per file and rotated copies kept
+MAX_BYTES = 10 * 2**20
+BACKUP_COUNT = 5
+
+# Per-file progress is summarized once every this many files
+BATCH_FILES = 250
+
+
+# -----------------------------------------
+# Handlers
+# Records go through a QueueHandler: the calling thread only puts
+# the record on a queue, a listener thread formats and writes it.
+# -----------------------------------------
+class PipelineLogHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotating file handler that opens (and creates LOG_DIR for) its
+    file on the first record, so importing a script touches no files.
+    """
+    def __init__(self, path=log_file):
+        super().__init__(path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, delay=True)
+
+    def _open(self):
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+class TelemetryFilter(logging.Filter):
+    def __init__(self, telemetry):
+        super().__init__()
+        self.telemetry = telemetry
+
+    def filter(self, record):
+        return hasattr(record, "telemetry") == self.telemetry
+
+
+class JsonLineFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.telemetry, default=str)
+
+
+def make_handlers():
+    text = PipelineLogHandler()
+    text.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    text.addFilter(TelemetryFilter(False))
+
+    jsonl = PipelineLogHandler(telemetry_file)
+    jsonl.setFormatter(JsonLineFormatter())
+    jsonl.addFilter(TelemetryFilter(True))
+
+    return [text, jsonl]
+
+
+# -----------------------------------------
+# Setup
+# Importing this module configures nothing: entry points call
+# setup_logging(). Records go through a multiprocessing queue, so
+# worker processes (worker_logging) feed the same listener thread.
+# -----------------------------------------
+listener = None
+
+
+def queue_handler(queue):
+    handler = logging.handlers.QueueHandler(queue)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def setup_logging(level=logging.INFO):
+    """
+    Route this process's records to pipeline.log and telemetry.jsonl
+    through the queue listener. Started once; later calls are no-ops.
+    """
+    global listener
+
+    if listener is not None:
+        return
+
+    # A spawn-context queue can be handed to workers of any start
+    # method; a fork-context one only to forked workers
+    log_queue = multiprocessing.get_context("spawn").Queue()
+    root = logging.getLogger()
+    root.addHandler(queue_handler(log_queue))
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, *make_handlers(), respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def log_queue():
+    """
+    The listener's queue, for worker_logging (None before setup).
+    """
+    return None if listener is None else listener.queue
+
+
+def worker_logging(queue, level=logging.INFO):
+    """
+    ProcessPoolExecutor initializer: the worker's records are put on
+    the parent's queue instead of inherited (or missing) handlers.
+
+        ProcessPoolExecutor(initializer=worker_logging, initargs=(log_queue(),))
+    """
+    if queue is None:
+        return
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler(queue)]
+    root.setLevel(level)
 
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
 
 def get_logger(name):
     return logging.getLogger(name)
+
+
+telemetry_logger = get_logger("telemetry")
+
+
+# -----------------------------------------
+# Telemetry
+# -----------------------------------------
+def peak_rss_mb():
+    """
+    Peak resident set size of this process and its waited-for
+    children, in MB. None where unsupported.
+    """
+    if resource is None:
+        return None
+
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(peak * scale / 2**20, 1)
+
+
+def cpu_seconds():
+    """
+    User + system CPU time of this process and finished children.
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def emit(record):
+    telemetry_logger.info(record.get("stage", ""), extra={"telemetry": record})
+
+
+class Telemetry:
+    """
+    Context manager timing one stage (or unit of a stage). Counters
+    are added with add(); on exit one JSON line is written to
+    telemetry.jsonl:
+
+        with Telemetry("merge_equity", year=2024) as t:
+            ...
+            t.add(rows_in=len(df), bytes_read=size)
+
+    peak_rss_mb is the process high-water mark at exit (child
+    processes included), so it bounds the stage rather than
+    isolating it.
+    """
+    COUNTERS = ("rows_in", "rows_out", "bytes_read", "bytes_written")
+
+    def __init__(self, stage, **fields):
+        self.stage = stage
+        self.fields = fields
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.counts[key] += value
+
+    def __enter__(self):
+        self.started_at = datetime.now()
+        self.wall = time.perf_counter()
+        self.cpu = cpu_seconds()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record = {
+            "stage": self.stage,
+            **self.fields,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "status": "ok" if exc_type is None else "error",
+            "wall_s": round(time.perf_counter() - self.wall, 3),
+            "cpu_s": round(cpu_seconds() - self.cpu, 3),
+            **self.counts,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+        if exc_type is not None:
+            self.record["error"] = f"{exc_type.__name__}: {exc}"
+
+        emit(self.record)
+        return False
+
+
+def timed(stage=None, **fields):
+    """
+    Decorator form of Telemetry: @timed("build_parquet"). Counters
+    are left at zero; use the context manager to report rows/bytes.
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with Telemetry(stage or func.__module__.rsplit(".", 1)[-1], **fields):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class FileProgress:
+    """
+    Aggregated per-file progress. Each file is logged at DEBUG
+    (dropped at the default INFO level); every BATCH_FILES files and
+    on close() one INFO summary and one "batch" telemetry record
+    cover the files since the previous batch.
+    """
+    def __init__(self, logger, stage, total, verb="Processed", every=BATCH_FILES):
+        self.logger = logger
+        self.stage = stage
+        self.total = total
+        self.verb = verb
+        self.every = every
+        self.done = 0
+        self.batch = dict(files=0, rows=0, bytes=0)
+        self.started = time.perf_counter()
+
+    def update(self, name, rows=0, size=0):
+        self.logger.debug(f"{self.verb}: {name}")
+
+        self.done += 1
+        self.batch["files"] += 1
+        self.batch["rows"] += rows
+        self.batch["bytes"] += size
+
+        if self.batch["files"] >= self.every:
+            self.flush()
+
+    def flush(self):
+        if not self.batch["files"]:
+            return
+
+        wall = time.perf_counter() - self.started
+
+        counts = [f"+{self.batch['files']} files"]
+        if self.batch["rows"]:
+            counts.append(f"{self.batch['rows']} rows")
+        if self.batch["bytes"]:
+            counts.append(f"{self.batch['bytes'] / 2**20:.1f} MB")
+
+        self.logger.info(
+            f"{self.verb} {self.done}/{self.total} files "
+            f"({', '.join(counts)} in {wall:.2f}s)"
+        )
+        emit({
+            "stage": self.stage,
+            "event": "batch",
+            "done": self.done,
+            "total": self.total,
+            **self.batch,
+            "wall_s": round(wall, 3),
+        })
+
+        self.batch = dict(files=0, rows=0, bytes=0)
+        self.started = time.perf_counter()
+
+    def close(self):
+        self.flush()
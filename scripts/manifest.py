@@ -0,0 +1,25 @@
+import json
+
+
+def read_json(path, default=None):
+    """
+    Load a JSON manifest, returning default if it does not exist yet.
+    """
+    if not path.exists():
+        return {} if default is None else default
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    """
+    Write a JSON manifest atomically (temp file + rename), so an
+    interrupted run never leaves a half-written manifest behind.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    tmp_path.replace(path)
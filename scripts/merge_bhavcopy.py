@@ -1,21 +1,30 @@
+import os
 import sys
+import threading
+import zipfile
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from scripts.config import EXTRACTED_DIR, PROCESSED_DIR
-from scripts.logger import get_logger
+from scripts.bhavcopy_reader import collect_sources, read_source
+from scripts.config import PROCESSED_DIR
+from scripts.logger import (
+    FileProgress,
+    Telemetry,
+    get_logger,
+    log_queue,
+    setup_logging,
+    worker_logging,
+)
+from scripts.schemas import read_csv_table, read_header
+from scripts.securities import (
+    add_security_ids,
+    load_securities,
+    register_security_ids,
+    save_securities,
+)
 
 logger = get_logger("merge")
 
-# -------------------------------
-# Accept YEAR as command argument
-# -------------------------------
-if len(sys.argv) != 2:
-    print("Usage: python -m scripts.merge_bhavcopy YEAR")
-    sys.exit(1)
-
-target_year = sys.argv[1]
-
-
 # -----------------------------------------
 # Extract trade date from filename (OLD + NEW)
 # -----------------------------------------
@@ -38,30 +47,11 @@ def extract_date_from_filename(filename):
 
 # -----------------------------------------
 # Normalize OLD format
+# Columns arrive renamed and typed by the schema registry
 # -----------------------------------------
 def normalize_old_format(df):
 
-    df.columns = df.columns.str.lower().str.strip()
-
-    df = df[df["series"] == "EQ"]
-
-    df = df.rename(columns={
-        "symbol": "symbol",
-        "series": "series",
-        "open": "open",
-        "high": "high",
-        "low": "low",
-        "close": "close",
-        "last": "last",
-        "prevclose": "prevclose",
-        "tottrdqty": "tottrdqty",
-        "tottrdval": "tottrdval",
-        "totaltrades": "totaltrades",
-        "isin": "isin",
-        "timestamp": "timestamp"
-    })
-
-    return df
+    return df[df["series"] == "EQ"]
 
 
 # -----------------------------------------
@@ -69,107 +59,264 @@ def normalize_old_format(df):
 # -----------------------------------------
 def normalize_udiff_format(df):
 
-    df.columns = df.columns.str.lower().str.strip()
-
     # Filter only Cash Market (CM) + Equity
-    df = df[df["sgmt"] == "CM"]
-    df = df[df["sctysrs"] == "EQ"]
-
-    df = df.rename(columns={
-        "tckrsymb": "symbol",
-        "sctysrs": "series",
-        "opnpric": "open",
-        "hghpric": "high",
-        "lwpric": "low",
-        "clspric": "close",
-        "lastpric": "last",
-        "prvsclsgpric": "prevclose",
-        "ttltradgvol": "tottrdqty",
-        "ttltrfval": "tottrdval",
-        "ttlnboftxsexctd": "totaltrades",
-        "isin": "isin",
-        "traddt": "timestamp"
-    })
-
-    return df
+    return df[(df["sgmt"] == "CM") & (df["series"] == "EQ")]
 
 
-def main():
+NORMALIZERS = {
+    "old": normalize_old_format,
+    "udiff": normalize_udiff_format,
+}
 
-    csv_files = list(EXTRACTED_DIR.glob("*.csv"))
 
-    if not csv_files:
-        logger.warning("No CSV files found.")
-        return
+# -----------------------------------------
+# Standardized output columns
+# -----------------------------------------
+REQUIRED_COLUMNS = [
+    "symbol",
+    "series",
+    "open",
+    "high",
+    "low",
+    "close",
+    "last",
+    "prevclose",
+    "tottrdqty",
+    "tottrdval",
+    "totaltrades",
+    "isin",
+    "trade_date",
+]
+
+
+def normalize_frame(fmt, df, trade_date):
+    """
+    Normalize a parsed bhavcopy and return the standardized
+    columns. Returns None for unknown formats.
+    """
+    normalizer = NORMALIZERS.get(fmt)
+
+    if normalizer is None:
+        return None
+
+    df = normalizer(df).assign(trade_date=trade_date)
+
+    # Keep only standardized columns
+    return df[REQUIRED_COLUMNS]
 
-    all_data = []
 
-    for file in csv_files:
+# -----------------------------------------
+# Index sources by date (one directory scan)
+# -----------------------------------------
+def index_sources(start_year, end_year):
+    """
+    {year: [(trade_date, source), ...]} for every daily file
+    whose filename date falls inside the year range.
+    """
+    by_year = {}
+
+    for name, source in collect_sources().items():
         try:
-            trade_date = extract_date_from_filename(file.name)
+            trade_date = extract_date_from_filename(name)
+        except ValueError as e:
+            logger.warning(str(e))
+            continue
+
+        if start_year <= trade_date.year <= end_year:
+            by_year.setdefault(trade_date.year, []).append((trade_date, source))
+
+    return by_year
+
+
+# -----------------------------------------
+# Worker: read + normalize one daily file
+# -----------------------------------------
+def load_daily(source, trade_date):
+    fmt, df = read_source(source)
+    return normalize_frame(fmt, df, trade_date)
+
+
+def combine_year(frames: dict) -> pd.DataFrame:
+    """
+    One year of daily frames, keyed by (trade_date, file name), in
+    date order.
+    """
+    return pd.concat(
+        [frames[key] for key in sorted(frames)],
+        ignore_index=True
+    )
 
-            if str(trade_date.year) != target_year:
-                continue
 
-            df = pd.read_csv(file)
+def save_year(year: int, final_df: pd.DataFrame) -> int:
+    """
+    Write one year's CSV. Returns the bytes written.
+    """
+    equity_dir = PROCESSED_DIR / "equity" / "yearly"
+    equity_dir.mkdir(parents=True, exist_ok=True)
 
-            df.columns = df.columns.str.lower().str.strip()
+    output_path = equity_dir / f"nse_{year}.csv"
+    final_df.to_csv(output_path, index=False)
 
-            # Detect format automatically
-            if "symbol" in df.columns and "series" in df.columns:
-                df = normalize_old_format(df)
+    logger.info(f"Year {year} merge completed successfully.")
+    logger.info(f"Saved to: {output_path}")
 
-            elif "tckrsymb" in df.columns:
-                df = normalize_udiff_format(df)
+    return output_path.stat().st_size
 
-            else:
-                logger.warning(f"Unknown structure in {file.name}")
+
+# Stages reading the yearly files may backfill from several threads
+BACKFILL_LOCK = threading.Lock()
+
+
+def backfill_security_ids() -> int:
+    """
+    Add the security_id column to yearly CSVs written before the
+    security master existed, in year order so ids are assigned
+    chronologically. Files that have it are only read up to their
+    header. Returns the number of files rewritten.
+    """
+    equity_dir = PROCESSED_DIR / "equity" / "yearly"
+    rewritten = 0
+
+    with BACKFILL_LOCK:
+        for path in sorted(equity_dir.glob("nse_*.csv")):
+            with open(path, "rb") as f:
+                if "security_id" in read_header(f.readline()):
+                    continue
+
+            table = read_csv_table(path, "equity_yearly")
+
+            if table is None:
                 continue
 
-            # Add trade_date column
-            df["trade_date"] = trade_date
+            df = add_security_ids(table.to_pandas())
+
+            tmp_path = path.with_name(path.name + ".tmp")
+            df.to_csv(tmp_path, index=False)
+            tmp_path.replace(path)
+
+            logger.info(f"Security ids added to {path.name}")
+            rewritten += 1
+
+    return rewritten
+
+
+def merge_years(
+    start_year: int,
+    end_year: int,
+    max_workers: int | None = None,
+    save: bool = True,
+    mp_context=None,
+) -> dict:
+    """
+    Normalize every daily file of the year range across a process
+    pool. With save set, each year is written to its yearly CSV (and
+    dropped) as soon as it and every earlier year are done, and {}
+    is returned. Otherwise nothing is written, not even the security
+    master, and {year: DataFrame} is returned. Years are finished in
+    calendar order so security ids are assigned chronologically.
 
-            # Keep only standardized columns
-            required_columns = [
-                "symbol",
-                "series",
-                "open",
-                "high",
-                "low",
-                "close",
-                "last",
-                "prevclose",
-                "tottrdqty",
-                "tottrdval",
-                "totaltrades",
-                "isin",
-                "trade_date",
-            ]
+    mp_context is the pool's start method (default: the platform's).
+    """
+    by_year = index_sources(start_year, end_year)
+    merged = {}
 
-            df = df[required_columns]
+    for year in range(start_year, end_year + 1):
+        if year not in by_year:
+            logger.warning(f"No data found for year {year}.")
 
-            all_data.append(df)
+    if not by_year:
+        return merged
 
-            logger.info(f"Processed: {file.name}")
+    remaining = {year: len(files) for year, files in by_year.items()}
+    frames = {year: {} for year in by_year}
 
-        except Exception as e:
-            logger.error(f"Error processing {file.name} - {e}")
+    # Years whose files are all read, waiting for the earlier years
+    pending_years = sorted(by_year)
+    completed = {}
 
-    if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
+    # New securities are registered here and saved with their year
+    spells = load_securities()
 
-        equity_dir = PROCESSED_DIR / "equity" / "yearly"
-        equity_dir.mkdir(parents=True, exist_ok=True)
+    with (
+        Telemetry("merge_equity", start_year=start_year, end_year=end_year) as telemetry,
+        ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(),
+            mp_context=mp_context,
+            initializer=worker_logging,
+            initargs=(log_queue(),),
+        ) as pool,
+    ):
+        futures = {
+            pool.submit(load_daily, source, trade_date): (year, trade_date, source)
+            for year, files in by_year.items()
+            for trade_date, source in files
+        }
+        progress = FileProgress(logger, "merge_equity", len(futures))
 
-        output_path = equity_dir / f"nse_{target_year}.csv"
-        final_df.to_csv(output_path, index=False)
+        for future in as_completed(futures):
+            year, trade_date, source = futures[future]
+            size = source.stat().st_size
+            telemetry.add(bytes_read=size)
 
-        logger.info(f"Year {target_year} merge completed successfully.")
-        logger.info(f"Saved to: {output_path}")
+            try:
+                df = future.result()
 
-    else:
-        logger.warning(f"No data found for year {target_year}.")
+                if df is None:
+                    logger.warning(f"Unknown structure in {source.name}")
+                else:
+                    frames[year][(trade_date, source.name)] = df
+                    telemetry.add(rows_in=len(df))
+                    progress.update(source.name, len(df), size)
+
+            except zipfile.BadZipFile:
+                logger.error(f"Corrupt ZIP file: {source.name}")
+
+            except Exception as e:
+                logger.error(f"Error processing {source.name} - {e}")
+
+            remaining[year] -= 1
+
+            if remaining[year] == 0:
+                completed[year] = frames.pop(year)
+
+            while pending_years and pending_years[0] in completed:
+                year = pending_years.pop(0)
+                year_frames = completed.pop(year)
+
+                if not year_frames:
+                    logger.warning(f"No data found for year {year}.")
+                    continue
+
+                final_df = combine_year(year_frames)
+                final_df["security_id"], spells = register_security_ids(final_df, spells)
+                telemetry.add(rows_out=len(final_df))
+
+                if save:
+                    save_securities(spells)
+                    telemetry.add(bytes_written=save_year(year, final_df))
+                else:
+                    merged[year] = final_df
+
+        progress.close()
+
+    return merged
+
+
+def main():
+    setup_logging()
+
+    # -------------------------------
+    # Accept YEAR or START_YEAR END_YEAR
+    # -------------------------------
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python -m scripts.merge_bhavcopy YEAR [END_YEAR]")
+        sys.exit(1)
+
+    start_year = int(sys.argv[1])
+    end_year = int(sys.argv[-1])
+
+    merge_years(start_year, end_year)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,27 +1,28 @@
+import os
 import sys
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from scripts.config import BASE_DIR
-from scripts.logger import get_logger
+from scripts import raw_archive, store
+from scripts.config import BASE_DIR, INDEX_NAMES
+from scripts.logger import (
+    FileProgress,
+    Telemetry,
+    get_logger,
+    log_queue,
+    setup_logging,
+    worker_logging,
+)
+from scripts.schemas import parse_csv, restore_int_columns
 
 logger = get_logger("index_merge")
 
-# -------------------------------
-# Validate Command Line Argument
-# -------------------------------
-if len(sys.argv) != 2:
-    print("Usage: python -m scripts.merge_index YEAR")
-    sys.exit(1)
-
-target_year = sys.argv[1]
-
 # -------------------------------
 # Paths
 # -------------------------------
 INDEX_RAW_DIR = BASE_DIR / "data" / "raw" / "index"
 
 INDEX_PROCESSED_DIR = BASE_DIR / "data" / "processed" / "index"
-INDEX_PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
 # -------------------------------
 # Extract date from filename
@@ -33,118 +34,304 @@ def extract_date_from_filename(filename):
 
 
 # -------------------------------
-# Main Logic
+# Important columns
 # -------------------------------
-def main():
+REQUIRED_COLUMNS = [
+    "index_name",
+    "open_index_value",
+    "high_index_value",
+    "low_index_value",
+    "closing_index_value",
+    "points_change",
+    "change(%)",
+    "volume",
+    "turnover_(rs._cr.)",
+    "p/e",
+    "p/b",
+    "div_yield",
+    "trade_date"
+]
+
+
+# -------------------------------
+# Index raw files by year (one directory scan)
+# -------------------------------
+def index_sources(start_year, end_year):
+    by_year = {}
+
+    # Loose daily files and yearly raw archive members
+    for file in raw_archive.sources("index").values():
+        try:
+            trade_date = extract_date_from_filename(file.name)
+        except ValueError:
+            logger.warning(f"Unknown filename format: {file.name}")
+            continue
+
+        if start_year <= trade_date.year <= end_year:
+            by_year.setdefault(trade_date.year, []).append((trade_date, file))
+
+    return by_year
+
 
-    # Filter files for target year
-    csv_files = list(
-        INDEX_RAW_DIR.glob(f"ind_close_all_*{target_year}.csv")
+# -------------------------------
+# Worker: read + filter one daily file
+# -------------------------------
+def load_indices(file, trade_date, names=None):
+    """
+    Returns the rows of one file for the given index names (every
+    index when names is None), or None if the file is not an index
+    close file.
+    """
+    # Typed parse of the registered columns only
+    fmt, df = parse_csv(file.read_bytes())
+
+    if fmt != "index":
+        return None
+
+    # -------------------------------
+    # Normalize Index Name column
+    # -------------------------------
+    index_names = (
+        df["index_name"]
+        .astype(str)
+        .str.strip()
+        .str.upper()
+    )
+
+    if names is None:
+        return df.assign(index_name=index_names, trade_date=trade_date)
+
+    # -------------------------------
+    # Filter requested indices
+    # -------------------------------
+    mask = index_names.isin([name.strip().upper() for name in names])
+
+    return df[mask].assign(
+        index_name=index_names[mask],
+        trade_date=trade_date
     )
 
-    if not csv_files:
-        logger.warning(f"No files found for year {target_year}")
-        return
 
-    all_data = []
+def load_daily(file, trade_date):
+    """
+    Returns the NIFTY 50 rows of one file, an empty frame if the
+    index is absent, or None if the file is not an index close file.
+    """
+    df = load_indices(file, trade_date, ["NIFTY 50"])
+
+    if df is None:
+        return None
+
+    return restore_int_columns(df, "index")
 
-    for file in csv_files:
-        try:
-            df = pd.read_csv(file)
 
-            # -------------------------------
-            # Clean columns
-            # -------------------------------
-            df.columns = df.columns.str.strip()
+def nifty50_rows(df):
+    """
+    NIFTY 50 rows of a multi-index frame, typed like load_daily.
+    """
+    return restore_int_columns(df[df["index_name"] == "NIFTY 50"], "index")
 
-            if "Index Name" not in df.columns:
-                logger.warning(f"'Index Name' column missing in {file.name}")
-                continue
 
-            # -------------------------------
-            # Normalize Index Name column
-            # -------------------------------
-            df["Index Name"] = (
-                df["Index Name"]
-                .astype(str)
-                .str.strip()
-                .str.upper()
-            )
+def long_rows(df):
+    """
+    Rows of a multi-index frame kept by the long store (INDEX_NAMES).
+    """
+    if INDEX_NAMES is not None:
+        df = df[df["index_name"].isin([name.upper() for name in INDEX_NAMES])]
 
-            # -------------------------------
-            # Filter NIFTY 50 & MIDCAP 50
-            # -------------------------------
-            df_nifty = df[
-                df["Index Name"].isin(
-                    ["NIFTY 50"]
-                )
-            ]
+    return clean_columns(df)
 
-            if not df_nifty.empty:
-                trade_date = extract_date_from_filename(file.name)
 
-                df_nifty = df_nifty.copy()
-                df_nifty["trade_date"] = trade_date
+# -------------------------------
+# Output columns
+# -------------------------------
+def clean_columns(df):
+    # Column names are already cleaned by the schema registry
+    return df[REQUIRED_COLUMNS]
+
+
+# -------------------------------
+# Save one year
+# -------------------------------
+def combine_year(frames: dict) -> pd.DataFrame:
+    """
+    One year of NIFTY 50 rows from {trade_date: frame}, in date order.
+    """
+    final_df = pd.concat(
+        [frames[key] for key in sorted(frames)],
+        ignore_index=True
+    )
+
+    return clean_columns(final_df)
 
-                all_data.append(df_nifty)
 
-            logger.info(f"Processed: {file.name}")
+def save_year(year: int, final_df: pd.DataFrame) -> int:
+    """
+    Write one year's NIFTY 50 CSV. Returns the bytes written.
+    """
+    output_dir = INDEX_PROCESSED_DIR / "yearly"
+    output_dir.mkdir(parents=True, exist_ok=True)
 
-        except Exception as e:
-            logger.error(f"Error processing {file.name} - {e}")
+    output_path = output_dir / f"nifty50_index_{year}.csv"
+
+    final_df.to_csv(output_path, index=False)
+
+    logger.info(
+        f"Index merge completed successfully for {year}"
+    )
+    logger.info(f"Saved to: {output_path}")
+
+    return output_path.stat().st_size
+
+
+def save_long_year(year, frames):
+    """
+    Replace the year partition of the long-format store
+    (index_name, trade_date) with every kept index.
+    """
+    final_df = pd.concat(
+        [frames[key] for key in sorted(frames)],
+        ignore_index=True
+    )
+
+    store.write_dataset("index_long", final_df, overwrite=False)
+
+    logger.info(
+        f"Long index store updated for {year}: "
+        f"{final_df['index_name'].nunique()} indices, {len(final_df)} rows"
+    )
+
+
+# -------------------------------
+# Main Logic
+# -------------------------------
+def merge_years(
+    start_year: int,
+    end_year: int,
+    max_workers: int | None = None,
+    all_indices: bool = False,
+    save: bool = True,
+    mp_context=None,
+) -> dict:
+    """
+    Filter every daily file of the year range across a process
+    pool. With save set, each year is written as soon as its last
+    file is done and {} is returned; otherwise nothing is written
+    and {year: NIFTY 50 DataFrame} is returned.
+
+    With all_indices set, each file is parsed once and every index
+    (or INDEX_NAMES) is also written to the long-format store; the
+    NIFTY 50 yearly CSV is derived from the same parse. That writes
+    to the store, so it requires save.
+
+    mp_context is the pool's start method (default: the platform's).
+    """
+    if all_indices and not save:
+        raise ValueError("all_indices writes the long-format store: use save=True")
+
+    by_year = index_sources(start_year, end_year)
+    merged = {}
+
+    for year in range(start_year, end_year + 1):
+        if year not in by_year:
+            logger.warning(f"No files found for year {year}")
+
+    if not by_year:
+        return merged
+
+    remaining = {year: len(files) for year, files in by_year.items()}
+    frames = {year: {} for year in by_year}
+    long_frames = {year: {} for year in by_year}
+
+    worker = load_indices if all_indices else load_daily
+
+    with (
+        Telemetry("merge_index", start_year=start_year, end_year=end_year) as telemetry,
+        ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(),
+            mp_context=mp_context,
+            initializer=worker_logging,
+            initargs=(log_queue(),),
+        ) as pool,
+    ):
+        futures = {
+            pool.submit(worker, file, trade_date): (year, trade_date, file)
+            for year, files in by_year.items()
+            for trade_date, file in files
+        }
+        progress = FileProgress(logger, "merge_index", len(futures))
+
+        for future in as_completed(futures):
+            year, trade_date, file = futures[future]
+            size = file.stat().st_size
+            telemetry.add(bytes_read=size)
+
+            try:
+                df = future.result()
+
+                if df is None:
+                    logger.warning(f"'Index Name' column missing in {file.name}")
+                else:
+                    telemetry.add(rows_in=len(df))
+
+                    if all_indices:
+                        long_frames[year][trade_date] = long_rows(df)
+                        df = nifty50_rows(df)
+
+                    if not df.empty:
+                        frames[year][trade_date] = df
+                    progress.update(file.name, len(df), size)
+
+            except Exception as e:
+                logger.error(f"Error processing {file.name} - {e}")
+
+            remaining[year] -= 1
+
+            if remaining[year] == 0:
+                year_frames = frames.pop(year)
+                year_long_frames = long_frames.pop(year)
+
+                if not year_frames:
+                    logger.warning(f"No data merged for {year}")
+                else:
+                    final_df = combine_year(year_frames)
+                    telemetry.add(rows_out=len(final_df))
+
+                    if save:
+                        telemetry.add(bytes_written=save_year(year, final_df))
+                    else:
+                        merged[year] = final_df
+
+                if year_long_frames:
+                    save_long_year(year, year_long_frames)
+
+        progress.close()
+
+    return merged
+
+
+def main():
+    setup_logging()
 
     # -------------------------------
-    # Save Final Output
+    # Accept YEAR or START_YEAR END_YEAR
+    # --all-indices also fills the long-format index store
     # -------------------------------
-    if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
-
-        # -------------------------------
-        # Important columns
-        # -------------------------------
-
-        required_columns = [
-        "Index Name",
-        "Open Index Value",
-        "High Index Value",
-        "Low Index Value",
-        "Closing Index Value",
-        "Points Change",
-        "Change(%)",
-        "Volume",
-        "Turnover (Rs. Cr.)",
-        "P/E",
-        "P/B",
-        "Div Yield",
-        "trade_date"
-        ]
-
-        final_df = final_df[required_columns]
-
-        # Clean column names for output
-        final_df.columns = [
-            col.lower().strip().replace(" ", "_")
-            for col in final_df.columns
-        ]
-
-        output_path = (
-            INDEX_PROCESSED_DIR / "yearly" /
-            f"nifty50_index_{target_year}.csv"
-        )
-
-        final_df.to_csv(output_path, index=False)
-
-        logger.info(
-            f"Index merge completed successfully for {target_year}"
-        )
-        logger.info(f"Saved to: {output_path}")
-
-    else:
-        logger.warning(f"No data merged for {target_year}")
+    all_indices = "--all-indices" in sys.argv[1:]
+    years = [arg for arg in sys.argv[1:] if arg != "--all-indices"]
+
+    if len(years) not in (1, 2):
+        print("Usage: python -m scripts.merge_index YEAR [END_YEAR] [--all-indices]")
+        sys.exit(1)
+
+    start_year = int(years[0])
+    end_year = int(years[-1])
+
+    merge_years(start_year, end_year, all_indices=all_indices)
 
 
 # -------------------------------
 # Entry Point
 # -------------------------------
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
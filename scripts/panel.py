@@ -0,0 +1,219 @@
+import shutil
+import sys
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from scripts.config import PROCESSED_DIR
+from scripts.logger import get_logger, setup_logging, timed
+from scripts.manifest import read_json, write_json
+from scripts.store import DATASETS, load_equity
+
+logger = get_logger("panel")
+
+# -----------------------------------------
+# Dense (trade_date x symbol) panel cache of the equity store
+#   equity/panel/dates.npy       datetime64[D] axis
+#   equity/panel/symbols.npy     symbol axis (sorted)
+#   equity/panel/<field>.npy     float32 (dates, symbols), NaN = no row
+#   equity/panel/meta.json       shape + source partition fingerprints
+#
+#   python -m scripts.panel          (rebuild if the store changed)
+#   python -m scripts.panel --force
+#
+# Fields are .npy files opened with mmap_mode="r": loading is an
+# mmap, and panel["close"][rows, cols] reads only the pages touched.
+# -----------------------------------------
+PANEL_DIR = PROCESSED_DIR / "equity" / "panel"
+META_FILE = PANEL_DIR / "meta.json"
+
+FIELDS = [
+    "open",
+    "high",
+    "low",
+    "close",
+    "last",
+    "prevclose",
+    "tottrdqty",
+    "tottrdval",
+    "totaltrades",
+]
+
+# float32 keeps ~7 significant digits (relative error up to ~6e-8).
+# Tick prices are not exact (0.05 has no binary representation), and
+# from 2^19 (524,288) on, float32 steps are coarser than a 0.05 tick.
+# Traded value and quantity carry the same relative error.
+DTYPE = np.float32
+
+
+# -----------------------------------------
+# Build
+# -----------------------------------------
+def source_fingerprint():
+    """
+    {partition: [size, mtime_ns]} of the equity store files.
+    """
+    root = DATASETS["equity"]["root"]
+
+    return {
+        str(path.parent.relative_to(root)): [path.stat().st_size, path.stat().st_mtime_ns]
+        for path in sorted(root.rglob("part-0.parquet"))
+    }
+
+
+def is_stale():
+    return read_json(META_FILE).get("source") != source_fingerprint()
+
+
+def symbol_axis(symbols):
+    """
+    (column of every row, alphabetically sorted symbol axis).
+    symbol_positions binary-searches the axis, so it must be sorted
+    by value: a categorical factorizes in category order, so its
+    codes are remapped through the sorted order of the categories
+    in use (no per-row strings are built).
+    """
+    if not isinstance(symbols.dtype, pd.CategoricalDtype):
+        index, axis = pd.factorize(symbols, sort=True)
+        return index, np.asarray(axis, dtype=str)
+
+    codes = symbols.cat.codes.to_numpy()
+    used = np.unique(codes)
+    names = np.asarray(symbols.cat.categories, dtype=str)[used]
+
+    order = np.argsort(names, kind="stable")
+
+    columns = np.empty(len(symbols.cat.categories), dtype=np.int64)
+    columns[used[order]] = np.arange(len(used))
+
+    return columns[codes], names[order]
+
+
+@timed("panel")
+def build_panel():
+    """
+    Write every field of the equity store as a (dates, symbols)
+    float32 memmap. Keys and fields are read in one scan, so every
+    value lands in the cell of its own row; each column is dropped
+    from the frame once written. Built into a temporary directory and
+    swapped in, so readers never see a half-written panel.
+    """
+    source = source_fingerprint()
+    rows = load_equity(columns=["symbol", "trade_date"] + FIELDS)
+
+    dates, date_index = np.unique(
+        rows.pop("trade_date").to_numpy(dtype="datetime64[D]"), return_inverse=True
+    )
+    symbol_index, symbols = symbol_axis(rows.pop("symbol"))
+
+    shape = (len(dates), len(symbols))
+    cells = date_index.astype(np.int64) * shape[1] + symbol_index
+
+    tmp_dir = PANEL_DIR.with_name(PANEL_DIR.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    np.save(tmp_dir / "dates.npy", dates)
+    np.save(tmp_dir / "symbols.npy", symbols)
+
+    for field in FIELDS:
+        values = rows.pop(field).to_numpy(dtype=np.float64, na_value=np.nan)
+
+        matrix = np.lib.format.open_memmap(
+            tmp_dir / f"{field}.npy", mode="w+", dtype=DTYPE, shape=shape
+        )
+        matrix[:] = np.nan
+        matrix.reshape(-1)[cells] = values
+        matrix.flush()
+        del matrix
+
+        logger.info(f"Panel field written: {field}")
+
+    write_json(tmp_dir / META_FILE.name, {
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "shape": list(shape),
+        "fields": FIELDS,
+        "dtype": np.dtype(DTYPE).name,
+        "source": source,
+    })
+
+    shutil.rmtree(PANEL_DIR, ignore_errors=True)
+    tmp_dir.rename(PANEL_DIR)
+
+    logger.info(
+        f"Panel built: {shape[0]} dates x {shape[1]} symbols, "
+        f"{len(FIELDS)} fields -> {PANEL_DIR}"
+    )
+    return shape
+
+
+# -----------------------------------------
+# Load
+# -----------------------------------------
+def load_panel(fields=None):
+    """
+    {"dates", "symbols", <field>: read-only memmap} for the given
+    fields (all by default). Nothing is read until a field is sliced:
+    panel["close"][rows, cols] with positions from date_positions /
+    symbol_positions, or panel["close"][:, cols] for whole columns.
+    """
+    if not META_FILE.exists():
+        raise FileNotFoundError(
+            f"No panel at {PANEL_DIR}. Run: python -m scripts.panel"
+        )
+
+    if is_stale():
+        logger.warning("Panel is older than the equity store. Run: python -m scripts.panel")
+
+    panel = {
+        "dates": np.load(PANEL_DIR / "dates.npy"),
+        "symbols": np.load(PANEL_DIR / "symbols.npy"),
+    }
+
+    for field in fields or FIELDS:
+        panel[field] = np.load(PANEL_DIR / f"{field}.npy", mmap_mode="r")
+
+    return panel
+
+
+def date_positions(panel, start=None, end=None):
+    """
+    Row slice for an inclusive date window. A slice keeps
+    panel[field][rows] a zero-copy view.
+    """
+    dates = panel["dates"]
+
+    first = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "D"))
+    last = len(dates) if end is None else np.searchsorted(
+        dates, np.datetime64(end, "D"), side="right"
+    )
+
+    return slice(int(first), int(last))
+
+
+def symbol_positions(panel, symbols):
+    """
+    Column positions of the given symbols (KeyError if missing).
+    """
+    axis = panel["symbols"]
+    symbols = np.asarray(symbols, dtype=str)
+
+    positions = np.searchsorted(axis, symbols)
+    found = (positions < len(axis)) & (axis[np.minimum(positions, len(axis) - 1)] == symbols)
+
+    if not found.all():
+        raise KeyError(f"Symbols not in panel: {symbols[~found].tolist()}")
+
+    return positions
+
+
+def main():
+    setup_logging()
+    if "--force" not in sys.argv[1:] and META_FILE.exists() and not is_stale():
+        logger.info("Panel is up to date.")
+        return
+
+    build_panel()
+
+
+if __name__ == "__main__":
+    main()
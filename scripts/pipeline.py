@@ -0,0 +1,660 @@
+import hashlib
+import multiprocessing
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from scripts import (
+    build_equity_master,
+    build_features,
+    build_index_master,
+    download_bhavcopy,
+    download_index,
+    merge_bhavcopy,
+    merge_index,
+    panel,
+    raw_archive,
+    securities,
+    universe,
+    validate_pipeline,
+)
+from scripts.config import BASE_DIR, METADATA_DIR, PROJECT_DIR
+from scripts.logger import Telemetry, get_logger, setup_logging
+from scripts.manifest import read_json, write_json
+from scripts.schemas import read_csv_table
+from scripts.store import DATASETS, INDEX_LONG_DIR, master_sections, replace_year
+
+logger = get_logger("pipeline")
+
+# -----------------------------------------
+# Pipeline orchestrator
+#   python -m scripts.pipeline                       (changed stages only)
+#   python -m scripts.pipeline --download START END  (fetch new days first)
+#   python -m scripts.pipeline --repack              (fold closed years of
+#                                                     raw files into archives)
+#   python -m scripts.pipeline --notebooks           (also export the CSV masters
+#                                                     and execute notebooks)
+#   python -m scripts.pipeline --force               (rebuild everything)
+#   python -m scripts.pipeline --dry-run             (list what would run)
+#   python -m scripts.pipeline --in-memory START END (one-process chain,
+#                                                     no stage skipping)
+#
+# Stages form a DAG; each stage is split into units (one per year
+# where the stage works year by year). A unit's digest covers the
+# content hash of its input files, the source of the modules it runs
+# and its parameters. Units whose digest matches the last successful
+# run and whose outputs still exist are skipped. Equity and index
+# branches run in parallel.
+# -----------------------------------------
+STATE_FILE = METADATA_DIR / "pipeline_state.json"
+
+EQUITY_YEARLY_DIR = BASE_DIR / "data" / "processed" / "equity" / "yearly"
+INDEX_YEARLY_DIR = BASE_DIR / "data" / "processed" / "index" / "yearly"
+SCRIPTS_DIR = PROJECT_DIR / "scripts"
+NOTEBOOKS_DIR = PROJECT_DIR / "notebooks"
+EXECUTED_DIR = METADATA_DIR / "notebooks"
+
+# Parquet masters and the directory of their CSV exports
+MASTERS = {
+    "equity": (build_equity_master.EQUITY_PARQUET_DIR, build_equity_master.EQUITY_MASTER_DIR, "nse_master_"),
+    "index": (build_index_master.INDEX_PARQUET_DIR, build_index_master.INDEX_MASTER_DIR, "nifty50_index_master_"),
+}
+
+# Branches in flight at once (equity and index)
+MAX_WORKERS = 2
+
+# Process pools started from the branch threads: forking a process
+# while another thread holds a lock (logging, pyarrow, malloc) can
+# leave the child deadlocked, so their workers start from a clean
+# forkserver (spawn where it is unavailable)
+POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+# Read size for content hashes
+CHUNK_SIZE = 1 << 20
+
+# Modules every stage depends on
+SHARED_CODE = ["config", "schemas", "store"]
+
+
+# -----------------------------------------
+# Fingerprints
+# -----------------------------------------
+def file_hash(path, hashes):
+    """
+    sha256 of a file. hashes caches {path: [size, mtime_ns, sha256]}
+    across runs, so only files whose size or mtime changed are read
+    again; a touched but unchanged file still hashes the same.
+    """
+    # Raw archive members carry their manifest hash
+    if getattr(path, "sha256", None):
+        return path.sha256
+
+    stat = path.stat()
+    key = str(path)
+    cached = hashes.get(key)
+
+    if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    hashes[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return hashes[key][2]
+
+
+def unit_digest(stage, unit, hashes):
+    """
+    Digest of one unit: input file hashes + stage code + parameters.
+    """
+    digest = hashlib.sha256()
+
+    for module in sorted(set(SHARED_CODE + stage["code"])):
+        path = SCRIPTS_DIR / f"{module}.py"
+        digest.update(f"code:{module}:{file_hash(path, hashes)}\n".encode())
+
+    for path in sorted(unit["inputs"]):
+        name = path.relative_to(BASE_DIR)
+        digest.update(f"input:{name}:{file_hash(path, hashes)}\n".encode())
+
+    digest.update(f"params:{sorted(unit.get('params', {}).items())}".encode())
+    return digest.hexdigest()
+
+
+def code_digest(stage, unit, hashes):
+    """
+    Digest of a unit's code and parameters only.
+    """
+    digest = hashlib.sha256()
+
+    for module in sorted(set(SHARED_CODE + stage["code"])):
+        path = SCRIPTS_DIR / f"{module}.py"
+        digest.update(f"code:{module}:{file_hash(path, hashes)}\n".encode())
+
+    digest.update(f"params:{sorted(unit.get('params', {}).items())}".encode())
+    return digest.hexdigest()
+
+
+def input_hashes(unit, hashes):
+    return {
+        str(path.relative_to(BASE_DIR)): file_hash(path, hashes)
+        for path in sorted(unit["inputs"])
+    }
+
+
+def changed_inputs(previous, code, inputs):
+    """
+    Inputs of an incremental unit that changed since its last run,
+    or None when it must be rebuilt in full: no recorded run, changed
+    code or parameters, or an input that is gone.
+    """
+    if previous.get("code") != code or "inputs" not in previous:
+        return None
+
+    if set(previous["inputs"]) - set(inputs):
+        return None
+
+    return [
+        name for name, sha256 in inputs.items()
+        if previous["inputs"].get(name) != sha256
+    ]
+
+
+def dataset_files(kind):
+    return sorted(DATASETS[kind]["root"].rglob("part-0.parquet"))
+
+
+# -----------------------------------------
+# Stage units: {unit name: {"inputs", "outputs", "params"}}
+# Inputs are resolved when the stage becomes ready, so they see
+# the files its upstream stages just wrote.
+# -----------------------------------------
+def merge_equity_units():
+    by_year = merge_bhavcopy.index_sources(1900, 2100)
+
+    # Calendar order: security ids are assigned as years are merged
+    return {
+        str(year): {
+            "inputs": [source for _, source in files],
+            "outputs": [EQUITY_YEARLY_DIR / f"nse_{year}.csv"],
+        }
+        for year, files in sorted(by_year.items())
+    }
+
+
+def merge_index_units():
+    by_year = merge_index.index_sources(1900, 2100)
+
+    # The long-format store is kept up to date once it exists
+    all_indices = INDEX_LONG_DIR.exists()
+
+    return {
+        str(year): {
+            "inputs": [file for _, file in files],
+            "outputs": [INDEX_YEARLY_DIR / f"nifty50_index_{year}.csv"],
+            "params": {"all_indices": all_indices},
+        }
+        for year, files in by_year.items()
+    }
+
+
+def yearly_units(directory, pattern, kind):
+    return {
+        path.stem.rsplit("_", 1)[-1]: {
+            "inputs": [path],
+            "outputs": [DATASETS[kind]["root"] / f"year={path.stem.rsplit('_', 1)[-1]}"],
+        }
+        for path in sorted(directory.glob(pattern))
+    }
+
+
+def master_unit(directory, pattern):
+    return {"all": {"inputs": sorted(directory.glob(pattern)), "outputs": []}}
+
+
+def csv_master_units():
+    # The notebooks compare the CSV export against the Parquet master
+    units = {}
+
+    for kind, (parquet_dir, master_dir, prefix) in MASTERS.items():
+        masters = sorted(parquet_dir.glob(f"{prefix}*.parquet"))
+
+        if masters:
+            units[kind] = {
+                "inputs": master_sections(masters[-1]),
+                "outputs": [master_dir / f"{masters[-1].stem}.csv"],
+            }
+
+    return units
+
+
+def store_unit(*kinds):
+    return {
+        "all": {
+            "inputs": [path for kind in kinds for path in dataset_files(kind)],
+            "outputs": [],
+        }
+    }
+
+
+def universe_units():
+    # Constituents files are inputs too: editing one rebuilds its universe
+    unit = store_unit("equity")
+    unit["all"]["inputs"] += sorted(universe.CONSTITUENTS_DIR.glob("*.csv"))
+    return unit
+
+
+def notebook_units():
+    return {
+        path.stem: {
+            "inputs": [path] + dataset_files("equity") + dataset_files("index"),
+            "outputs": [EXECUTED_DIR / path.name],
+        }
+        for path in sorted(NOTEBOOKS_DIR.glob("*.ipynb"))
+    }
+
+
+# -----------------------------------------
+# Stage runners (one unit each, in process)
+# -----------------------------------------
+def changed_start(unit):
+    """
+    (full, since) for an incremental unit: full when it must be
+    rebuilt in full (see changed_inputs) or a changed input is not a
+    store partition, else since is the first date of the earliest
+    changed partition (None when no partition changed).
+    """
+    if unit["changed"] is None:
+        return True, None
+
+    starts = []
+
+    for name in unit["changed"]:
+        path = BASE_DIR / name
+
+        if path.name != "part-0.parquet":
+            return True, None
+
+        dates = pq.read_table(path, columns=["trade_date"]).column(0)
+        starts.append(pd.Timestamp(pc.min(dates).as_py()))
+
+    return False, min(starts, default=None)
+
+
+def run_features(unit):
+    full, since = changed_start(unit)
+    start = build_features.next_start()
+
+    if full or start is None:
+        build_features.build(None)
+    else:
+        build_features.build(start if since is None else min(since, start))
+
+
+def run_universe(unit):
+    full, since = changed_start(unit)
+    universe.build(full=full, since=since)
+
+
+def partition_year(kind, fmt, path):
+    if kind == "equity":
+        merge_bhavcopy.backfill_security_ids()
+
+    table = read_csv_table(path, fmt)
+    year = path.stem.rsplit("_", 1)[-1]
+
+    replace_year(kind, year, table.to_pandas() if table is not None else None)
+
+
+def export_csv_master(sections, csv_path):
+    """
+    Stream the section files of a Parquet master into its CSV export,
+    one row group at a time, replacing the exports of other year
+    ranges.
+    """
+    prefix = csv_path.stem.rsplit("_", 2)[0]
+
+    for stale in csv_path.parent.glob(f"{prefix}_*.csv"):
+        if stale != csv_path:
+            stale.unlink()
+
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = csv_path.with_name(csv_path.name + ".tmp")
+    header = True
+
+    with open(tmp_path, "w", newline="") as f:
+        for path in sections:
+            for batch in pq.ParquetFile(path).iter_batches():
+                batch.to_pandas().to_csv(f, header=header, index=False)
+                header = False
+
+    tmp_path.replace(csv_path)
+
+
+def run_validation():
+    if not validate_pipeline.validate()["passed"]:
+        raise RuntimeError(f"Validation failed, see {validate_pipeline.REPORT_FILE}")
+
+
+def run_notebook(path):
+    """
+    Execute a notebook into EXECUTED_DIR (the source notebook is left
+    as is, so executing it does not change its own fingerprint).
+    """
+    result = subprocess.run(
+        [
+            "jupyter", "nbconvert", "--to", "notebook", "--execute",
+            "--output-dir", str(EXECUTED_DIR), str(path),
+        ],
+        cwd=path.parent,
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Notebook {path.name} failed")
+
+
+STAGES = {
+    "merge_equity": {
+        "deps": [],
+        "code": ["merge_bhavcopy", "bhavcopy_reader"],
+        "units": merge_equity_units,
+        "run": lambda name, unit: merge_bhavcopy.merge_years(
+            int(name), int(name), mp_context=POOL_CONTEXT
+        ),
+    },
+    "merge_index": {
+        "deps": [],
+        "code": ["merge_index"],
+        "units": merge_index_units,
+        "run": lambda name, unit: merge_index.merge_years(
+            int(name),
+            int(name),
+            all_indices=unit["params"]["all_indices"],
+            mp_context=POOL_CONTEXT,
+        ),
+    },
+    "equity_master": {
+        "deps": ["merge_equity"],
+        "code": ["build_equity_master"],
+        "units": lambda: master_unit(EQUITY_YEARLY_DIR, "nse_*.csv"),
+        "run": lambda name, unit: build_equity_master.build_master(),
+    },
+    "index_master": {
+        "deps": ["merge_index"],
+        "code": ["build_index_master"],
+        "units": lambda: master_unit(INDEX_YEARLY_DIR, "nifty50_index_*.csv"),
+        "run": lambda name, unit: build_index_master.build_master(),
+    },
+    "equity_dataset": {
+        "deps": ["merge_equity"],
+        "code": [],
+        "units": lambda: yearly_units(EQUITY_YEARLY_DIR, "nse_*.csv", "equity"),
+        "run": lambda name, unit: partition_year(
+            "equity", "equity_yearly", unit["inputs"][0]
+        ),
+    },
+    "index_dataset": {
+        "deps": ["merge_index"],
+        "code": [],
+        "units": lambda: yearly_units(INDEX_YEARLY_DIR, "nifty50_index_*.csv", "index"),
+        "run": lambda name, unit: partition_year(
+            "index", "index_yearly", unit["inputs"][0]
+        ),
+    },
+    "validate": {
+        "deps": ["equity_dataset", "index_dataset"],
+        "code": ["validate_pipeline"],
+        "units": lambda: store_unit("equity", "index"),
+        "run": lambda name, unit: run_validation(),
+    },
+    "features": {
+        "deps": ["validate"],
+        "code": ["build_features", "equity_features", "index_features", "breadth", "cross_section"],
+        "units": lambda: store_unit("equity", "index"),
+        "run": lambda name, unit: run_features(unit),
+        "incremental": True,
+    },
+    "universe": {
+        "deps": ["validate"],
+        "code": ["universe", "equity_features", "build_features"],
+        "units": universe_units,
+        "run": lambda name, unit: run_universe(unit),
+        "incremental": True,
+    },
+    "panel": {
+        "deps": ["validate"],
+        "code": ["panel"],
+        "units": lambda: store_unit("equity"),
+        "run": lambda name, unit: panel.build_panel(),
+    },
+    "csv_masters": {
+        "deps": ["equity_master", "index_master"],
+        "code": [],
+        "units": csv_master_units,
+        "run": lambda name, unit: export_csv_master(unit["inputs"], unit["outputs"][0]),
+        "optional": True,
+    },
+    "notebooks": {
+        "deps": ["validate", "csv_masters"],
+        "code": [],
+        "units": notebook_units,
+        "run": lambda name, unit: run_notebook(unit["inputs"][0]),
+        "optional": True,
+    },
+}
+
+
+# -----------------------------------------
+# Scheduler
+# -----------------------------------------
+def run_stage(name, state, hashes, force=False, dry_run=False):
+    """
+    Run the changed units of one stage, in order. Returns the number
+    of units run. A failing unit stops the stage (its digest is not
+    recorded, so it runs again next time).
+    """
+    stage = STAGES[name]
+    done = state.setdefault(name, {})
+    ran = 0
+
+    for unit_name, unit in stage["units"]().items():
+        unit.setdefault("params", {})
+        digest = unit_digest(stage, unit, hashes)
+
+        current = (
+            not force
+            and done.get(unit_name, {}).get("digest") == digest
+            and all(path.exists() for path in unit["outputs"])
+        )
+
+        if current:
+            continue
+
+        if dry_run:
+            logger.info(f"[{name}] would run {unit_name}")
+            print(f"{name}: {unit_name}")
+            ran += 1
+            continue
+
+        started = time.perf_counter()
+        logger.info(f"[{name}] running {unit_name}")
+
+        record = {}
+
+        if stage.get("incremental"):
+            record["code"] = code_digest(stage, unit, hashes)
+            record["inputs"] = input_hashes(unit, hashes)
+
+            unit["changed"] = None if force else changed_inputs(
+                done.get(unit_name, {}), record["code"], record["inputs"]
+            )
+
+        with Telemetry("pipeline", pipeline_stage=name, unit=unit_name):
+            stage["run"](unit_name, unit)
+
+        done[unit_name] = {
+            "digest": digest,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - started, 2),
+            **record,
+        }
+        ran += 1
+
+    return ran
+
+
+def run(force=False, dry_run=False, notebooks=False):
+    """
+    Run the DAG: every stage starts once its dependencies succeeded.
+    Returns {stage: units run}; failed stages map to None.
+    """
+    stages = [
+        name for name, stage in STAGES.items()
+        if notebooks or not stage.get("optional")
+    ]
+
+    saved = read_json(STATE_FILE)
+    state = saved.get("stages", {})
+    hashes = saved.get("hashes", {})
+
+    results = {}
+    pending = set(stages)
+    running = {}
+
+    def save():
+        # Workers keep adding entries: dump copies (dict() copies
+        # without releasing the GIL)
+        if not dry_run:
+            write_json(STATE_FILE, {
+                "stages": {name: dict(units) for name, units in dict(state).items()},
+                "hashes": dict(hashes),
+            })
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        while pending or running:
+            for name in sorted(pending):
+                deps = STAGES[name]["deps"]
+
+                if any(results.get(dep, 0) is None for dep in deps):
+                    logger.error(f"[{name}] skipped: an upstream stage failed")
+                    results[name] = None
+                    pending.discard(name)
+
+                elif all(dep in results for dep in deps):
+                    pending.discard(name)
+                    running[pool.submit(
+                        run_stage, name, state, hashes, force, dry_run
+                    )] = name
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                name = running.pop(future)
+
+                try:
+                    results[name] = future.result()
+                    logger.info(f"[{name}] {results[name]} units run")
+                except Exception as e:
+                    logger.error(f"[{name}] failed - {e}")
+                    results[name] = None
+
+                save()
+
+    return results
+
+
+def run_in_memory(start_year: int, end_year: int, save_yearly: bool = True) -> dict:
+    """
+    merge -> master -> partitioned store -> validate for a year range
+    in one process. Each stage gets the previous stage's DataFrames
+    directly (no CSV round trip between them). The yearly CSVs are
+    still written when save_yearly is set. The master covers only
+    these years. Returns the validation report.
+    """
+    equity = merge_bhavcopy.merge_years(start_year, end_year, save=False)
+    index = merge_index.merge_years(start_year, end_year, save=False)
+
+    if save_yearly:
+        for year, df in equity.items():
+            # The unsaved merge kept its new securities in memory:
+            # registering the years again in order gives the same ids
+            securities.assign_security_ids(df)
+            merge_bhavcopy.save_year(year, df)
+        for year, df in index.items():
+            merge_index.save_year(year, df)
+
+    build_equity_master.build_master(equity)
+    build_index_master.build_master(index)
+
+    for kind, frames in (("equity", equity), ("index", index)):
+        for year, df in frames.items():
+            replace_year(kind, year, df)
+
+    return validate_pipeline.validate_tables({
+        "equity": pd.concat(equity.values(), ignore_index=True),
+        "index": pd.concat(index.values(), ignore_index=True),
+    })
+
+
+def main():
+    setup_logging()
+    args = sys.argv[1:]
+
+    if "--in-memory" in args:
+        position = args.index("--in-memory")
+        start_year, end_year = args[position + 1:position + 3]
+
+        report = run_in_memory(int(start_year), int(end_year))
+        print("Validation", "passed" if report["passed"] else "FAILED")
+        sys.exit(0 if report["passed"] else 1)
+
+    if "--download" in args:
+        position = args.index("--download")
+        start_year, end_year = args[position + 1:position + 3]
+
+        # New trading days are only known remotely: always attempted
+        download_bhavcopy.download(int(start_year), int(end_year))
+        download_index.download(int(start_year), int(end_year))
+
+    # Archived members hash as the loose files they replace, so a
+    # repack does not invalidate the merge units
+    if "--repack" in args:
+        for dataset in raw_archive.DATASETS:
+            raw_archive.repack(dataset)
+
+    started = time.perf_counter()
+
+    dry_run = "--dry-run" in args
+
+    # A dry run only sees changes to inputs that exist now: stages
+    # downstream of a changed unit show up once it has actually run
+    results = run(
+        force="--force" in args,
+        dry_run=dry_run,
+        notebooks="--notebooks" in args,
+    )
+
+    for name, count in results.items():
+        action = "to run" if dry_run else "run"
+        status = "FAILED" if count is None else f"{count} units {action}"
+        print(f"{name:16s}{status}")
+
+    print(f"\nPipeline finished in {time.perf_counter() - started:.1f}s")
+
+    if any(count is None for count in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
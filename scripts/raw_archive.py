@@ -0,0 +1,535 @@
+import hashlib
+import io
+import os
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from functools import lru_cache, total_ordering
+from types import SimpleNamespace
+from scripts.config import METADATA_DIR, RAW_DATA_DIR
+from scripts.logger import get_logger, setup_logging
+from scripts.manifest import read_json, write_json
+
+logger = get_logger("raw_archive")
+
+# -----------------------------------------
+# Raw archive layer
+#   metadata/raw_archive/{dataset}.json   one entry per daily file:
+#       {"date", "url", "size", "sha256", "format", "archive"}
+#   raw/archive/{dataset}_{YYYY}.zip      closed years, one archive
+#                                         per year and dataset
+#
+#   python -m scripts.raw_archive repack [DATASET]   fold closed years
+#   python -m scripts.raw_archive verify [DATASET]   check every hash
+#   python -m scripts.raw_archive list DATASET YEAR
+#
+# Daily files land loose in raw/ (bhavcopy zips) and raw/index/
+# (index CSVs) and are recorded in the manifest once they pass an
+# integrity check. repack folds every year before the current one
+# into its archive: daily zips are stored as-is (no recompression),
+# index CSVs deflated, so each member still hashes to its manifest
+# sha256. Listing, verifying or re-reading an archived year opens
+# one file instead of ~250.
+# -----------------------------------------
+MANIFEST_DIR = METADATA_DIR / "raw_archive"
+ARCHIVE_DIR = RAW_DATA_DIR / "archive"
+
+DATASETS = {
+    "bhavcopy": {"dir": RAW_DATA_DIR, "pattern": "*.zip"},
+    "index": {"dir": RAW_DATA_DIR / "index", "pattern": "ind_close_all_*.csv"},
+}
+
+# Archives / years verified or packed at once (zlib and sha256
+# release the GIL on large buffers)
+MAX_WORKERS = 4
+
+# Suffix given to daily files that fail their integrity check, so
+# the next download fetches them again
+CORRUPT_SUFFIX = ".corrupt"
+
+
+# -----------------------------------------
+# Daily file names
+# -----------------------------------------
+def file_format(name):
+    if name.startswith("cm"):
+        return "old"
+    if name.startswith("BhavCopy"):
+        return "udiff"
+    if name.startswith("ind_close_all_"):
+        return "index"
+    return None
+
+
+def file_date(name):
+    """
+    Trade date encoded in a daily file name (None if unknown).
+    """
+    fmt = file_format(name)
+
+    try:
+        if fmt == "old":
+            return datetime.strptime(name[2:11], "%d%b%Y").date()
+        if fmt == "udiff":
+            return datetime.strptime(name.split("_")[6], "%Y%m%d").date()
+        if fmt == "index":
+            return datetime.strptime(name[14:22], "%d%m%Y").date()
+    except (ValueError, IndexError):
+        pass
+
+    return None
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_intact(name, data):
+    """
+    Structural check of a daily file: a zip must pass its CRCs and
+    hold a CSV; a CSV needs a header and at least one row.
+    """
+    if name.endswith(".zip"):
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                members = zf.namelist()
+                return (
+                    any(member.lower().endswith(".csv") for member in members)
+                    and zf.testzip() is None
+                )
+        except zipfile.BadZipFile:
+            return False
+
+    header, _, rows = data.partition(b"\n")
+    return bool(header.strip()) and bool(rows.strip())
+
+
+def describe(name, data, url=None):
+    """
+    Manifest entry of a daily file.
+    """
+    day = file_date(name)
+
+    return {
+        "date": day.isoformat() if day else None,
+        "url": url,
+        "size": len(data),
+        "sha256": sha256(data),
+        "format": file_format(name),
+        "archive": None,
+    }
+
+
+# -----------------------------------------
+# Manifest
+# -----------------------------------------
+def manifest_file(dataset):
+    return MANIFEST_DIR / f"{dataset}.json"
+
+
+def load_manifest(dataset):
+    return read_json(manifest_file(dataset))
+
+
+def save_manifest(dataset, manifest):
+    write_json(manifest_file(dataset), dict(sorted(manifest.items())))
+
+
+def loose_files(dataset):
+    cfg = DATASETS[dataset]
+    return sorted(cfg["dir"].glob(cfg["pattern"]))
+
+
+def quarantine(path):
+    target = path.with_name(path.name + CORRUPT_SUFFIX)
+    path.replace(target)
+    logger.error(f"Corrupt raw file moved aside: {target.name}")
+
+
+def record_downloads(dataset, downloads):
+    """
+    Check and record freshly downloaded files. downloads is a list
+    of (path, url). Files failing the integrity check are moved
+    aside. Returns the number recorded.
+    """
+    if not downloads:
+        return 0
+
+    manifest = load_manifest(dataset)
+    recorded = 0
+
+    for path, url in downloads:
+        data = path.read_bytes()
+
+        if not is_intact(path.name, data):
+            quarantine(path)
+            manifest.pop(path.name, None)
+            continue
+
+        manifest[path.name] = describe(path.name, data, url)
+        recorded += 1
+
+    save_manifest(dataset, manifest)
+    return recorded
+
+
+def stored_names(dataset):
+    """
+    Names of the daily files that need no download: archived, or
+    loose with the recorded size. Loose files missing from the
+    manifest (older downloads) are checked and recorded once;
+    failures are moved aside so they are fetched again.
+    """
+    manifest = load_manifest(dataset)
+    names = {name for name, entry in manifest.items() if entry["archive"]}
+    changed = False
+
+    for path in loose_files(dataset):
+        entry = manifest.get(path.name)
+
+        if entry is not None and entry["archive"] is None:
+            if path.stat().st_size == entry["size"]:
+                names.add(path.name)
+                continue
+
+            quarantine(path)
+            del manifest[path.name]
+            changed = True
+            continue
+
+        if entry is not None:
+            # Re-downloaded after it was archived: the archive wins
+            continue
+
+        data = path.read_bytes()
+        changed = True
+
+        if is_intact(path.name, data):
+            manifest[path.name] = describe(path.name, data)
+            names.add(path.name)
+        else:
+            quarantine(path)
+
+    if changed:
+        save_manifest(dataset, manifest)
+
+    return names
+
+
+# -----------------------------------------
+# Reading archived files
+# -----------------------------------------
+@lru_cache(maxsize=16)
+def _open_archive(path, mtime_ns, pid):
+    return zipfile.ZipFile(path)
+
+
+def open_archive(path):
+    """
+    Shared read handle on an archive, one per process and archive
+    version: a forked worker never reuses its parent's file offset.
+    """
+    return _open_archive(path, path.stat().st_mtime_ns, os.getpid())
+
+
+@total_ordering
+class ArchiveMember:
+    """
+    A daily file stored in a yearly archive. Reads like the loose
+    file it replaced (name, suffix, stat().st_size, read_bytes())
+    and orders / prints as that file's path.
+    """
+    def __init__(self, archive, path, size, sha256=None):
+        self.archive = archive
+        self.path = path
+        self.name = path.name
+        self.suffix = path.suffix
+        self.stem = path.stem
+        self.size = size
+        self.sha256 = sha256
+
+    def read_bytes(self):
+        return open_archive(self.archive).read(self.name)
+
+    def stat(self):
+        return SimpleNamespace(st_size=self.size)
+
+    def relative_to(self, other):
+        return self.path.relative_to(other)
+
+    def __str__(self):
+        return str(self.path)
+
+    def __repr__(self):
+        return f"ArchiveMember({self.archive.name}:{self.name})"
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __lt__(self, other):
+        return str(self) < str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+
+def archive_path(dataset, year):
+    return ARCHIVE_DIR / f"{dataset}_{year}.zip"
+
+
+def archives(dataset):
+    return sorted(ARCHIVE_DIR.glob(f"{dataset}_*.zip"))
+
+
+def archived_members(dataset, manifest=None):
+    """
+    {name: ArchiveMember} of every archived daily file (one archive
+    open per year).
+    """
+    manifest = load_manifest(dataset) if manifest is None else manifest
+    directory = DATASETS[dataset]["dir"]
+    members = {}
+
+    for archive in archives(dataset):
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                entry = manifest.get(info.filename, {})
+                members[info.filename] = ArchiveMember(
+                    archive, directory / info.filename, info.file_size, entry.get("sha256")
+                )
+
+    return members
+
+
+def sources(dataset):
+    """
+    {name: source} of every daily file: ArchiveMember for archived
+    days, Path for loose files (a loose file overrides the archive).
+    """
+    found = archived_members(dataset)
+
+    for path in loose_files(dataset):
+        found[path.name] = path
+
+    return found
+
+
+def list_year(dataset, year):
+    """
+    Daily file names of one year: the archive's directory plus any
+    loose files of that year.
+    """
+    names = set()
+    archive = archive_path(dataset, year)
+
+    if archive.exists():
+        with zipfile.ZipFile(archive) as zf:
+            names.update(zf.namelist())
+
+    names.update(
+        path.name for path in loose_files(dataset)
+        if (file_date(path.name) or date.min).year == year
+    )
+    return sorted(names)
+
+
+# -----------------------------------------
+# Repack
+# -----------------------------------------
+def verify_archive(archive, manifest):
+    """
+    Names of the members of an archive whose content does not match
+    the manifest (one open, every member read and hashed).
+    """
+    bad = []
+
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            entry = manifest.get(info.filename)
+
+            try:
+                data = zf.read(info)
+            except (zipfile.BadZipFile, OSError):
+                bad.append(info.filename)
+                continue
+
+            if entry is None or sha256(data) != entry["sha256"]:
+                bad.append(info.filename)
+
+    return bad
+
+
+def pack_year(dataset, year, paths, manifest):
+    """
+    Fold loose daily files into the year's archive (members already
+    archived are carried over), verify the new archive, then swap it
+    in. Returns the names packed; the caller updates the manifest
+    and removes the loose files.
+    """
+    archive = archive_path(dataset, year)
+    tmp_path = archive.with_name(archive.name + ".tmp")
+    archive.parent.mkdir(parents=True, exist_ok=True)
+
+    packed = []
+
+    try:
+        with zipfile.ZipFile(tmp_path, "w") as out:
+            names = {path.name for path in paths}
+
+            if archive.exists():
+                with zipfile.ZipFile(archive) as old:
+                    for info in old.infolist():
+                        if info.filename not in names:
+                            out.writestr(info, old.read(info))
+
+            for path in paths:
+                data = path.read_bytes()
+
+                if sha256(data) != manifest[path.name]["sha256"]:
+                    logger.error(f"Hash mismatch, left loose: {path.name}")
+                    continue
+
+                info = zipfile.ZipInfo(path.name, date_time=(year, 1, 1, 0, 0, 0))
+                info.compress_type = (
+                    zipfile.ZIP_STORED if path.suffix == ".zip" else zipfile.ZIP_DEFLATED
+                )
+                out.writestr(info, data)
+                packed.append(path.name)
+
+        bad = verify_archive(tmp_path, manifest)
+
+        if bad:
+            raise RuntimeError(f"{archive.name}: {len(bad)} members failed verification")
+
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    tmp_path.replace(archive)
+    logger.info(f"Packed {len(packed)} files into {archive.name}")
+
+    return packed
+
+
+def repack(dataset, before_year=None, max_workers=MAX_WORKERS):
+    """
+    Fold every loose file of the years before before_year (default:
+    the current year, i.e. closed years) into yearly archives, years
+    in parallel. Returns {year: files packed}. A year that fails is
+    left loose: the manifest is saved for the years that were packed
+    first, then a RuntimeError names the failed years.
+    """
+    before_year = before_year or date.today().year
+
+    stored_names(dataset)  # records / moves aside unrecorded loose files
+    manifest = load_manifest(dataset)
+
+    by_year = {}
+    for path in loose_files(dataset):
+        day = file_date(path.name)
+        entry = manifest.get(path.name)
+
+        if day and day.year < before_year and entry and entry["archive"] is None:
+            by_year.setdefault(day.year, []).append(path)
+
+    if not by_year:
+        logger.info(f"{dataset}: nothing to repack.")
+        return {}
+
+    packed = {}
+    failed = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            year: pool.submit(pack_year, dataset, year, paths, manifest)
+            for year, paths in by_year.items()
+        }
+
+        for year, future in futures.items():
+            try:
+                packed[year] = future.result()
+            except Exception as e:
+                logger.error(f"{dataset}: repacking {year} failed - {e}")
+                failed[year] = e
+
+    for year, names in packed.items():
+        for name in names:
+            manifest[name]["archive"] = archive_path(dataset, year).name
+
+    save_manifest(dataset, manifest)
+
+    # Loose copies go only once the manifest points at the archives
+    for year, names in packed.items():
+        for name in names:
+            (DATASETS[dataset]["dir"] / name).unlink()
+
+    if failed:
+        raise RuntimeError(
+            f"{dataset}: repacking failed for {', '.join(map(str, sorted(failed)))}"
+        )
+
+    return {year: len(names) for year, names in packed.items()}
+
+
+def verify(dataset, max_workers=MAX_WORKERS):
+    """
+    Check every archive member and loose file of a dataset against
+    the manifest, archives in parallel. Returns
+    {"archives", "files", "bad": [names]}.
+    """
+    manifest = load_manifest(dataset)
+    paths = archives(dataset)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        bad = [
+            name
+            for names in pool.map(lambda archive: verify_archive(archive, manifest), paths)
+            for name in names
+        ]
+
+    loose = loose_files(dataset)
+    for path in loose:
+        entry = manifest.get(path.name)
+        if entry is None or entry["archive"] is None and path.stat().st_size != entry["size"]:
+            bad.append(path.name)
+
+    archived = sum(1 for entry in manifest.values() if entry["archive"])
+
+    return {"archives": len(paths), "files": archived + len(loose), "bad": bad}
+
+
+def main():
+    setup_logging()
+    args = sys.argv[1:]
+    command = args[0] if args else None
+
+    if command == "list" and len(args) == 3:
+        for name in list_year(args[1], int(args[2])):
+            print(name)
+        return
+
+    if command not in ("repack", "verify"):
+        print("Usage: python -m scripts.raw_archive repack|verify [DATASET]")
+        print("       python -m scripts.raw_archive list DATASET YEAR")
+        sys.exit(1)
+
+    datasets = args[1:] or list(DATASETS)
+    failed = False
+
+    for dataset in datasets:
+        if command == "repack":
+            print(dataset, repack(dataset))
+        else:
+            result = verify(dataset)
+            print(f"{dataset}: {result['archives']} archives, {result['files']} files, "
+                  f"{len(result['bad'])} bad")
+            for name in result["bad"]:
+                print(f"  {name}")
+            failed = failed or bool(result["bad"])
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+from collections import namedtuple
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+# -----------------------------------------
+# Schema registry
+# One entry per raw file format:
+# (source column, target name, target dtype[, required])
+# -----------------------------------------
+Column = namedtuple("Column", ["source", "target", "dtype", "required"], defaults=[True])
+
+ARROW_TYPES = {
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    "string": pa.string(),
+    "float64": pa.float64(),
+    "int64": pa.int64(),
+    "int32": pa.int32(),
+    "timestamp": pa.timestamp("us"),
+}
+
+# Old bhavcopy: cmDDMONYYYYbhav.csv (up to 2023)
+OLD_BHAVCOPY = [
+    Column("SYMBOL", "symbol", "category"),
+    Column("SERIES", "series", "category"),
+    Column("OPEN", "open", "float64"),
+    Column("HIGH", "high", "float64"),
+    Column("LOW", "low", "float64"),
+    Column("CLOSE", "close", "float64"),
+    Column("LAST", "last", "float64"),
+    Column("PREVCLOSE", "prevclose", "float64"),
+    Column("TOTTRDQTY", "tottrdqty", "int64"),
+    Column("TOTTRDVAL", "tottrdval", "float64"),
+    Column("TOTALTRADES", "totaltrades", "int32"),
+    Column("ISIN", "isin", "category"),
+]
+
+# UDiFF bhavcopy: BhavCopy_NSE_CM_0_0_0_YYYYMMDD_F_0000.csv (2024+)
+UDIFF_BHAVCOPY = [
+    Column("Sgmt", "sgmt", "category"),
+    Column("TckrSymb", "symbol", "category"),
+    Column("SctySrs", "series", "category"),
+    Column("OpnPric", "open", "float64"),
+    Column("HghPric", "high", "float64"),
+    Column("LwPric", "low", "float64"),
+    Column("ClsPric", "close", "float64"),
+    Column("LastPric", "last", "float64"),
+    Column("PrvsClsgPric", "prevclose", "float64"),
+    Column("TtlTradgVol", "tottrdqty", "int64"),
+    Column("TtlTrfVal", "tottrdval", "float64"),
+    Column("TtlNbOfTxsExctd", "totaltrades", "int32"),
+    Column("ISIN", "isin", "category"),
+]
+
+# Index close: ind_close_all_DDMMYYYY.csv
+INDEX_CLOSE = [
+    Column("Index Name", "index_name", "category"),
+    Column("Open Index Value", "open_index_value", "float64"),
+    Column("High Index Value", "high_index_value", "float64"),
+    Column("Low Index Value", "low_index_value", "float64"),
+    Column("Closing Index Value", "closing_index_value", "float64"),
+    Column("Points Change", "points_change", "float64"),
+    Column("Change(%)", "change(%)", "float64"),
+    Column("Volume", "volume", "int64"),
+    Column("Turnover (Rs. Cr.)", "turnover_(rs._cr.)", "float64"),
+    Column("P/E", "p/e", "float64"),
+    Column("P/B", "p/b", "float64"),
+    Column("Div Yield", "div_yield", "float64"),
+]
+
+# Processed yearly CSVs written by merge_bhavcopy / merge_index
+TRADE_DATE = Column("trade_date", "trade_date", "timestamp")
+
+# security_id: stable int32 key from the security master (scripts.securities).
+# Optional: yearly files from before the master lack it until
+# merge_bhavcopy.backfill_security_ids rewrites them
+EQUITY_YEARLY = [
+    Column(column.target, column.target, column.dtype)
+    for column in OLD_BHAVCOPY
+] + [TRADE_DATE, Column("security_id", "security_id", "int32", required=False)]
+
+INDEX_YEARLY = [
+    Column(column.target, column.target, column.dtype)
+    for column in INDEX_CLOSE
+] + [TRADE_DATE]
+
+SCHEMAS = {
+    "old": OLD_BHAVCOPY,
+    "udiff": UDIFF_BHAVCOPY,
+    "index": INDEX_CLOSE,
+    "equity_yearly": EQUITY_YEARLY,
+    "index_yearly": INDEX_YEARLY,
+}
+
+# Streaming reads: ~16 MB of CSV per record batch
+BLOCK_SIZE = 16 << 20
+
+# Values NSE uses for "not available"
+NULL_VALUES = ["", "-", "NA", "N/A", "nan"]
+
+
+# -----------------------------------------
+# Format detection (header line only)
+# -----------------------------------------
+def read_header(data):
+    """
+    Raw column names from the first line of a CSV payload.
+    """
+    first_line = data.split(b"\n", 1)[0].rstrip(b"\r")
+    return first_line.decode("utf-8", errors="replace").split(",")
+
+
+def detect_format(header):
+    names = {name.strip().lower() for name in header}
+
+    if "symbol" in names and "series" in names:
+        return "old"
+
+    if "tckrsymb" in names:
+        return "udiff"
+
+    if "index name" in names:
+        return "index"
+
+    return None
+
+
+# -----------------------------------------
+# Typed, column-projected parsing
+# -----------------------------------------
+def _convert_options(fmt, header):
+    """
+    ConvertOptions projecting and typing the registered columns,
+    plus the target name for every projected column.
+    """
+    # Match registry columns against the actual header spelling
+    actual = {name.strip().lower(): name for name in header}
+
+    include = []
+    column_types = {}
+    targets = {}
+
+    for column in SCHEMAS[fmt]:
+        raw_name = actual.get(column.source.lower())
+
+        if raw_name is None and not column.required:
+            continue
+
+        if raw_name is None:
+            raise ValueError(f"Column '{column.source}' missing for {fmt} format")
+
+        include.append(raw_name)
+        column_types[raw_name] = ARROW_TYPES[column.dtype]
+        targets[raw_name] = column.target
+
+    options = pacsv.ConvertOptions(
+        include_columns=include,
+        column_types=column_types,
+        null_values=NULL_VALUES,
+        strings_can_be_null=True,
+    )
+
+    return options, targets
+
+
+def parse_csv(data, fmt=None):
+    """
+    Parse a CSV payload (bytes) with the pyarrow engine, reading only
+    the registered columns with their target dtypes.
+    Returns (format, DataFrame with target column names);
+    (None, None) if the format is not recognised.
+    """
+    if data.startswith(b"\xef\xbb\xbf"):
+        data = data[3:]  # UTF-8 BOM
+
+    header = read_header(data)
+    fmt = fmt or detect_format(header)
+
+    if fmt is None:
+        return None, None
+
+    options, targets = _convert_options(fmt, header)
+
+    table = pacsv.read_csv(
+        pa.py_buffer(data),
+        read_options=pacsv.ReadOptions(use_threads=False),
+        convert_options=options,
+    )
+
+    table = table.rename_columns([targets[name] for name in table.column_names])
+
+    return fmt, table.to_pandas()
+
+
+def iter_csv_batches(path, fmt, block_size=BLOCK_SIZE):
+    """
+    Stream a CSV file as typed Arrow record batches of the registered
+    columns, holding one block in memory at a time.
+    """
+    with open(path, "rb") as f:
+        header = read_header(f.readline())
+
+    options, targets = _convert_options(fmt, header)
+
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=options,
+    )
+
+    names = [targets[name] for name in reader.schema.names]
+
+    for batch in reader:
+        yield pa.RecordBatch.from_arrays(batch.columns, names=names)
+
+
+def read_csv_table(path, fmt):
+    """
+    Whole CSV file as one typed Arrow table of the registered columns.
+    """
+    batches = list(iter_csv_batches(path, fmt))
+
+    if not batches:
+        return None
+
+    return pa.Table.from_batches(batches)
+
+
+def restore_int_columns(df, fmt):
+    """
+    Integer columns holding nulls come back from Arrow as float64.
+    Once a frame is filtered, cast them back to their registered
+    integer dtype where no nulls remain.
+    """
+    casts = {
+        column.target: column.dtype
+        for column in SCHEMAS[fmt]
+        if column.dtype.startswith("int")
+        and column.target in df.columns
+        and df[column.target].dtype.kind == "f"
+        and df[column.target].notna().all()
+    }
+
+    return df.astype(casts) if casts else df
@@ -0,0 +1,229 @@
+import sys
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scripts.config import METADATA_DIR
+from scripts.logger import get_logger, setup_logging
+
+logger = get_logger("securities")
+
+# -----------------------------------------
+# Security master
+#   metadata/securities.parquet: one row per (security_id, isin,
+#   symbol) spell with the first and last trade date it was seen
+#
+#   python -m scripts.securities            (summary)
+#   python -m scripts.securities SYMBOL     (history of a symbol)
+#
+# security_id is a stable int32 keyed on the ISIN: a ticker change
+# (same ISIN, new symbol, e.g. across the old-format -> UDiFF switch)
+# keeps its id. An ISIN change that keeps the ticker (face value
+# split, scheme conversion) keeps the id too when the new ISIN
+# starts trading within MAX_ISIN_GAP_DAYS of the old one's last day.
+# Ids are never reused.
+# -----------------------------------------
+SECURITIES_FILE = METADATA_DIR / "securities.parquet"
+
+MAX_ISIN_GAP_DAYS = 10
+
+SCHEMA = pa.schema([
+    ("security_id", pa.int32()),
+    ("isin", pa.string()),
+    ("symbol", pa.string()),
+    ("first_date", pa.timestamp("us")),
+    ("last_date", pa.timestamp("us")),
+])
+
+
+def load_securities():
+    """
+    Every spell of the master (empty frame before the first merge).
+    """
+    if not SECURITIES_FILE.exists():
+        return SCHEMA.empty_table().to_pandas()
+
+    return pq.read_table(SECURITIES_FILE).to_pandas()
+
+
+def save_securities(spells):
+    spells = spells.sort_values(["security_id", "first_date"], kind="stable")
+
+    SECURITIES_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = SECURITIES_FILE.with_name(SECURITIES_FILE.name + ".tmp")
+
+    pq.write_table(pa.Table.from_pandas(spells, schema=SCHEMA, preserve_index=False), tmp_path)
+    tmp_path.replace(SECURITIES_FILE)
+
+
+# -----------------------------------------
+# Id assignment (merge time)
+# -----------------------------------------
+def register_security_ids(df, spells):
+    """
+    int32 security_id for every row of an equity frame (isin, symbol,
+    trade_date), registering new securities and spells in spells (a
+    frame as from load_securities). Returns (ids, updated spells);
+    nothing is saved. Work is per distinct (isin, symbol) pair, not
+    per row. Frames should be registered in date order (merge
+    finishes years in order) so ISIN changes are matched to the
+    ticker's past.
+    """
+    groups = df.groupby(
+        [df["isin"], df["symbol"]], observed=True, dropna=False, sort=False
+    )
+    codes = groups.ngroup().to_numpy()
+    spans = groups["trade_date"].agg(["min", "max"]).reset_index()
+
+    # (security_id, isin, symbol) -> [first_date, last_date]; missing
+    # ISINs read back from the master as NaN are keyed as None
+    known = {
+        (row.security_id, row.isin if pd.notna(row.isin) else None, row.symbol):
+            [row.first_date, row.last_date]
+        for row in spells.itertuples(index=False)
+    }
+    by_isin = {isin: sid for sid, isin, _ in known if pd.notna(isin)}
+
+    # symbol -> (security_id, isin, last_date) of its latest spell
+    latest = {}
+    for (sid, isin, symbol), (_, last) in sorted(known.items(), key=lambda item: item[1][1]):
+        latest[symbol] = (sid, isin, last)
+
+    next_id = int(spells["security_id"].max()) + 1 if len(spells) else 1
+    ids = np.empty(len(spans), dtype=np.int32)
+    added = 0
+
+    for position in spans.sort_values("min", kind="stable").index:
+        isin, symbol, first, last = spans.loc[position, ["isin", "symbol", "min", "max"]]
+        isin = None if pd.isna(isin) else str(isin)
+        symbol = str(symbol)
+
+        previous = latest.get(symbol)
+
+        if isin in by_isin:
+            sid = by_isin[isin]
+        elif previous is not None and (
+            isin is None
+            or 0 < (first - previous[2]).days <= MAX_ISIN_GAP_DAYS
+        ):
+            # No ISIN on the row, or the ticker moved to a new ISIN
+            sid = previous[0]
+        else:
+            sid = next_id
+            next_id += 1
+            added += 1
+
+        if isin is not None:
+            by_isin.setdefault(isin, sid)
+
+        spell = known.setdefault((sid, isin, symbol), [first, last])
+        spell[0] = min(spell[0], first)
+        spell[1] = max(spell[1], last)
+
+        if previous is None or spell[1] >= previous[2]:
+            latest[symbol] = (sid, isin, spell[1])
+
+        ids[position] = sid
+
+    spells = pd.DataFrame(
+        [(sid, isin, symbol, first, last) for (sid, isin, symbol), (first, last) in known.items()],
+        columns=SCHEMA.names,
+    )
+
+    if added:
+        logger.info(f"Security master: {added} new securities ({next_id - 1} total)")
+
+    return ids[codes], spells
+
+
+def assign_security_ids(df):
+    """
+    register_security_ids against the saved master, which is saved
+    with the new securities.
+    """
+    ids, spells = register_security_ids(df, load_securities())
+    save_securities(spells)
+    return ids
+
+
+def add_security_ids(df):
+    """
+    df with a security_id column (see assign_security_ids).
+    """
+    df = df.copy(deep=False)
+    df["security_id"] = assign_security_ids(df)
+    return df
+
+
+# -----------------------------------------
+# Decoding (presentation time)
+# -----------------------------------------
+def current_names():
+    """
+    security_id -> latest symbol and isin, one row per id.
+    """
+    spells = load_securities().sort_values(["security_id", "last_date"], kind="stable")
+    return spells.drop_duplicates("security_id", keep="last").set_index("security_id")[
+        ["symbol", "isin"]
+    ]
+
+
+def decode(security_ids, field="symbol", names=None):
+    """
+    Categorical of the current symbol (or isin) of every id. One
+    lookup per distinct id; pass names=current_names() to decode
+    several columns against one read of the master.
+    """
+    names = current_names() if names is None else names
+    security_ids = np.asarray(security_ids)
+
+    unique, inverse = np.unique(security_ids, return_inverse=True)
+    labels = names[field].reindex(unique)
+
+    categories, label_codes = np.unique(labels.fillna("").to_numpy(dtype=str), return_inverse=True)
+    label_codes = np.where(labels.isna().to_numpy(), -1, label_codes)
+
+    return pd.Categorical.from_codes(label_codes[inverse], categories=categories)
+
+
+def with_names(df, fields=("symbol", "isin")):
+    """
+    df with its current symbol / isin decoded from security_id, for
+    display. Renamed securities show their latest ticker.
+    """
+    names = current_names()
+    df = df.copy(deep=False)
+
+    for field in fields:
+        df[field] = decode(df["security_id"].to_numpy(), field, names)
+
+    return df
+
+
+def symbol_history(symbol):
+    """
+    Every spell of the securities that traded under symbol.
+    """
+    spells = load_securities()
+    ids = spells.loc[spells["symbol"] == symbol, "security_id"].unique()
+    return spells[spells["security_id"].isin(ids)].reset_index(drop=True)
+
+
+def main():
+    setup_logging()
+    if len(sys.argv) > 1:
+        print(symbol_history(sys.argv[1].upper()).to_string(index=False))
+        return
+
+    spells = load_securities()
+    renamed = spells.groupby("security_id")["symbol"].nunique()
+    reissued = spells.groupby("security_id")["isin"].nunique()
+
+    print(f"Securities: {spells['security_id'].nunique()}")
+    print(f"Spells: {len(spells)}")
+    print(f"Renamed (several symbols): {(renamed > 1).sum()}")
+    print(f"Re-issued (several ISINs): {(reissued > 1).sum()}")
+
+
+if __name__ == "__main__":
+    main()
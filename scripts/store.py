@@ -0,0 +1,704 @@
+import shutil
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from scripts.config import FEATURES_DIR, PROCESSED_DIR
+from scripts.logger import FileProgress, Telemetry, get_logger
+from scripts.schemas import ARROW_TYPES, SCHEMAS, iter_csv_batches
+
+logger = get_logger("store")
+
+# -----------------------------------------
+# Hive-partitioned Parquet datasets
+#   equity/dataset/year=YYYY/month=M/part-0.parquet
+#   index/dataset/year=YYYY/part-0.parquet
+#   index/long/year=YYYY/part-0.parquet  (every index, long format)
+#   features/{equity,index}/dataset/...   (scripts.build_features)
+#   universe/{name}.parquet               (scripts.universe)
+# -----------------------------------------
+EQUITY_DATASET_DIR = PROCESSED_DIR / "equity" / "dataset"
+INDEX_DATASET_DIR = PROCESSED_DIR / "index" / "dataset"
+INDEX_LONG_DIR = PROCESSED_DIR / "index" / "long"
+
+EQUITY_FEATURES_DIR = FEATURES_DIR / "equity" / "dataset"
+INDEX_FEATURES_DIR = FEATURES_DIR / "index" / "dataset"
+
+UNIVERSE_DIR = PROCESSED_DIR / "universe"
+
+# Small row groups keep min/max statistics selective for symbol lookups
+ROW_GROUP_SIZE = 2048
+
+DATASETS = {
+    "equity": {
+        "root": EQUITY_DATASET_DIR,
+        "partitions": ["year", "month"],
+        "sort_by": ["symbol", "trade_date"],
+        "keys": ["symbol", "trade_date"],
+        "schema": "equity_yearly",
+    },
+    "index": {
+        "root": INDEX_DATASET_DIR,
+        "partitions": ["year"],  # ~250 rows a year, months would be tiny files
+        "sort_by": ["trade_date"],
+        "keys": ["trade_date"],
+        "schema": "index_yearly",
+    },
+    "index_long": {
+        "root": INDEX_LONG_DIR,
+        "partitions": ["year"],
+        "sort_by": ["index_name", "trade_date"],
+        "keys": ["index_name", "trade_date"],
+        "schema": "index_yearly",
+    },
+    "equity_features": {
+        "root": EQUITY_FEATURES_DIR,
+        "partitions": ["year", "month"],
+        "sort_by": ["symbol", "trade_date"],
+        "keys": ["symbol", "trade_date"],
+        "schema": "equity_yearly",
+    },
+    "index_features": {
+        "root": INDEX_FEATURES_DIR,
+        "partitions": ["year"],
+        "sort_by": ["trade_date"],
+        "keys": ["trade_date"],
+        "schema": "index_yearly",
+    },
+}
+
+DATE_TYPE = ARROW_TYPES["timestamp"]
+
+
+# -----------------------------------------
+# Writing
+# -----------------------------------------
+def _partition_values(df):
+    trade_date = pd.to_datetime(df["trade_date"])
+    return {
+        "year": trade_date.dt.year,
+        "month": trade_date.dt.month,
+    }
+
+
+def _partition_path(cfg, values, root=None):
+    path = cfg["root"] if root is None else root
+    for name, value in zip(cfg["partitions"], values):
+        path = path / f"{name}={value}"
+    return path
+
+
+def to_arrow(df, kind):
+    """
+    Arrow table with a stable schema for the store: every registered
+    column is cast to its registry type (strings dictionary encoded,
+    trade_date timestamp[us], integers kept integer even with nulls).
+    """
+    cfg = DATASETS[kind]
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    for column in SCHEMAS[cfg["schema"]]:
+        name = column.target
+        if name not in table.column_names:
+            continue
+
+        position = table.column_names.index(name)
+        table = table.set_column(
+            position, name, table.column(name).cast(ARROW_TYPES[column.dtype])
+        )
+
+    return table.replace_schema_metadata(None)
+
+
+def write_partition(kind, values, df, root=None):
+    """
+    Write one partition as a single sorted file. The file is written
+    beside the old one and renamed over it, so readers see either the
+    old partition or the new one. root defaults to the dataset root.
+    """
+    cfg = DATASETS[kind]
+
+    path = _partition_path(cfg, values, root)
+    path.mkdir(parents=True, exist_ok=True)
+
+    # Sort categoricals by value, not by category code, so row-group
+    # min/max statistics stay tight
+    df = df.sort_values(
+        cfg["sort_by"],
+        kind="stable",
+        key=lambda col: col.astype(str) if col.dtype == "category" else col
+    )
+
+    # Not matched by the part-0.parquet readers while it is written
+    tmp_path = path / "part-0.parquet.tmp"
+
+    pq.write_table(
+        to_arrow(df, kind),
+        tmp_path,
+        row_group_size=ROW_GROUP_SIZE,
+        write_statistics=True,
+    )
+    tmp_path.replace(path / "part-0.parquet")
+
+
+@contextmanager
+def rebuilt_dataset(kind):
+    """
+    Root to rebuild a dataset in, beside the old one. It is swapped
+    in when the block exits cleanly having written a partition; on
+    an error it is removed and the old dataset is left as it was.
+    """
+    cfg = DATASETS[kind]
+
+    root = cfg["root"].with_name(cfg["root"].name + ".tmp")
+    _remove(root)
+    root.mkdir(parents=True)
+
+    try:
+        yield root
+    except BaseException:
+        _remove(root)
+        raise
+
+    if any(root.iterdir()):
+        _swap_in(root, cfg["root"])
+    else:
+        _remove(root)
+
+
+def write_dataset(kind, df, overwrite=True, root=None):
+    """
+    Write a DataFrame into the partitioned store. Partitions present
+    in df are replaced; other partitions are left untouched.
+    With overwrite set, the whole dataset is rebuilt beside the old
+    one and swapped in: a failed rebuild leaves the old dataset.
+    root writes into another root instead (see rebuilt_dataset).
+    """
+    cfg = DATASETS[kind]
+
+    if overwrite:
+        with rebuilt_dataset(kind) as root:
+            write_dataset(kind, df, overwrite=False, root=root)
+        return
+
+    parts = _partition_values(df)
+    keys = [parts[name] for name in cfg["partitions"]]
+
+    for values, part_df in df.groupby(keys):
+        write_partition(kind, values, part_df, root)
+
+    logger.info(f"{kind} dataset written to: {root or cfg['root']}")
+
+
+def replace_year(kind, year, df):
+    """
+    Replace the year=Y partitions of a dataset with the rows of df
+    (None or empty drops the year). The new year is written beside
+    the dataset root and swapped in, so readers never see the year
+    missing and a failed write leaves the old year.
+    """
+    cfg = DATASETS[kind]
+    path = cfg["root"] / f"year={year}"
+
+    # Beside the root, not in it: partition_files must not see them
+    staging = cfg["root"].with_name(f"{cfg['root'].name}.year={year}.tmp")
+    old_path = cfg["root"].with_name(f"{cfg['root'].name}.year={year}.old")
+
+    if df is None or df.empty:
+        if path.exists():
+            _remove(old_path)
+            path.rename(old_path)
+            _remove(old_path)
+        return
+
+    _remove(staging)
+    staging.mkdir(parents=True)
+
+    try:
+        write_dataset(kind, df, overwrite=False, root=staging)
+        cfg["root"].mkdir(parents=True, exist_ok=True)
+        _swap_in(staging / path.name, path, old_path)
+    finally:
+        _remove(staging)
+
+
+def upsert_dataset(kind, new_df, replace_dates=False):
+    """
+    Upsert rows into the store on the dataset keys, rewriting only
+    the partitions the new rows fall into. With replace_dates set,
+    every existing row on a trade_date present in new_df is replaced
+    (whole cross-sections, e.g. recomputed features).
+    """
+    cfg = DATASETS[kind]
+    keys = ["trade_date"] if replace_dates else cfg["keys"]
+
+    parts = _partition_values(new_df)
+    groups = new_df.groupby([parts[name] for name in cfg["partitions"]])
+
+    for values, part_df in groups:
+        values = values if isinstance(values, tuple) else (values,)
+        path = _partition_path(cfg, values) / "part-0.parquet"
+
+        if path.exists():
+            existing = pq.read_table(path).to_pandas()
+            existing["trade_date"] = pd.to_datetime(existing["trade_date"])
+
+            replaced = existing.set_index(keys).index.isin(
+                part_df.set_index(keys).index
+            )
+            part_df = pd.concat(
+                [existing[~replaced], part_df], ignore_index=True
+            )
+
+        write_partition(kind, values, part_df)
+
+
+# -----------------------------------------
+# Master files
+#   {prefix}{START}_{END}.parquet/{YEAR}-0.parquet           (built)
+#   {prefix}{START}_{END}.parquet/{YEAR}-{YYYYMMDD}.parquet  (appended)
+# A master is a directory of yearly section files, read as one table
+# (pd.read_parquet on the directory). Daily appends add a section of
+# their own rows instead of rewriting the master.
+# -----------------------------------------
+def section_path(master_path, year, trade_date=None):
+    suffix = "0" if trade_date is None else f"{pd.Timestamp(trade_date):%Y%m%d}"
+    return master_path / f"{year}-{suffix}.parquet"
+
+
+def master_sections(master_path, year=None):
+    """
+    Section files of a master in row order (a single-file master
+    from before the yearly sections is its own only section).
+    """
+    if master_path.is_file():
+        return [master_path]
+
+    return sorted(master_path.glob(f"{'*' if year is None else year}-*.parquet"))
+
+
+def _remove(path):
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+
+def _swap_in(tmp_path, path, old_path=None):
+    """
+    Put a fully written tmp_path (file or directory) in place of path.
+    The old path is moved to old_path (default: beside it) first.
+    """
+    if old_path is None:
+        old_path = path.with_name(path.name + ".old")
+    _remove(old_path)
+
+    if path.exists():
+        path.rename(old_path)
+
+    tmp_path.rename(path)
+    _remove(old_path)
+
+
+def write_master(sections, fmt, master_path, csv_path=None, dedupe=False):
+    """
+    Stream (year, source) pairs into the yearly section files of a
+    master, one row group per record batch, so memory stays bounded
+    by a single batch. Sources are yearly CSV paths or in-memory Arrow
+    tables. The master is built beside the old one and swapped in
+    only once every section is written: a source that fails to load
+    aborts the build and leaves the old master. With dedupe set,
+    duplicates are dropped per source (a year always fits in memory).
+    csv_path optionally exports the same rows as a CSV master, also
+    written beside the old one. Returns the number of rows written.
+    """
+    master_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = master_path.with_name(master_path.name + ".tmp")
+
+    _remove(tmp_path)
+    tmp_path.mkdir()
+
+    sections = list(sections)
+
+    with Telemetry("write_master", output=master_path.name) as telemetry:
+        progress = FileProgress(logger, "write_master", len(sections), verb="Loaded")
+        csv_file = None
+        rows = 0
+
+        if csv_path is not None:
+            csv_path.parent.mkdir(parents=True, exist_ok=True)
+            csv_tmp_path = csv_path.with_name(csv_path.name + ".tmp")
+            csv_file = open(csv_tmp_path, "w", newline="")
+
+        try:
+            for year, source in sections:
+                if isinstance(source, pa.Table):
+                    name = f"table of {source.num_rows} rows"
+                else:
+                    name = source.name
+
+                writer = None
+
+                try:
+                    if isinstance(source, pa.Table):
+                        batches = source.to_batches()
+                    else:
+                        batches = iter_csv_batches(source, fmt)
+
+                    if dedupe:
+                        batches = _dedupe_batches(list(batches))
+
+                    before = rows
+
+                    for batch in batches:
+                        if writer is None:
+                            writer = pq.ParquetWriter(
+                                section_path(tmp_path, year), batch.schema
+                            )
+
+                        writer.write_batch(batch)
+
+                        if csv_file is not None:
+                            batch.to_pandas().to_csv(
+                                csv_file, header=rows == 0, index=False
+                            )
+
+                        rows += batch.num_rows
+
+                    progress.update(name, rows - before)
+
+                except Exception as e:
+                    logger.error(f"Error loading {name} - {e}")
+                    raise
+
+                finally:
+                    if writer is not None:
+                        writer.close()
+
+        except BaseException:
+            _remove(tmp_path)
+
+            if csv_file is not None:
+                csv_file.close()
+                _remove(csv_tmp_path)
+            raise
+
+        if csv_file is not None:
+            csv_file.close()
+
+        if rows:
+            _swap_in(tmp_path, master_path)
+
+            if csv_file is not None:
+                csv_tmp_path.replace(csv_path)
+            telemetry.add(
+                rows_out=rows,
+                bytes_written=sum(path.stat().st_size for path in master_sections(master_path)),
+            )
+        else:
+            _remove(tmp_path)
+
+            if csv_file is not None:
+                _remove(csv_tmp_path)
+
+        progress.close()
+
+    return rows
+
+
+def append_master(master_path, df, keys, replace=False):
+    """
+    Add the rows of df to a master without reading its other rows:
+    each year of df gets one more section holding just those rows.
+    With replace set (re-ingested dates), the sections of df's years
+    are rewritten instead, dropping existing rows with matching keys.
+    """
+    schema = pq.read_schema(master_sections(master_path)[0])
+
+    for year, year_df in df.groupby(df["trade_date"].dt.year):
+        sections = master_sections(master_path, year)
+
+        if replace and sections:
+            existing = ds.dataset([str(path) for path in sections], format="parquet")
+            existing = existing.to_table().to_pandas()
+            existing["trade_date"] = pd.to_datetime(existing["trade_date"])
+
+            replaced = existing.set_index(keys).index.isin(
+                year_df.set_index(keys).index
+            )
+            year_df = pd.concat([existing[~replaced], year_df], ignore_index=True)
+            year_df = year_df.sort_values("trade_date", kind="stable")
+
+            path = section_path(master_path, year)
+        else:
+            sections = []
+            path = section_path(master_path, year, year_df["trade_date"].min())
+
+        table = pa.Table.from_pandas(year_df[schema.names], preserve_index=False)
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        pq.write_table(table.cast(schema), tmp_path)
+        tmp_path.replace(path)
+
+        for stale in sections:
+            if stale != path:
+                stale.unlink()
+
+
+def _dedupe_batches(batches):
+    if not batches:
+        return []
+
+    table = pa.Table.from_batches(batches)
+    df = table.to_pandas().drop_duplicates()
+
+    deduped = pa.Table.from_pandas(df, schema=table.schema, preserve_index=False)
+    return deduped.to_batches()
+
+
+# -----------------------------------------
+# Loading with predicate pushdown
+# -----------------------------------------
+def _date_filter(cfg, start, end):
+    """
+    Filter on trade_date plus the matching partition columns, so
+    partitions outside the window are never opened.
+    """
+    monthly = "month" in cfg["partitions"]
+    filters = []
+
+    if start is not None:
+        start = pd.Timestamp(start)
+
+        same_year = ds.field("year") == start.year
+        if monthly:
+            same_year = same_year & (ds.field("month") >= start.month)
+
+        filters.append((ds.field("year") > start.year) | same_year)
+        filters.append(ds.field("trade_date") >= pa.scalar(start, DATE_TYPE))
+
+    if end is not None:
+        end = pd.Timestamp(end)
+
+        same_year = ds.field("year") == end.year
+        if monthly:
+            same_year = same_year & (ds.field("month") <= end.month)
+
+        filters.append((ds.field("year") < end.year) | same_year)
+        filters.append(ds.field("trade_date") <= pa.scalar(end, DATE_TYPE))
+
+    return _combine(filters)
+
+
+def partition_files(kind):
+    """
+    Part files of a dataset in partition order (year=2024/month=2
+    before month=10, unlike a lexicographic listing).
+    """
+    root = DATASETS[kind]["root"]
+
+    def partition_key(path):
+        return tuple(
+            int(part.split("=")[1])
+            for part in path.parent.relative_to(root).parts
+        )
+
+    return sorted(root.rglob("part-0.parquet"), key=partition_key)
+
+
+def latest_date(kind):
+    """
+    Newest trade_date in a dataset, read from its last partition
+    only (None if the dataset is empty or missing).
+    """
+    files = partition_files(kind)
+
+    if not files:
+        return None
+
+    dates = pq.read_table(files[-1], columns=["trade_date"]).column(0)
+    return pd.Timestamp(pc.max(dates).as_py())
+
+
+def _combine(filters):
+    expr = None
+    for f in filters:
+        if f is not None:
+            expr = f if expr is None else expr & f
+    return expr
+
+
+def open_dataset(kind):
+    """
+    Dataset over the part files in partition order, so scans return
+    rows in date order (each file is sorted on the dataset's sort_by).
+    """
+    cfg = DATASETS[kind]
+    files = partition_files(kind)
+
+    if not files:
+        return ds.dataset(cfg["root"], format="parquet", partitioning="hive")
+
+    return ds.dataset(
+        [str(path) for path in files],
+        format="parquet",
+        partitioning="hive",
+        partition_base_dir=str(cfg["root"]),
+    )
+
+
+def load(kind, filter=None, start=None, end=None, columns=None, universe=None):
+    """
+    Read a slice of a dataset. Only partitions and row groups that can
+    match the filters are decoded. Partition columns are dropped
+    unless asked for in columns. universe names a membership index
+    (scripts.universe): only its members' rows are kept.
+    """
+    cfg = DATASETS[kind]
+
+    if not cfg["root"].exists():
+        raise FileNotFoundError(f"No {kind} dataset at {cfg['root']}")
+
+    expr = _combine([_date_filter(cfg, start, end), filter])
+
+    dataset = open_dataset(kind)
+
+    if columns is None:
+        columns = [
+            name for name in dataset.schema.names
+            if name not in cfg["partitions"]
+        ]
+
+    if universe is None:
+        return dataset.to_table(columns=list(columns), filter=expr).to_pandas()
+
+    keys = [name for name in ("trade_date", "security_id") if name not in columns]
+    table = dataset.to_table(columns=list(columns) + keys, filter=expr)
+
+    members = universe_mask(
+        universe, table["trade_date"].to_numpy(), table["security_id"].to_numpy(), start, end
+    )
+    return table.filter(members).select(list(columns)).to_pandas()
+
+
+def load_equity(symbols=None, start=None, end=None, columns=None, universe=None):
+    """
+    Equity rows for the given symbols and date window (inclusive).
+    Example: load_equity(["TCS"], "2024-01-01", "2024-12-31", ["trade_date", "close"])
+    """
+    symbol_filter = None
+    if symbols is not None:
+        symbol_filter = ds.field("symbol").isin(list(symbols))
+
+    return load("equity", symbol_filter, start, end, columns, universe)
+
+
+def load_index(start=None, end=None, columns=None):
+    """
+    Index rows for the given date window (inclusive).
+    """
+    return load("index", None, start, end, columns)
+
+
+def load_index_long(indices=None, start=None, end=None, columns=None):
+    """
+    Long-format rows keyed by (index_name, trade_date) for any set of
+    indices, e.g. load_index_long(["NIFTY BANK", "NIFTY MIDCAP 50"]).
+    """
+    index_filter = None
+    if indices is not None:
+        index_filter = ds.field("index_name").isin(
+            [name.strip().upper() for name in indices]
+        )
+
+    return load("index_long", index_filter, start, end, columns)
+
+
+# -----------------------------------------
+# Universe membership
+#   universe/{name}.parquet: one row per trade_date with the sorted
+#   int32 security_ids of the universe's members that day
+# -----------------------------------------
+MEMBERS_SCHEMA = pa.schema([
+    ("trade_date", DATE_TYPE),
+    ("security_ids", pa.list_(pa.int32())),
+])
+
+
+def universe_path(name):
+    return UNIVERSE_DIR / f"{name}.parquet"
+
+
+def write_universe(name, members, spec):
+    """
+    Replace a universe's membership (trade_date, security_ids) table.
+    spec (a string) records the rules it was built from.
+    """
+    path = universe_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    table = members.cast(MEMBERS_SCHEMA).replace_schema_metadata({"spec": spec})
+    pq.write_table(table, tmp_path)
+    tmp_path.replace(path)
+
+
+def load_universe(name, start=None, end=None):
+    """
+    Membership table of a universe for dates in [start, end].
+    """
+    path = universe_path(name)
+
+    if not path.exists():
+        raise FileNotFoundError(f"No universe {name!r} at {path}")
+
+    table = pq.read_table(path)
+
+    if start is not None:
+        table = table.filter(pc.field("trade_date") >= pa.scalar(pd.Timestamp(start), DATE_TYPE))
+    if end is not None:
+        table = table.filter(pc.field("trade_date") <= pa.scalar(pd.Timestamp(end), DATE_TYPE))
+
+    return table
+
+
+def universe_spec(name):
+    """
+    Rules a stored universe was built from (None if not built).
+    """
+    path = universe_path(name)
+
+    if not path.exists():
+        return None
+
+    return (pq.read_schema(path).metadata or {}).get(b"spec", b"").decode()
+
+
+def member_keys(trade_dates, security_ids):
+    """
+    One sortable int64 per (trade_date, security_id) pair.
+    """
+    days = np.asarray(trade_dates, dtype="datetime64[D]").astype(np.int64)
+    return (days << 32) | np.asarray(security_ids, dtype=np.int64)
+
+
+def universe_mask(name, trade_dates, security_ids, start=None, end=None):
+    """
+    Boolean mask of the rows (trade_date, security_id) that belong to
+    the universe on their date: one sorted search, no row is copied.
+    start/end narrow the membership read to the rows' window.
+    """
+    members = load_universe(name, start, end)
+
+    ids = members["security_ids"].combine_chunks()
+    dates = pc.take(members["trade_date"], pc.list_parent_indices(ids))
+
+    keys = member_keys(dates.to_numpy(), pc.list_flatten(ids).to_numpy())
+    rows = member_keys(trade_dates, security_ids)
+
+    positions = np.searchsorted(keys, rows).clip(max=max(len(keys) - 1, 0))
+    return (keys[positions] == rows) if len(keys) else np.zeros(len(rows), dtype=bool)
@@ -0,0 +1,396 @@
+import sys
+import zipfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scripts.logger import get_logger, setup_logging
+from scripts.trading_calendar import trading_days
+
+logger = get_logger("synthetic")
+
+# -----------------------------------------
+# Deterministic synthetic NSE raw data
+#   python -m scripts.synthetic HOME START_YEAR END_YEAR [SYMBOLS] [SEED]
+#
+# Writes HOME/data/raw/ exactly as the downloaders would:
+#   cm{DD}{MON}{YYYY}bhav.csv.zip                  (years < UDIFF_YEAR)
+#   BhavCopy_NSE_CM_0_0_0_{YYYYMMDD}_F_0000.csv.zip (years >= UDIFF_YEAR)
+#   index/ind_close_all_{DDMMYYYY}.csv
+# for every NSE trading day of the range. The same arguments always
+# give byte-identical files. Point the pipeline at HOME with
+# NSE_PIPELINE_HOME=HOME to run it on the synthetic tree.
+# -----------------------------------------
+UDIFF_YEAR = 2024
+
+# Prices move on a 5 paise tick
+TICK = 0.05
+
+# Share of symbols listed after the start / delisted before the end
+LISTING_RATE = 0.10
+DELISTING_RATE = 0.05
+
+# Share of symbols renamed (same ISIN, new ticker) and re-issued
+# (new ISIN, same ticker, as after a face value split) mid-range
+RENAME_RATE = 0.01
+REISSUE_RATE = 0.01
+
+# Share of symbols traded in the BE (trade-for-trade) series and
+# daily share of rows in other non-EQ series (filtered by merge)
+BE_RATE = 0.05
+OTHER_SERIES = ["BL", "BZ", "GS"]
+OTHER_SERIES_RATE = 0.02
+
+# Index universe: NIFTY 50 over the 50 largest symbols by starting
+# price x volume, NIFTY BANK over ten of them, NIFTY MIDCAP 50 over
+# the next fifty, INDIA VIX from the NIFTY 50 realized volatility
+INDEX_BASE = {
+    "Nifty 50": 8000.0,
+    "Nifty Bank": 18000.0,
+    "Nifty Midcap 50": 3000.0,
+}
+VIX_NAME = "India VIX"
+
+OLD_COLUMNS = [
+    "SYMBOL", "SERIES", "OPEN", "HIGH", "LOW", "CLOSE", "LAST", "PREVCLOSE",
+    "TOTTRDQTY", "TOTTRDVAL", "TIMESTAMP", "TOTALTRADES", "ISIN",
+]
+
+UDIFF_COLUMNS = [
+    "TradDt", "BizDt", "Sgmt", "Src", "FinInstrmTp", "FinInstrmId", "ISIN",
+    "TckrSymb", "SctySrs", "XpryDt", "FininstrmActlXpryDt", "StrkPric",
+    "OptnTp", "FinInstrmNm", "OpnPric", "HghPric", "LwPric", "ClsPric",
+    "LastPric", "PrvsClsgPric", "UndrlygPric", "SttlmPric", "OpnIntrst",
+    "ChngInOpnIntrst", "TtlTradgVol", "TtlTrfVal", "TtlNbOfTxsExctd",
+    "SsnId", "NewBrdLotQty", "Rmks", "Rsvd1", "Rsvd2", "Rsvd3", "Rsvd4",
+]
+
+INDEX_COLUMNS = [
+    "Index Name", "Index Date", "Open Index Value", "High Index Value",
+    "Low Index Value", "Closing Index Value", "Points Change", "Change(%)",
+    "Volume", "Turnover (Rs. Cr.)", "P/E", "P/B", "Div Yield",
+]
+
+LETTERS = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+ALPHANUMERIC = np.array(list("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+
+
+# -----------------------------------------
+# Universe
+# -----------------------------------------
+def make_universe(rng, symbols, days):
+    """
+    Static per-symbol attributes: ticker, ISIN, series, listing
+    window, starting price, volatility, market beta, volume scale.
+    """
+    tickers = set()
+    while len(tickers) < symbols:
+        length = rng.integers(3, 11)
+        tickers.add("".join(rng.choice(LETTERS, length)))
+    tickers = np.array(sorted(tickers))
+    rng.shuffle(tickers)
+
+    isins = np.array([
+        "INE" + "".join(rng.choice(ALPHANUMERIC, 6)) + "01" + str(rng.integers(10))
+        for _ in range(symbols)
+    ])
+
+    first = np.zeros(symbols, dtype=np.int64)
+    last = np.full(symbols, days - 1, dtype=np.int64)
+
+    listed = rng.random(symbols) < LISTING_RATE
+    first[listed] = rng.integers(1, max(days, 2), listed.sum())
+
+    delisted = rng.random(symbols) < DELISTING_RATE
+    last[delisted] = np.maximum(first[delisted], rng.integers(0, days, delisted.sum()))
+
+    series = np.where(rng.random(symbols) < BE_RATE, "BE", "EQ")
+
+    # Corporate actions: day position of the change (days = never)
+    renamed = rng.random(symbols) < RENAME_RATE
+    rename_at = np.where(renamed, rng.integers(1, max(days, 2), symbols), days)
+
+    new_tickers = tickers.copy()
+    for position in np.flatnonzero(renamed):
+        while new_tickers[position] in tickers or new_tickers[position] in new_tickers[:position]:
+            new_tickers[position] = "".join(rng.choice(LETTERS, rng.integers(3, 11)))
+
+    reissued = rng.random(symbols) < REISSUE_RATE
+    reissue_at = np.where(reissued, rng.integers(1, max(days, 2), symbols), days)
+    new_isins = np.array([isin[:9] + "02" + isin[11] for isin in isins])
+
+    return {
+        "symbol": tickers,
+        "isin": isins,
+        "new_symbol": new_tickers,
+        "rename_at": rename_at,
+        "new_isin": new_isins,
+        "reissue_at": reissue_at,
+        "series": series,
+        "first": first,
+        "last": last,
+        "price": np.exp(rng.normal(5.5, 1.2, symbols)).clip(5, 50000),
+        "volatility": rng.uniform(0.01, 0.035, symbols),
+        "beta": rng.uniform(0.5, 1.5, symbols),
+        "volume": np.exp(rng.normal(11.5, 1.5, symbols)),
+    }
+
+
+def index_members(universe):
+    """
+    Constituent positions of each index (fixed over the range).
+    """
+    size = universe["price"] * universe["volume"]
+    size[universe["series"] != "EQ"] = 0
+    size[universe["first"] > 0] = 0
+
+    ranked = np.argsort(-size, kind="stable")
+
+    return {
+        "Nifty 50": ranked[:50],
+        "Nifty Bank": ranked[:50][::5],
+        "Nifty Midcap 50": ranked[50:100],
+    }
+
+
+def tick(values):
+    return (np.round(values / TICK) * TICK).round(2)
+
+
+# -----------------------------------------
+# Daily files
+# -----------------------------------------
+def equity_day(rng, universe, state, day, position):
+    """
+    One day of OHLCV for the symbols listed on that day. Moves the
+    close in state and returns the bhavcopy rows and the day's
+    per-symbol log returns (NaN when not traded).
+    """
+    count = len(universe["symbol"])
+    market = rng.normal(0.0003, 0.011)
+    shock = rng.normal(0, 1, count)
+
+    returns = universe["beta"] * market + universe["volatility"] * shock
+    prevclose = state["close"]
+    close = np.maximum(tick(prevclose * np.exp(returns)), TICK)
+
+    gap = rng.normal(0, 0.3, count) * universe["volatility"]
+    open_ = np.maximum(tick(prevclose * np.exp(gap)), TICK)
+    spread = np.abs(rng.normal(0, 0.6, (2, count))) * universe["volatility"]
+    high = tick(np.maximum(open_, close) * (1 + spread[0]))
+    low = np.maximum(tick(np.minimum(open_, close) * (1 - spread[1])), TICK)
+    last = np.clip(tick(close * (1 + rng.normal(0, 0.001, count))), low, high)
+
+    qty = np.maximum(
+        universe["volume"] * np.exp(rng.normal(0, 0.5, count) + 8 * np.abs(returns)),
+        1,
+    ).astype(np.int64)
+    value = (qty * rng.uniform(low, high)).round(2)
+    trades = np.maximum(qty // rng.integers(20, 400, count), 1)
+
+    listed = (universe["first"] <= position) & (universe["last"] >= position)
+
+    # The first session trades off the listing price
+    fresh = universe["first"] == position
+    prevclose = np.where(fresh, open_, prevclose)
+
+    state["close"] = np.where(listed, close, state["close"])
+
+    series = universe["series"].copy()
+    other = rng.random(count) < OTHER_SERIES_RATE
+    series[other] = rng.choice(OTHER_SERIES, other.sum())
+
+    rows = pd.DataFrame({
+        "symbol": np.where(universe["rename_at"] <= position, universe["new_symbol"], universe["symbol"]),
+        "series": series,
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "last": last,
+        "prevclose": tick(prevclose),
+        "qty": qty,
+        "value": value,
+        "trades": trades,
+        "isin": np.where(universe["reissue_at"] <= position, universe["new_isin"], universe["isin"]),
+        "instrument": np.arange(count) + 1000,
+    })[listed]
+
+    return rows, np.where(listed, returns, np.nan)
+
+
+def write_old(raw_dir, day, rows):
+    name = f"cm{day:%d}{day.strftime('%b').upper()}{day:%Y}bhav.csv"
+
+    df = pd.DataFrame({
+        "SYMBOL": rows["symbol"],
+        "SERIES": rows["series"],
+        "OPEN": rows["open"],
+        "HIGH": rows["high"],
+        "LOW": rows["low"],
+        "CLOSE": rows["close"],
+        "LAST": rows["last"],
+        "PREVCLOSE": rows["prevclose"],
+        "TOTTRDQTY": rows["qty"],
+        "TOTTRDVAL": rows["value"],
+        "TIMESTAMP": f"{day:%d-%b-%Y}".upper(),
+        "TOTALTRADES": rows["trades"],
+        "ISIN": rows["isin"],
+        # The old bhavcopy ends every line with a comma
+        "": "",
+    }, columns=OLD_COLUMNS + [""])
+
+    write_zip(raw_dir / f"{name}.zip", name, df)
+
+
+def write_udiff(raw_dir, day, rows):
+    name = f"BhavCopy_NSE_CM_0_0_0_{day:%Y%m%d}_F_0000.csv"
+    iso = f"{day:%Y-%m-%d}"
+
+    df = pd.DataFrame({
+        "TradDt": iso,
+        "BizDt": iso,
+        "Sgmt": "CM",
+        "Src": "NSE",
+        "FinInstrmTp": "STK",
+        "FinInstrmId": rows["instrument"],
+        "ISIN": rows["isin"],
+        "TckrSymb": rows["symbol"],
+        "SctySrs": rows["series"],
+        "FinInstrmNm": rows["symbol"] + " LIMITED",
+        "OpnPric": rows["open"],
+        "HghPric": rows["high"],
+        "LwPric": rows["low"],
+        "ClsPric": rows["close"],
+        "LastPric": rows["last"],
+        "PrvsClsgPric": rows["prevclose"],
+        "SttlmPric": rows["close"],
+        "TtlTradgVol": rows["qty"],
+        "TtlTrfVal": rows["value"],
+        "TtlNbOfTxsExctd": rows["trades"],
+        "SsnId": "F1",
+        "NewBrdLotQty": 1,
+    }, columns=UDIFF_COLUMNS)
+
+    write_zip(raw_dir / f"{name}.zip", name, df)
+
+
+def write_zip(path, name, df):
+    # Fixed member timestamp keeps the archive bytes reproducible
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_DEFLATED
+
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(info, df.to_csv(index=False))
+
+
+def index_day(rng, members, levels, returns, day, history):
+    """
+    ind_close_all rows: each index moves by the mean return of its
+    constituents; India VIX tracks the 20-day NIFTY 50 volatility.
+    """
+    rows = []
+
+    for name, positions in members.items():
+        change = np.nanmean(returns[positions]) if len(positions) else 0.0
+        change = 0.0 if np.isnan(change) else change
+
+        previous = levels[name]
+        close = previous * np.exp(change)
+        open_ = previous * np.exp(rng.normal(0, 0.002))
+        high = max(open_, close) * (1 + abs(rng.normal(0, 0.003)))
+        low = min(open_, close) * (1 - abs(rng.normal(0, 0.003)))
+        levels[name] = close
+
+        if name == "Nifty 50":
+            history.append(change)
+
+        rows.append([
+            name, f"{day:%d-%m-%Y}", round(open_, 2), round(high, 2),
+            round(low, 2), round(close, 2), round(close - previous, 2),
+            round((close / previous - 1) * 100, 2),
+            int(rng.integers(100_000_000, 600_000_000)),
+            round(rng.uniform(5_000, 60_000), 2),
+            round(rng.uniform(18, 28), 2), round(rng.uniform(2.5, 4.5), 2),
+            round(rng.uniform(1.0, 1.6), 2),
+        ])
+
+    recent = history[-20:]
+    vix = 100 * np.sqrt(252) * (np.std(recent) if len(recent) > 1 else 0.01)
+    previous = levels.get(VIX_NAME, vix)
+    levels[VIX_NAME] = vix
+
+    rows.append([
+        VIX_NAME, f"{day:%d-%m-%Y}", round(previous, 2),
+        round(max(previous, vix) * 1.02, 2), round(min(previous, vix) * 0.98, 2),
+        round(vix, 2), round(vix - previous, 2),
+        round((vix / previous - 1) * 100, 2) if previous else 0.0,
+        "-", "-", "-", "-", "-",
+    ])
+
+    return pd.DataFrame(rows, columns=INDEX_COLUMNS)
+
+
+# -----------------------------------------
+# Generator
+# -----------------------------------------
+def generate(root, start_year: int, end_year: int, symbols: int = 500, seed: int = 0) -> dict:
+    """
+    Write synthetic raw bhavcopy and index files under root/data/raw
+    for every trading day of start_year..end_year. Returns
+    {"days", "equity_rows", "index_rows", "bytes"}.
+    """
+    raw_dir = Path(root) / "data" / "raw"
+    index_dir = raw_dir / "index"
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    days = list(trading_days(f"{start_year}-01-01", f"{end_year}-12-31"))
+    rng = np.random.default_rng(seed)
+
+    universe = make_universe(rng, symbols, len(days))
+    members = index_members(universe)
+    state = {"close": tick(universe["price"])}
+    levels = dict(INDEX_BASE)
+    history = []
+
+    summary = {"days": len(days), "equity_rows": 0, "index_rows": 0, "bytes": 0}
+
+    for position, day in enumerate(days):
+        rows, returns = equity_day(rng, universe, state, day, position)
+
+        if day.year < UDIFF_YEAR:
+            write_old(raw_dir, day, rows)
+        else:
+            write_udiff(raw_dir, day, rows)
+
+        indices = index_day(rng, members, levels, returns, day, history)
+        indices.to_csv(index_dir / f"ind_close_all_{day:%d%m%Y}.csv", index=False)
+
+        summary["equity_rows"] += len(rows)
+        summary["index_rows"] += len(indices)
+
+    summary["bytes"] = sum(path.stat().st_size for path in raw_dir.rglob("*") if path.is_file())
+
+    logger.info(
+        f"Synthetic data: {summary['days']} days, {symbols} symbols, "
+        f"{summary['equity_rows']} equity rows -> {raw_dir}"
+    )
+    return summary
+
+
+def main():
+    setup_logging()
+    if len(sys.argv) < 4:
+        print("Usage: python -m scripts.synthetic HOME START_YEAR END_YEAR [SYMBOLS] [SEED]")
+        sys.exit(1)
+
+    root = Path(sys.argv[1])
+    start_year, end_year = int(sys.argv[2]), int(sys.argv[3])
+    symbols = int(sys.argv[4]) if len(sys.argv) > 4 else 500
+    seed = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+
+    summary = generate(root, start_year, end_year, symbols, seed)
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
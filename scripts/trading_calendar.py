@@ -0,0 +1,180 @@
+from datetime import date, datetime, timedelta
+from scripts.config import METADATA_DIR
+from scripts.logger import get_logger
+from scripts.manifest import read_json, write_json
+
+logger = get_logger("trading_calendar")
+
+MISSING_DATES_FILE = METADATA_DIR / "missing_dates.json"
+
+# Dates this close to today are never cached as missing:
+# NSE publishes the day's files late and sometimes retries uploads.
+RECENT_DAYS = 3
+
+# -----------------------------------------
+# NSE equity segment trading holidays (weekdays only)
+# Years not listed fall back to the weekend rule alone.
+# -----------------------------------------
+NSE_HOLIDAYS = {
+    2015: [
+        "2015-01-26", "2015-02-17", "2015-03-06", "2015-04-02", "2015-04-03",
+        "2015-04-14", "2015-05-01", "2015-09-17", "2015-09-25", "2015-10-02",
+        "2015-10-22", "2015-11-12", "2015-11-25", "2015-12-25",
+    ],
+    2016: [
+        "2016-01-26", "2016-03-07", "2016-03-24", "2016-03-25", "2016-04-14",
+        "2016-04-15", "2016-04-19", "2016-07-06", "2016-08-15", "2016-09-05",
+        "2016-09-13", "2016-10-11", "2016-10-12", "2016-10-31", "2016-11-14",
+    ],
+    2017: [
+        "2017-01-26", "2017-02-24", "2017-03-13", "2017-04-04", "2017-04-14",
+        "2017-05-01", "2017-06-26", "2017-08-15", "2017-08-25", "2017-10-02",
+        "2017-10-20", "2017-12-25",
+    ],
+    2018: [
+        "2018-01-26", "2018-02-13", "2018-03-02", "2018-03-29", "2018-03-30",
+        "2018-05-01", "2018-08-15", "2018-08-22", "2018-09-13", "2018-09-20",
+        "2018-10-02", "2018-10-18", "2018-11-08", "2018-11-23", "2018-12-25",
+    ],
+    2019: [
+        "2019-03-04", "2019-03-21", "2019-04-17", "2019-04-19", "2019-04-29",
+        "2019-05-01", "2019-06-05", "2019-08-12", "2019-08-15", "2019-09-02",
+        "2019-09-10", "2019-10-02", "2019-10-08", "2019-10-21", "2019-10-28",
+        "2019-11-12", "2019-12-25",
+    ],
+    2020: [
+        "2020-02-21", "2020-03-10", "2020-04-02", "2020-04-06", "2020-04-10",
+        "2020-04-14", "2020-05-01", "2020-05-25", "2020-10-02", "2020-11-16",
+        "2020-11-30", "2020-12-25",
+    ],
+    2021: [
+        "2021-01-26", "2021-03-11", "2021-03-29", "2021-04-02", "2021-04-14",
+        "2021-04-21", "2021-05-13", "2021-07-21", "2021-08-19", "2021-09-10",
+        "2021-10-15", "2021-11-05", "2021-11-19",
+    ],
+    2022: [
+        "2022-01-26", "2022-03-01", "2022-03-18", "2022-04-14", "2022-04-15",
+        "2022-05-03", "2022-08-09", "2022-08-15", "2022-08-31", "2022-10-05",
+        "2022-10-26", "2022-11-08",
+    ],
+    2023: [
+        "2023-01-26", "2023-03-07", "2023-03-30", "2023-04-04", "2023-04-07",
+        "2023-04-14", "2023-05-01", "2023-06-29", "2023-08-15", "2023-09-19",
+        "2023-10-02", "2023-10-24", "2023-11-14", "2023-11-27", "2023-12-25",
+    ],
+    2024: [
+        "2024-01-22", "2024-01-26", "2024-03-08", "2024-03-25", "2024-03-29",
+        "2024-04-11", "2024-04-17", "2024-05-01", "2024-05-20", "2024-06-17",
+        "2024-07-17", "2024-08-15", "2024-10-02", "2024-11-15", "2024-11-20",
+        "2024-12-25",
+    ],
+    2025: [
+        "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14",
+        "2025-04-18", "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02",
+        "2025-10-22", "2025-11-05", "2025-12-25",
+    ],
+}
+
+# -----------------------------------------
+# Sessions held on a weekend (budget days, DR drills, Diwali
+# Muhurat trading). A bhavcopy is published for these days.
+# Weekday Muhurat sessions are simply left out of NSE_HOLIDAYS.
+# -----------------------------------------
+SPECIAL_SESSIONS = [
+    "2015-02-28", "2016-10-30", "2019-10-27", "2020-02-01", "2020-11-14",
+    "2023-11-12", "2024-01-20", "2024-03-02", "2024-05-18", "2025-02-01",
+]
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+HOLIDAYS = {
+    _to_date(day)
+    for days in NSE_HOLIDAYS.values()
+    for day in days
+}
+
+SPECIAL_DAYS = {_to_date(day) for day in SPECIAL_SESSIONS}
+
+
+# -----------------------------------------
+# Calendar rules
+# -----------------------------------------
+def is_trading_day(day):
+    """
+    True if NSE is expected to publish data for this date.
+    """
+    day = _to_date(day)
+
+    if day in SPECIAL_DAYS:
+        return True
+
+    if day.weekday() >= 5:  # Saturday / Sunday
+        return False
+
+    return day not in HOLIDAYS
+
+
+def trading_days(start, end, dataset=None):
+    """
+    Yield datetimes between start and end (inclusive) that are
+    plausible trading days. With dataset set, dates recorded as
+    missing for that dataset are skipped as well.
+    """
+    start = _to_date(start)
+    end = _to_date(end)
+
+    uncovered = [
+        year for year in range(start.year, end.year + 1)
+        if year not in NSE_HOLIDAYS
+    ]
+    if uncovered:
+        logger.warning(
+            f"No holiday table for {uncovered}, using weekend rule only."
+        )
+
+    missing = load_missing_dates(dataset) if dataset else set()
+
+    current = start
+    while current <= end:
+        if is_trading_day(current) and current not in missing:
+            yield datetime(current.year, current.month, current.day)
+
+        current += timedelta(days=1)
+
+
+# -----------------------------------------
+# Negative cache of dates that returned 404
+# -----------------------------------------
+def load_missing_dates(dataset):
+    manifest = read_json(MISSING_DATES_FILE)
+    return {_to_date(day) for day in manifest.get(dataset, [])}
+
+
+def record_missing_dates(dataset, days):
+    """
+    Persist dates that returned 404 so later runs never request them again.
+    Returns the number of dates added.
+    """
+    cutoff = date.today() - timedelta(days=RECENT_DAYS)
+    days = {_to_date(day) for day in days}
+    days = {day for day in days if day < cutoff}
+
+    if not days:
+        return 0
+
+    manifest = read_json(MISSING_DATES_FILE)
+    known = {_to_date(day) for day in manifest.get(dataset, [])}
+    added = days - known
+
+    if added:
+        manifest[dataset] = sorted(day.isoformat() for day in known | added)
+        write_json(MISSING_DATES_FILE, manifest)
+
+    return len(added)
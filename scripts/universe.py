@@ -0,0 +1,306 @@
+import hashlib
+import json
+import operator
+import sys
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from scripts import build_features, equity_features, store
+from scripts.config import METADATA_DIR
+from scripts.logger import get_logger, setup_logging, timed
+
+logger = get_logger("universe")
+
+# -----------------------------------------
+# Tradable-universe membership index
+#   python -m scripts.universe            (new dates; rebuild changed universes)
+#   python -m scripts.universe --full
+#   python -m scripts.universe NAME       (members per date summary)
+#
+# Eligibility rules are evaluated once per date over every equity
+# row, from one pass of the rolling features (avg_value_20d is
+# computed once and shared by every universe). Membership is stored
+# as a sorted int32 security_id list per date (store.write_universe);
+# loaders apply it as a mask:
+#
+#   store.load_equity(start="2024-01-01", universe="liquid")
+#   store.universe_mask("liquid", df["trade_date"], df["security_id"])
+#
+# Rules are (column, op, value) clauses over the equity columns and
+# equity_features.FEATURE_COLUMNS, ANDed. "constituents" names a CSV
+# in metadata/constituents/ (symbol, start_date, end_date; an empty
+# end_date means still a member) for index universes such as
+# NIFTY 50, whose history NSE's daily files do not carry. A universe
+# whose rules or constituents file changed is rebuilt in full; the
+# others only get new dates.
+# -----------------------------------------
+CONSTITUENTS_DIR = METADATA_DIR / "constituents"
+
+UNIVERSES = {
+    # The feature store's screen (equity_features.screen_and_rank)
+    "liquid": {
+        "rules": [
+            ("avg_value_20d", ">", equity_features.LIQUIDITY_THRESHOLD),
+            ("close", ">", equity_features.MIN_PRICE),
+        ],
+    },
+    "price_above_20": {
+        "rules": [("close", ">", equity_features.MIN_PRICE)],
+    },
+    "nifty50": {
+        "constituents": "nifty50",
+    },
+}
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# Equity columns read for the rules (rule columns are added)
+BASE_COLUMNS = ["symbol", "trade_date", "close", "tottrdqty", "security_id"]
+
+
+def constituents_path(name):
+    return CONSTITUENTS_DIR / f"{name}.csv"
+
+
+def spec(name):
+    """
+    Fingerprint of a universe's definition: its rules plus the
+    checksum of its constituents file.
+    """
+    definition = dict(UNIVERSES[name])
+
+    if "constituents" in definition:
+        path = constituents_path(definition["constituents"])
+        definition["constituents_sha256"] = (
+            hashlib.sha256(path.read_bytes()).hexdigest() if path.exists() else None
+        )
+
+    return json.dumps(definition, sort_keys=True, default=str)
+
+
+def available(name):
+    cfg = UNIVERSES[name]
+
+    if "constituents" in cfg and not constituents_path(cfg["constituents"]).exists():
+        logger.warning(
+            f"Universe {name}: no {constituents_path(cfg['constituents'])}, skipped"
+        )
+        return False
+
+    return True
+
+
+# -----------------------------------------
+# Rules
+# -----------------------------------------
+def rule_mask(df, rules):
+    mask = np.ones(len(df), dtype=bool)
+
+    for column, op, value in rules:
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        mask &= OPERATORS[op](values, value)
+
+    return mask
+
+
+def constituents_mask(df, name):
+    """
+    Rows whose symbol was a constituent on their trade_date.
+    """
+    spells = pd.read_csv(constituents_path(name), parse_dates=["start_date", "end_date"])
+    spells["symbol"] = spells["symbol"].str.strip().str.upper()
+
+    rows = pd.DataFrame({
+        "symbol": df["symbol"].astype(str).to_numpy(),
+        "trade_date": df["trade_date"].to_numpy(),
+        "row": np.arange(len(df)),
+    })
+    matched = rows.merge(spells, on="symbol")
+
+    inside = (matched["trade_date"] >= matched["start_date"]) & (
+        matched["end_date"].isna() | (matched["trade_date"] <= matched["end_date"])
+    )
+
+    mask = np.zeros(len(df), dtype=bool)
+    mask[matched.loc[inside, "row"].to_numpy()] = True
+    return mask
+
+
+def membership(df, mask):
+    """
+    (trade_date, sorted security_ids) table of the rows in mask.
+    """
+    members = df.loc[mask, ["trade_date", "security_id"]].sort_values(
+        ["trade_date", "security_id"], kind="stable"
+    )
+
+    dates, starts = np.unique(members["trade_date"].to_numpy(), return_index=True)
+    offsets = np.append(starts, len(members)).astype(np.int32)
+
+    ids = pa.ListArray.from_arrays(
+        pa.array(offsets), pa.array(members["security_id"].to_numpy(dtype=np.int32))
+    )
+
+    # Dates without any member keep an empty list
+    all_dates = np.unique(df["trade_date"].to_numpy())
+    table = pa.table({"trade_date": pa.array(dates, store.DATE_TYPE), "security_ids": ids})
+
+    if len(all_dates) == len(dates):
+        return table
+
+    empty = np.setdiff1d(all_dates, dates)
+    table = pa.concat_tables([
+        table,
+        pa.table({
+            "trade_date": pa.array(empty, store.DATE_TYPE),
+            "security_ids": pa.array([[]] * len(empty), pa.list_(pa.int32())),
+        }),
+    ])
+    return table.sort_by("trade_date")
+
+
+# -----------------------------------------
+# Build
+# -----------------------------------------
+def rule_columns(names):
+    computed = set(equity_features.FEATURE_COLUMNS)
+
+    columns = list(BASE_COLUMNS)
+    for name in names:
+        for column, _, _ in UNIVERSES[name].get("rules", []):
+            if column not in computed and column not in columns:
+                columns.append(column)
+
+    return columns
+
+
+def evaluate(names, since=None):
+    """
+    {name: membership table} of the universes for dates >= since
+    (all dates when since is None), from one rolling-feature pass.
+    """
+    columns = rule_columns(names)
+
+    if since is None:
+        equity = store.load_equity(columns=columns)
+    else:
+        equity = build_features.load_equity_window(since, columns=columns)
+
+    if equity.empty:
+        return {}
+
+    equity = equity_features.compute_features(equity)
+
+    if since is not None:
+        equity = equity[equity["trade_date"] >= since]
+
+    tables = {}
+    for name in names:
+        cfg = UNIVERSES[name]
+        mask = rule_mask(equity, cfg.get("rules", []))
+
+        if "constituents" in cfg:
+            mask &= constituents_mask(equity, cfg["constituents"])
+
+        tables[name] = membership(equity, mask)
+
+    return tables
+
+
+def next_start(name):
+    """
+    First date without membership in a stored universe.
+    """
+    dates = store.load_universe(name)["trade_date"]
+
+    if not len(dates):
+        return None
+
+    return pd.Timestamp(dates[-1].as_py()) + build_features.ONE_DAY
+
+
+@timed("universe")
+def build(full=False, since=None):
+    """
+    Bring every universe up to date. Returns {name: dates written}.
+    since recomputes stored universes from that date on too (their
+    source rows changed).
+    """
+    names = [name for name in UNIVERSES if available(name)]
+
+    stale = [name for name in names if full or store.universe_spec(name) != spec(name)]
+    current = [name for name in names if name not in stale]
+
+    written = {}
+
+    if stale:
+        logger.info(f"Full universe build: {', '.join(stale)}")
+
+        for name, table in evaluate(stale).items():
+            store.write_universe(name, table, spec(name))
+            written[name] = table.num_rows
+
+    starts = {name: next_start(name) for name in current}
+
+    if since is not None:
+        starts = {
+            name: start if start is None else min(start, since)
+            for name, start in starts.items()
+        }
+
+    for since in sorted(set(starts.values()) - {None}):
+        group = [name for name, start in starts.items() if start == since]
+
+        for name, table in evaluate(group, since).items():
+            if not table.num_rows:
+                continue
+
+            existing = store.load_universe(name, end=since - build_features.ONE_DAY)
+            store.write_universe(name, pa.concat_tables([existing, table]), spec(name))
+            written[name] = table.num_rows
+
+    for name in names:
+        logger.info(f"Universe {name}: {written.get(name, 0)} new dates")
+
+    return written
+
+
+def summary(name):
+    """
+    Members per date of a stored universe.
+    """
+    table = store.load_universe(name)
+
+    return pd.DataFrame({
+        "trade_date": table["trade_date"].to_pandas(),
+        "members": pc.list_value_length(table["security_ids"]).to_pandas(),
+    })
+
+
+def main():
+    setup_logging()
+    args = sys.argv[1:]
+    names = [arg for arg in args if not arg.startswith("--")]
+
+    if names:
+        for name in names:
+            members = summary(name)["members"]
+            print(
+                f"{name}: {len(members)} dates, members per date "
+                f"min {members.min()} / median {members.median():.0f} / max {members.max()}"
+            )
+        return
+
+    build(full="--full" in args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,92 +1,451 @@
-import pandas as pd
+import hashlib
+import json
+import os
 import sys
-from pathlib import Path
-from scripts.config import BASE_DIR
-from scripts.logger import get_logger
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from scripts.config import METADATA_DIR
+from scripts.logger import get_logger, setup_logging, timed
+from scripts.manifest import read_json, write_json
+from scripts.store import DATASETS, partition_files, to_arrow
 
 logger = get_logger("pipeline_validation")
 
-# CONFIGURATION 
+# CONFIGURATION
 
 MAX_ALLOWED_DATE_MISMATCH_PCT = 5.0     # Fail if mismatch > 5%
-AUTO_ALIGN_IF_SAFE = True               # Auto-align only if within threshold
-
-# FILE DETECTION
-
-EQUITY_MASTER_DIR = BASE_DIR / "data" / "processed" / "equity" / "master"
-INDEX_MASTER_DIR = BASE_DIR / "data" / "processed" / "index" / "master"
-
-equity_files = sorted(EQUITY_MASTER_DIR.glob("nse_master_*.csv"))
-index_files = sorted(INDEX_MASTER_DIR.glob("nifty50_index_master_*.csv"))
+MAX_CLOSE_JUMP_PCT = 20.0               # Flag |close / prevclose - 1| above this
+STALE_PRICE_DAYS = 5                    # Flag N consecutive identical closes
+MAX_OFFENDING_KEYS = 50                 # Sample of keys kept per rule and partition
+
+# Report and per-partition state (fingerprints + cached results)
+REPORT_FILE = METADATA_DIR / "validation_report.json"
+STATE_FILE = METADATA_DIR / "validation_state.json"
+
+# Rule -> severity. Errors fail the run, warnings are only reported.
+RULES = {
+    "duplicate_keys": "error",
+    "null_values": "error",
+    "ohlc_inconsistent": "error",
+    "negative_volume": "error",
+    "close_jump": "warning",
+    "stale_price": "warning",
+}
+
+# Column roles per dataset
+COLUMNS = {
+    "equity": {
+        "group": "symbol",
+        "open": "open",
+        "high": "high",
+        "low": "low",
+        "close": "close",
+        "prevclose": "prevclose",
+        "volumes": ["tottrdqty", "tottrdval", "totaltrades"],
+    },
+    "index": {
+        "group": None,
+        "open": "open_index_value",
+        "high": "high_index_value",
+        "low": "low_index_value",
+        "close": "closing_index_value",
+        "prevclose": None,  # derived: close - points_change
+        "volumes": ["volume", "turnover_(rs._cr.)"],
+    },
+}
+
+
+# PARTITION DISCOVERY
+
+def fingerprint(path, carry=None):
+    # A partition's results also depend on the runs carried into it
+    stats = path.stat()
+    carried = json.dumps(carry, sort_keys=True).encode()
+    return [stats.st_size, stats.st_mtime_ns, hashlib.sha256(carried).hexdigest()]
+
+
+def list_partitions(kind):
+    """
+    {relative partition path: file} for one store dataset, in
+    partition order.
+    """
+    root = DATASETS[kind]["root"]
+
+    return {
+        str(path.parent.relative_to(root)): path
+        for path in partition_files(kind)
+    }
+
+
+def settings():
+    # Cached results are only reusable under the same thresholds
+    return {
+        "max_close_jump_pct": MAX_CLOSE_JUMP_PCT,
+        "stale_price_days": STALE_PRICE_DAYS,
+        "max_offending_keys": MAX_OFFENDING_KEYS,
+    }
+
+
+# LOAD ONE PARTITION AS NUMPY ARRAYS
+
+def read_partition(kind, path, carry=None):
+    """
+    Arrays of a partition (see table_arrays) and its first trade date.
+    With carry set (see partition_carry), the runs of identical closes
+    of earlier partitions are prepended, so they continue across the
+    boundary.
+    """
+    table = pq.read_table(path)
+    since = table.column("trade_date").to_numpy().astype("datetime64[D]").min()
+
+    if carry is not None:
+        # Columns the carried rows lack are null (they are not reported)
+        table = pa.concat_tables(
+            [carry_rows(kind, carry, table.schema, since), table], promote_options="default"
+        )
 
-if not equity_files or not index_files:
-    logger.error("Master files not found.")
-    sys.exit(1)
+    return table_arrays(kind, table), since
+
+
+def carry_rows(kind, carry, schema, since):
+    """
+    The runs of a carry as rows dated the day before since: each
+    group's last close, repeated as many times as its run.
+    """
+    group_name = COLUMNS[kind]["group"]
+    close_name = COLUMNS[kind]["close"]
+    runs = np.asarray(carry["runs"], dtype=np.int64)
+
+    columns = {
+        "trade_date": np.full(runs.sum(), since - np.timedelta64(1, "D")),
+        close_name: np.repeat(np.asarray(carry["closes"], dtype=np.float64), runs),
+    }
+    if group_name:
+        columns[group_name] = np.repeat(np.asarray(carry["labels"], dtype=object), runs)
+
+    return pa.table({
+        name: pa.array(columns[name]).cast(schema.field(name).type)
+        for name in schema.names
+        if name in columns
+    })
+
+
+def partition_carry(kind, path, carry=None):
+    """
+    The runs of identical closes still open at the end of a partition,
+    continuing those carried into it: per group, its last close and
+    the length of the run ending there (at most STALE_PRICE_DAYS - 1,
+    all a later row needs). Groups without rows in the partition keep
+    their carried run; a NaN last close ends the run.
+    """
+    roles = COLUMNS[kind]
+    columns = [name for name in (roles["group"], "trade_date", roles["close"]) if name]
+
+    table = pq.read_table(path, columns=columns)
+    if carry is not None:
+        since = table.column("trade_date").to_numpy().astype("datetime64[D]").min()
+        table = pa.concat_tables([carry_rows(kind, carry, table.schema, since), table])
+
+    table = table.unify_dictionaries().combine_chunks()
+    codes, labels = group_codes(kind, table)
+    dates = table.column("trade_date").to_numpy()
+    close = table.column(roles["close"]).to_numpy(zero_copy_only=False)
+
+    order = np.lexsort((dates, codes))
+    codes, close = codes[order], close[order]
+
+    same_close = np.zeros(len(codes), dtype=bool)
+    same_close[1:] = (codes[1:] == codes[:-1]) & (close[1:] == close[:-1])
+
+    run_total = np.cumsum(same_close)
+    run_start = np.maximum.accumulate(np.where(same_close, 0, run_total))
+    runs = np.minimum(run_total - run_start + 1, STALE_PRICE_DAYS - 1)
+
+    ends = np.flatnonzero(np.append(codes[1:] != codes[:-1], True)) if len(codes) else []
+    ends = [end for end in ends if not np.isnan(close[end])]
+
+    return {
+        "labels": [
+            None if labels is None or codes[end] < 0 else str(labels[codes[end]])
+            for end in ends
+        ],
+        "closes": [float(close[end]) for end in ends],
+        "runs": [int(runs[end]) for end in ends],
+    }
+
+
+def group_codes(kind, table):
+    """
+    (codes, labels) of a table's group column; one group without one.
+    """
+    group_name = COLUMNS[kind]["group"]
+
+    if not group_name:
+        return np.zeros(table.num_rows, dtype=np.int32), None
+
+    group = table.column(group_name)
+    if not pa.types.is_dictionary(group.type):
+        group = pc.dictionary_encode(group)
+    group = group.combine_chunks()
+
+    codes = group.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+    return codes, group.dictionary.to_numpy(zero_copy_only=False)
+
+
+def table_arrays(kind, table):
+    """
+    Returns (group codes, group labels, trade dates, columns, null mask)
+    of an Arrow table, sorted by (group, trade_date). Dates stay
+    datetime64[D].
+    """
+    table = table.unify_dictionaries().combine_chunks()
+    rows = table.num_rows
+
+    null_mask = np.zeros(rows, dtype=bool)
+    for column in table.columns:
+        if column.null_count:
+            null_mask |= column.is_null().to_numpy(zero_copy_only=False)
+
+    codes, labels = group_codes(kind, table)
+    dates = table.column("trade_date").to_numpy().astype("datetime64[D]")
+
+    columns = {
+        name: table.column(name).to_numpy(zero_copy_only=False)
+        for name in table.column_names
+        if pa.types.is_integer(table.schema.field(name).type)
+        or pa.types.is_floating(table.schema.field(name).type)
+    }
+
+    order = np.lexsort((dates, codes))
+    columns = {name: values[order] for name, values in columns.items()}
+
+    return codes[order], labels, dates[order], columns, null_mask[order]
+
+
+# RULES (vectorized over one partition)
+
+def evaluate_rules(kind, codes, dates, columns, null_mask):
+    """
+    Boolean mask of offending rows per rule.
+    """
+    roles = COLUMNS[kind]
+    rows = len(dates)
+
+    open_ = columns[roles["open"]]
+    high = columns[roles["high"]]
+    low = columns[roles["low"]]
+    close = columns[roles["close"]]
+
+    if roles["prevclose"]:
+        prevclose = columns[roles["prevclose"]]
+    else:
+        prevclose = close - columns["points_change"]
+
+    same_group = codes[1:] == codes[:-1]
+
+    # Duplicate (group, date) keys: equal neighbours after the sort
+    duplicates = np.zeros(rows, dtype=bool)
+    duplicates[1:] = same_group & (dates[1:] == dates[:-1])
+
+    # NaN comparisons are False, so nulls only count under null_values
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ohlc = (
+            (low > high)
+            | (open_ < low) | (open_ > high)
+            | (close < low) | (close > high)
+        )
 
-equity_path = equity_files[-1]
-index_path = index_files[-1]
+        negative = np.zeros(rows, dtype=bool)
+        for name in roles["volumes"]:
+            negative |= columns[name] < 0
 
-logger.info(f"Using Equity Master: {equity_path.name}")
-logger.info(f"Using Index Master: {index_path.name}")
+        jump = (prevclose > 0) & (
+            np.abs(close / prevclose - 1) * 100 > MAX_CLOSE_JUMP_PCT
+        )
 
-# LOAD DATA (Optimized)
+    # Stale: length of the run of identical closes ending at each row
+    same_close = np.zeros(rows, dtype=bool)
+    same_close[1:] = same_group & (close[1:] == close[:-1])
+
+    run_total = np.cumsum(same_close)
+    run_start = np.maximum.accumulate(np.where(same_close, 0, run_total))
+    stale = (run_total - run_start) >= STALE_PRICE_DAYS - 1
+
+    return {
+        "duplicate_keys": duplicates,
+        "null_values": null_mask,
+        "ohlc_inconsistent": ohlc,
+        "negative_volume": negative,
+        "close_jump": jump,
+        "stale_price": stale,
+    }
+
+
+def validate_partition(kind, path, carry=None):
+    """
+    Validate one partition, continuing the runs carried into it.
+    Returns a JSON-ready state entry: fingerprint, row count, trade
+    dates and per-rule results.
+    """
+    entry = {"fingerprint": fingerprint(path, carry)}
+    entry.update(validate_arrays(kind, *read_partition(kind, path, carry)))
+    return entry
+
+
+def validate_arrays(kind, arrays, since=None):
+    """
+    Results of the rules over the arrays of table_arrays. Rows dated
+    before since only give context (the runs carried from earlier
+    partitions) and are neither counted nor reported.
+    """
+    codes, labels, dates, columns, null_mask = arrays
+    masks = evaluate_rules(kind, codes, dates, columns, null_mask)
+
+    if since is not None:
+        current = dates >= since
+        masks = {rule: mask & current for rule, mask in masks.items()}
+        rows = dates[current]
+    else:
+        rows = dates
+
+    group_name = COLUMNS[kind]["group"]
+    results = {}
+
+    for rule, mask in masks.items():
+        positions = np.flatnonzero(mask)
+        keys = []
+
+        for position in positions[:MAX_OFFENDING_KEYS]:
+            key = {"trade_date": str(dates[position])}
+            if group_name:
+                code = codes[position]
+                key[group_name] = None if code < 0 else str(labels[code])
+            keys.append(key)
+
+        results[rule] = {"count": int(len(positions)), "offending_keys": keys}
+
+    return {
+        "rows": int(len(rows)),
+        "dates": [str(day) for day in np.unique(rows)],
+        "rules": results,
+    }
+
+
+# DATASET VALIDATION (only changed partitions)
+
+def validate_dataset(kind, previous, full=False):
+    """
+    Validate the partitions whose fingerprint changed since the last
+    run across a thread pool (Arrow reads and NumPy release the GIL).
+    Returns (state entries, number of partitions validated).
+    """
+    partitions = list_partitions(kind)
+
+    # Each partition is validated after the runs still open at the end
+    # of the ones before it. Carries are chained in partition order
+    # (reading three columns of the changed partitions only); the
+    # rules then run in parallel.
+    state = {}
+    carries = {}
+    pending = []
+    carry = None
+
+    for name, path in partitions.items():
+        entry = previous.get(name)
+        carries[name] = carry
+
+        if not full and entry and entry["fingerprint"] == fingerprint(path, carry):
+            state[name] = entry
+            carry = entry["carry"]
+        else:
+            pending.append(name)
+            carry = partition_carry(kind, path, carry)
+            state[name] = {"carry": carry}
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        entries = pool.map(
+            lambda name: validate_partition(kind, partitions[name], carries[name]),
+            pending
+        )
 
-try:
-    equity_df = pd.read_csv(equity_path, low_memory=False)
-    index_df = pd.read_csv(index_path, low_memory=False)
-except Exception as e:
-    logger.error(f"Failed to load master files: {e}")
-    sys.exit(1)
+        for name, entry in zip(pending, entries):
+            state[name] = dict(entry, carry=state[name]["carry"])
 
-# Normalize date
-equity_df['trade_date'] = pd.to_datetime(equity_df['trade_date']).dt.date
-index_df['trade_date'] = pd.to_datetime(index_df['trade_date']).dt.date
+    logger.info(
+        f"{kind}: validated {len(pending)} of {len(partitions)} partitions "
+        f"({len(partitions) - len(pending)} unchanged)"
+    )
+    return state, len(pending)
 
-# VALIDATION FUNCTIONS
 
-def validate_equity(df):
-    if df.duplicated(subset=["symbol", "trade_date"]).any():
-        logger.error("Duplicate symbol-date rows found in equity master.")
-        return False
+def summarize(kind, state, validated):
+    """
+    Per-rule counts and offending keys across all partitions.
+    """
+    rules = {}
 
-    if df.isnull().values.any():
-        logger.error("Missing values found in equity master.")
-        return False
+    for rule, severity in RULES.items():
+        keys = []
+        count = 0
 
-    logger.info("Equity validation passed.")
-    return True
+        for name in sorted(state):
+            result = state[name]["rules"][rule]
+            count += result["count"]
+            keys.extend(
+                dict(key, partition=name) for key in result["offending_keys"]
+            )
 
+        rules[rule] = {
+            "severity": severity,
+            "count": count,
+            "offending_keys": keys,
+        }
 
-def validate_index(df):
-    if df.duplicated(subset=["trade_date"]).any():
-        logger.error("Duplicate trade_date rows found in index master.")
-        return False
+        if count:
+            log = logger.error if severity == "error" else logger.warning
+            log(f"{kind}: {rule} - {count} rows")
 
-    if df.isnull().values.any():
-        logger.error("Missing values found in index master.")
-        return False
+    return {
+        "partitions": len(state),
+        "validated": validated,
+        "rows": sum(entry["rows"] for entry in state.values()),
+        "rules": rules,
+    }
 
-    logger.info("Index validation passed.")
-    return True
 
+def trade_dates(state):
+    days = [day for entry in state.values() for day in entry["dates"]]
+    return np.unique(np.array(days, dtype="datetime64[D]"))
 
-def cross_validate(equity_df, index_df):
-    equity_dates = pd.Index(equity_df['trade_date'].unique())
-    index_dates = pd.Index(index_df['trade_date'].unique())
 
-    common_dates = equity_dates.intersection(index_dates)
-    missing_in_index = equity_dates.difference(index_dates)
-    missing_in_equity = index_dates.difference(equity_dates)
+def cross_validate(equity_dates, index_dates):
+    missing_in_index = np.setdiff1d(equity_dates, index_dates)
+    missing_in_equity = np.setdiff1d(index_dates, equity_dates)
+    common_dates = np.intersect1d(equity_dates, index_dates)
 
     logger.info(f"Total Equity Dates: {len(equity_dates)}")
     logger.info(f"Total Index Dates: {len(index_dates)}")
     logger.info(f"Common Dates: {len(common_dates)}")
 
+    report = {
+        "equity_dates": int(len(equity_dates)),
+        "index_dates": int(len(index_dates)),
+        "common_dates": int(len(common_dates)),
+        "missing_in_index": [str(day) for day in missing_in_index],
+        "missing_in_equity": [str(day) for day in missing_in_equity],
+        "passed": False,
+    }
+
     if len(equity_dates) == 0:
         logger.error("Equity dataset contains no trading dates.")
-        return False, equity_df, index_df
+        return report
 
     impact_pct = (len(missing_in_index) / len(equity_dates)) * 100
+    report["mismatch_pct"] = round(impact_pct, 4)
 
     if len(missing_in_index) > 0:
         logger.warning(f"{len(missing_in_index)} equity dates missing in index dataset.")
@@ -101,30 +460,117 @@ def cross_validate(equity_df, index_df):
             f"Date mismatch {impact_pct:.2f}% exceeds allowed threshold "
             f"({MAX_ALLOWED_DATE_MISMATCH_PCT}%). Possible incomplete dataset."
         )
-        return False, equity_df, index_df
-
-    # Auto align if safe
-    if AUTO_ALIGN_IF_SAFE:
-        equity_df = equity_df[equity_df['trade_date'].isin(common_dates)]
-        index_df = index_df[index_df['trade_date'].isin(common_dates)]
-        logger.info("Datasets aligned using common trading dates.")
+        return report
 
     logger.info("Cross-dataset validation completed successfully.")
-    return True, equity_df, index_df
+    report["passed"] = True
+    return report
 
 
 # EXECUTION PIPELINE
 
-if not validate_equity(equity_df):
-    sys.exit(1)
+def passed(report):
+    return report["cross"]["passed"] and not any(
+        result["count"]
+        for dataset in report["datasets"].values()
+        for result in dataset["rules"].values()
+        if result["severity"] == "error"
+    )
+
+
+def validate_tables(tables):
+    """
+    Validate in-memory data: {"equity": table, "index": table} of
+    Arrow tables or DataFrames in the store layout. Same rules and
+    report as validate(), without reading the store or writing the
+    report and state files.
+    """
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": settings(),
+        "datasets": {},
+    }
+    state = {}
+
+    for kind in COLUMNS:
+        table = tables[kind]
+        if not isinstance(table, pa.Table):
+            table = to_arrow(table, kind)
+
+        state[kind] = {"memory": validate_arrays(kind, table_arrays(kind, table))}
+        report["datasets"][kind] = summarize(kind, state[kind], 1)
+
+    report["cross"] = cross_validate(
+        trade_dates(state["equity"]), trade_dates(state["index"])
+    )
+    report["passed"] = passed(report)
+
+    return report
+
+
+@timed("validate")
+def validate(full=False):
+    """
+    Validate the partitioned stores and write the JSON report.
+    Returns the report; report["passed"] is the overall status.
+    """
+    previous = read_json(STATE_FILE)
+
+    # Threshold changes invalidate every cached result
+    if previous.get("settings") != settings():
+        previous = {}
+        full = True
+
+    state = {"settings": settings()}
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": settings(),
+        "datasets": {},
+    }
+
+    for kind in COLUMNS:
+        state[kind], validated = validate_dataset(
+            kind, previous.get(kind, {}), full
+        )
+        report["datasets"][kind] = summarize(kind, state[kind], validated)
+
+    report["cross"] = cross_validate(
+        trade_dates(state["equity"]), trade_dates(state["index"])
+    )
+
+    report["passed"] = passed(report)
+
+    write_json(STATE_FILE, state)
+    write_json(REPORT_FILE, report)
+    logger.info(f"Validation report written to: {REPORT_FILE}")
+
+    return report
+
+
+def main():
+    setup_logging()
+    # --full re-validates every partition, ignoring the state file
+    full = "--full" in sys.argv[1:]
+
+    missing = [
+        kind for kind in COLUMNS if not list_partitions(kind)
+    ]
+
+    if missing:
+        logger.error(
+            f"Partitioned datasets not found: {', '.join(missing)}. "
+            "Run scripts.build_parquet first."
+        )
+        sys.exit(1)
+
+    report = validate(full)
 
-if not validate_index(index_df):
-    sys.exit(1)
+    if not report["passed"]:
+        sys.exit(1)
 
-status, equity_df, index_df = cross_validate(equity_df, index_df)
+    logger.info("VALIDATION SUCCESS: Master datasets validated successfully.")
+    print("\nVALIDATION SUCCESS ✅\n")
 
-if not status:
-    sys.exit(1)
 
-logger.info("VALIDATION SUCCESS: Master datasets validated successfully.")
-print("\nVALIDATION SUCCESS ✅\n")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
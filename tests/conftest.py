@@ -0,0 +1,65 @@
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+import pytest
+
+# scripts.* importable from a plain `pytest` in the project directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# data/ and logs/ of the tests go to a scratch tree, never the project's
+os.environ["NSE_PIPELINE_HOME"] = tempfile.mkdtemp(prefix="nse-pipeline-tests-")
+
+SYNTHETIC_YEAR = 2024
+
+
+@pytest.fixture(scope="session")
+def raw_data():
+    """
+    One synthetic year of raw bhavcopy and index files (20 symbols)
+    under the test home, generated once per session.
+    """
+    from scripts.config import RAW_DATA_DIR
+    from scripts.synthetic import generate
+
+    generate(RAW_DATA_DIR.parent.parent, SYNTHETIC_YEAR, SYNTHETIC_YEAR, symbols=20)
+    return RAW_DATA_DIR
+
+
+@pytest.fixture
+def home(raw_data):
+    """
+    The test home holding the raw files only: every tree derived from
+    them by an earlier test is removed.
+    """
+    from scripts.config import BASE_DIR
+
+    for name in ("extracted", "processed", "metadata", "features", "cache"):
+        shutil.rmtree(BASE_DIR / "data" / name, ignore_errors=True)
+
+    return BASE_DIR
+
+
+def build_stores():
+    """
+    Full build of the yearly CSVs, the Parquet masters and the
+    partitioned store from the raw files.
+    """
+    from scripts import build_equity_master, build_index_master, merge_bhavcopy, merge_index
+    from scripts.build_parquet import build_parquet
+
+    merge_bhavcopy.merge_years(SYNTHETIC_YEAR, SYNTHETIC_YEAR)
+    merge_index.merge_years(SYNTHETIC_YEAR, SYNTHETIC_YEAR)
+    build_equity_master.build_master()
+    build_index_master.build_master()
+    build_parquet()
+
+
+@pytest.fixture
+def stores(home):
+    """
+    The test home with the stores fully built from the raw files.
+    """
+    build_stores()
+    return home
@@ -0,0 +1,132 @@
+import builtins
+import io
+import os
+from pathlib import Path
+import pandas as pd
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import pytest
+from scripts import append_daily, store
+from scripts.config import PROCESSED_DIR, RAW_DATA_DIR
+from conftest import SYNTHETIC_YEAR, build_stores
+
+
+@pytest.fixture
+def last_day(home):
+    """
+    Stores built without the last trading day; returns that day's
+    raw file per dataset, back in place for the append.
+    """
+    held = {
+        dataset: max(append_daily.list_sources(dataset), key=lambda item: item[0])[1]
+        for dataset in append_daily.DATASETS
+    }
+
+    aside = home / "held"
+    aside.mkdir()
+
+    for path in held.values():
+        path.rename(aside / path.name)
+
+    try:
+        build_stores()
+
+        # Seeds the manifest of ingested dates from the yearly CSVs
+        for dataset in append_daily.DATASETS:
+            assert append_daily.append_dataset(dataset) == 0
+
+    finally:
+        for path in held.values():
+            (aside / path.name).rename(path)
+        aside.rmdir()
+
+    return held
+
+
+def test_one_day_append_reads_only_the_new_files(last_day, monkeypatch):
+    opened, reads = set(), []
+    real_open = builtins.open
+
+    def tracked_open(file, mode="r", *args, **kwargs):
+        if isinstance(file, (str, os.PathLike)) and "r" in mode:
+            opened.add(Path(file))
+        return real_open(file, mode, *args, **kwargs)
+
+    def tracked(read):
+        # (path, nrows) of every table read from a path
+        def wrapper(source, *args, **kwargs):
+            if isinstance(source, (str, os.PathLike)):
+                reads.append((Path(source), kwargs.get("nrows")))
+            return read(source, *args, **kwargs)
+        return wrapper
+
+    # zipfile and pathlib open through io.open, pandas through open
+    monkeypatch.setattr(builtins, "open", tracked_open)
+    monkeypatch.setattr(io, "open", tracked_open)
+
+    monkeypatch.setattr(pd, "read_csv", tracked(pd.read_csv))
+    monkeypatch.setattr(pacsv, "open_csv", tracked(pacsv.open_csv))
+    monkeypatch.setattr(pacsv, "read_csv", tracked(pacsv.read_csv))
+    monkeypatch.setattr(pq, "read_table", tracked(pq.read_table))
+
+    for dataset in append_daily.DATASETS:
+        assert append_daily.append_dataset(dataset) == 1
+
+    assert {path for path in opened if RAW_DATA_DIR in path.parents} == set(last_day.values())
+
+    # Processed CSVs: headers only. Parquet: only the partitions
+    # holding the new day.
+    new_partition = {f"year={SYNTHETIC_YEAR}", "month=12"}
+    processed = [(path, nrows) for path, nrows in reads if PROCESSED_DIR in path.parents]
+    assert processed
+
+    for path, nrows in processed:
+        if path.suffix == ".csv":
+            assert nrows == 0, path
+        else:
+            assert {part for part in path.parts if "=" in part} <= new_partition, path
+
+
+def snapshot():
+    """
+    The equity and index stores, sorted, categories as strings.
+    """
+    frames = {}
+
+    for kind, keys in (("equity", ["symbol", "trade_date"]), ("index", ["trade_date"])):
+        df = store.load(kind)
+        df = df.astype({column: str for column in df.columns if df[column].dtype == "category"})
+        frames[kind] = df.sort_values(keys, ignore_index=True)
+
+    return frames
+
+
+def test_append_matches_full_rebuild(last_day):
+    for dataset in append_daily.DATASETS:
+        assert append_daily.append_dataset(dataset) == 1
+
+    appended = snapshot()
+    build_stores()
+    rebuilt = snapshot()
+
+    for kind, df in rebuilt.items():
+        pd.testing.assert_frame_equal(appended[kind], df, check_like=True, obj=kind)
+
+
+def test_files_without_rows_are_not_read_again(last_day, monkeypatch):
+    reads = []
+
+    def no_nifty_rows(dataset, source, trade_date):
+        reads.append(source)
+        return None
+
+    monkeypatch.setattr(append_daily, "load_daily", no_nifty_rows)
+
+    assert append_daily.append_dataset("index") == 0
+    assert reads == [last_day["index"]]
+
+    trade_date = max(append_daily.list_sources("index"), key=lambda item: item[0])[0]
+    assert trade_date.strftime("%Y-%m-%d") in append_daily.load_ingested("index")
+
+    assert append_daily.append_dataset("index") == 0
+    assert reads == [last_day["index"]]
@@ -0,0 +1,56 @@
+import numpy as np
+from scripts import backtest, panel
+
+
+def split_panel():
+    """
+    Two symbols over five sessions. SPLIT has a 1:2 split on the third
+    session: its close halves while NSE's prevclose, adjusted on the
+    ex-date, halves with it. GAP does not trade on the second session.
+    """
+    nan = np.nan
+    return {
+        "dates": np.arange("2024-01-01", "2024-01-06", dtype="datetime64[D]"),
+        "symbols": np.array(["GAP", "SPLIT"]),
+        "close": np.array([
+            [50.0, 100.0],
+            [nan, 102.0],
+            [55.0, 51.5],
+            [55.0, 52.0],
+            [54.0, 52.0],
+        ], dtype=np.float32),
+        "prevclose": np.array([
+            [50.0, 100.0],
+            [nan, 100.0],
+            [50.0, 51.0],
+            [55.0, 51.5],
+            [55.0, 52.0],
+        ], dtype=np.float32),
+        "tottrdval": np.full((5, 2), 1e9, dtype=np.float32),
+    }
+
+
+def test_returns_follow_the_adjusted_prevclose(monkeypatch):
+    monkeypatch.setattr(backtest, "_grids", {})
+    monkeypatch.setattr(panel, "load_panel", lambda fields=None: split_panel())
+
+    grids = backtest.market_grids()
+
+    np.testing.assert_allclose(grids["returns"], [
+        [0.0, 0.0],
+        [0.0, 0.02],
+        [0.1, 51.5 / 51 - 1],
+        [0.0, 52 / 51.5 - 1],
+        [54 / 55 - 1, 0.0],
+    ], rtol=1e-6)
+
+    # Long SPLIT through its split: no fake loss on the ex-date
+    grids["factors"]["momentum"] = np.tile([0.0, 1.0], (5, 1))
+    daily = backtest.simulate(grids, {
+        "factor": "momentum", "top_n": 1, "long_short": False,
+        "rebalance_days": 1, "lag": 0, "cost_bps": 0.0, "impact": 0.0,
+    })
+
+    assert daily["turnover"].sum() == 1.0
+    assert daily["drawdown"].min() == 0.0
+    np.testing.assert_allclose(daily["equity"].iloc[-1], 1.02 * 52 / 51, rtol=1e-6)
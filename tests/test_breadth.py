@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+from scripts import breadth
+
+
+def random_equity(symbols=40, sessions=400, seed=0):
+    """
+    Shuffled equity rows with the cases breadth has to get right:
+    skipped sessions, late listings (short histories), NaN closes and
+    tick-rounded prices at levels from 1 to 10,000 (unchanged days,
+    closes equal to an average).
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2023-01-02", periods=sessions)
+
+    frames = []
+    for code in range(symbols):
+        first = rng.integers(0, sessions // 2) if code % 4 == 0 else 0
+        moves = rng.normal(0, 0.02, sessions - first)
+        level = 10 ** rng.uniform(0, 4)
+        close = np.round(level * np.exp(np.cumsum(moves)), 1)
+
+        if code % 5 == 1:
+            close[rng.random(len(close)) < 0.01] = np.nan
+
+        frames.append(pd.DataFrame({
+            "symbol": f"S{code:03d}",
+            "trade_date": dates[first:],
+            "close": close,
+            "tottrdqty": rng.integers(1, 10_000, len(close)),
+        }))
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df[rng.random(len(df)) > 0.05]
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def reference_breadth(equity):
+    """
+    Plain per-symbol rolling windows and a per-date groupby.
+    """
+    df = equity.sort_values(["symbol", "trade_date"]).reset_index(drop=True)
+    closes = df.groupby("symbol", observed=True)["close"]
+
+    returns = closes.pct_change()
+    df["advance"] = returns > 0
+    df["decline"] = returns < 0
+    df["unchanged"] = returns == 0
+    df["up_volume"] = df["tottrdqty"].where(df["advance"], 0).astype(float)
+    df["down_volume"] = df["tottrdqty"].where(df["decline"], 0).astype(float)
+
+    for window in breadth.MA_WINDOWS:
+        average = closes.rolling(window).mean().reset_index(level=0, drop=True)
+        df[f"above_{window}"] = df["close"] > average * (1 + breadth.MA_TOLERANCE)
+        df[f"full_{window}"] = average.notna()
+
+    window = breadth.HIGH_LOW_WINDOW
+    df["high"] = df["close"] >= closes.rolling(window).max().reset_index(level=0, drop=True)
+    df["low"] = df["close"] <= closes.rolling(window).min().reset_index(level=0, drop=True)
+
+    def ratio(numerator, denominator):
+        return (numerator / denominator).where(denominator > 0)
+
+    per_date = df.groupby("trade_date")
+
+    expected = pd.DataFrame({
+        "advances": per_date["advance"].sum(),
+        "declines": per_date["decline"].sum(),
+        "unchanged": per_date["unchanged"].sum(),
+    })
+    expected["advance_decline_ratio"] = ratio(expected["advances"], expected["declines"])
+    expected["breadth_positive"] = ratio(expected["advances"], per_date.size())
+
+    for window in breadth.MA_WINDOWS:
+        expected[f"pct_above_ma{window}"] = ratio(
+            per_date[f"above_{window}"].sum(), per_date[f"full_{window}"].sum()
+        )
+
+    expected["new_highs_52w"] = per_date["high"].sum()
+    expected["new_lows_52w"] = per_date["low"].sum()
+    expected["up_volume"] = per_date["up_volume"].sum()
+    expected["down_volume"] = per_date["down_volume"].sum()
+    expected["up_down_volume_ratio"] = ratio(expected["up_volume"], expected["down_volume"])
+
+    return expected.reset_index()
+
+
+def test_every_indicator_matches_the_groupby_reference():
+    equity = random_equity()
+
+    actual = breadth.compute_breadth(equity)
+    expected = reference_breadth(equity)
+
+    assert list(actual.columns) == list(expected.columns)
+
+    # Every indicator is exercised, not just computed as zeros
+    for name in ("unchanged", "new_highs_52w", "new_lows_52w", "pct_above_ma200"):
+        assert (actual[name].fillna(0) > 0).any()
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_categorical_symbols_give_the_same_table():
+    equity = random_equity(seed=1)
+    categorical = equity.assign(symbol=equity["symbol"].astype("category"))
+
+    pd.testing.assert_frame_equal(
+        breadth.compute_breadth(categorical), breadth.compute_breadth(equity)
+    )
@@ -0,0 +1,107 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.cross_section import cross_sectional
+
+
+def sample_factors():
+    """
+    Three dates of uneven size, shuffled: ties (rounded values), NaN,
+    signed zeros and near ties (values 1e-13 apart). The last date
+    holds infinities.
+    """
+    rng = np.random.default_rng(3)
+    sizes = {"2024-01-01": 40, "2024-01-02": 25, "2024-01-03": 30}
+
+    frames = []
+    for date, size in sizes.items():
+        frames.append(pd.DataFrame({
+            "trade_date": pd.Timestamp(date),
+            "factor": np.round(rng.normal(size=size), 1),
+            "near": 1 + rng.integers(0, 3, size) * 1e-13,
+        }))
+
+    df = pd.concat(frames, ignore_index=True)
+    df.loc[[3, 17, 50], "factor"] = np.nan
+    df.loc[[5, 6], "factor"] = [0.0, -0.0]
+    df.loc[[70, 71], "factor"] = [np.inf, -np.inf]
+
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def expected(df, column):
+    groups = df.groupby("trade_date")[column]
+    finite = df[column].where(np.isfinite(df[column]))
+    limits = finite.groupby(df["trade_date"]).quantile([0.01, 0.99]).unstack()
+
+    return {
+        "rank": groups.rank(),
+        "rank_desc": groups.rank(ascending=False),
+        "pct_rank": groups.rank(pct=True),
+        "winsorized": df[column].clip(
+            df["trade_date"].map(limits[0.01]), df["trade_date"].map(limits[0.99])
+        ),
+    }
+
+
+def test_parity_with_groupby():
+    df = sample_factors()
+
+    result = cross_sectional(df, ["factor", "near"], list(expected(df, "factor")))
+
+    for column in ("factor", "near"):
+        for op, values in expected(df, column).items():
+            np.testing.assert_allclose(result[f"{column}_{op}"], values, err_msg=f"{column}_{op}")
+
+
+def test_infinities_do_not_blank_the_date():
+    df = sample_factors()
+    last = df["trade_date"] == df["trade_date"].max()
+
+    winsorized = cross_sectional(df, ["factor"], ["winsorized"])["factor_winsorized"]
+
+    assert np.isfinite(winsorized[last & df["factor"].notna()]).all()
+
+
+@pytest.mark.parametrize("infinity", [-np.inf, np.inf])
+def test_dates_of_only_infinities_are_left_as_they_are(infinity):
+    # Each date fills the grid width with infinities: no finite limits
+    df = pd.DataFrame({
+        "trade_date": pd.to_datetime(["2024-01-01", "2024-01-02"]),
+        "factor": [infinity, infinity],
+    })
+
+    winsorized = cross_sectional(df, ["factor"], ["winsorized"])["factor_winsorized"]
+
+    assert (winsorized == infinity).all()
+
+    # Next to a date with finite values
+    df = pd.concat([df, sample_factors()], ignore_index=True)
+
+    winsorized = cross_sectional(df, ["factor"], ["winsorized"])["factor_winsorized"]
+
+    np.testing.assert_allclose(winsorized, expected(df, "factor")["winsorized"])
+
+
+def test_universe_rows_are_left_out():
+    df = sample_factors()
+    universe = np.arange(len(df)) % 3 > 0
+
+    ranks = cross_sectional(df, ["factor"], ["rank"], universe=universe)["factor_rank"]
+
+    assert ranks[~universe].isna().all()
+    np.testing.assert_allclose(ranks[universe], expected(df[universe], "factor")["rank"])
+
+
+def test_dates_without_values_rank_as_nan():
+    df = sample_factors()
+    empty = df["trade_date"] == df["trade_date"].min()
+    df.loc[empty, "factor"] = np.nan
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        ranks = cross_sectional(df, ["factor"], ["pct_rank"])["factor_pct_rank"]
+
+    assert ranks[empty].isna().all()
+    np.testing.assert_allclose(ranks[~empty], expected(df[~empty], "factor")["pct_rank"])
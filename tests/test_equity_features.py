@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scripts import equity_features
+from scripts.equity_features import FEATURE_COLUMNS, check_parity, compute_features
+
+
+def sample_equity(categorical):
+    """
+    A few symbols of every shape the kernels special-case: shorter
+    than each window, NaN closes, flat closes (zero variance) and a
+    symbol long enough to span several windows. Rows are shuffled.
+    """
+    rng = np.random.default_rng(7)
+    sessions = {"LONG": 60, "NANS": 45, "FLAT": 30, "SHORT": 4, "ONE": 1, "TWENTY": 20}
+
+    frames = []
+    for symbol, count in sessions.items():
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, count)))
+
+        if symbol == "NANS":
+            close[[0, 7, 8, 30]] = np.nan
+        if symbol == "FLAT":
+            close[:] = 250.0
+
+        frames.append(pd.DataFrame({
+            "symbol": symbol,
+            "trade_date": pd.bdate_range("2024-01-01", periods=count),
+            "close": np.round(close, 2),
+            "tottrdqty": rng.integers(1, 10**6, count),
+        }))
+
+    df = pd.concat(frames, ignore_index=True).sample(frac=1, random_state=0)
+
+    if categorical:
+        df["symbol"] = df["symbol"].astype("category")
+
+    return df
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_parity_with_short_symbols_and_nan_closes(categorical):
+    differences, failures = check_parity(sample_equity(categorical))
+
+    assert failures == {}
+    assert set(differences) == set(FEATURE_COLUMNS)
+
+
+def test_windows_reset_at_symbol_boundaries():
+    df = compute_features(sample_equity(categorical=False))
+
+    short = df[df["symbol"].isin(["SHORT", "ONE"])]
+    assert short["return_20d"].isna().all()
+    assert short["volatility_20d"].isna().all()
+
+    flat = df.loc[df["symbol"] == "FLAT", "volatility_20d"].dropna()
+    assert len(flat) and (flat == 0).all()
+
+
+@pytest.mark.parametrize("name", ["mean", "std", "max", "min"])
+def test_rolling_kernels_match_pandas(name):
+    rng = np.random.default_rng(11)
+    values = np.round(rng.normal(100, 5, 300), 1)
+    values[[10, 150]] = np.nan
+    values[[60, 200]] = [np.inf, -np.inf]
+    values[220:250] = 98.3
+
+    symbols = pd.Series(np.repeat(["A", "B", "C"], [90, 5, 205]))
+    starts = equity_features.segment_starts(symbols)
+
+    kernel = getattr(equity_features, f"rolling_{name}")
+    expected = getattr(
+        pd.Series(values).groupby(symbols).rolling(20), name
+    )().reset_index(level=0, drop=True).sort_index()
+
+    np.testing.assert_allclose(kernel(values, starts, 20), expected, rtol=1e-9, atol=1e-12)
+
+
+def test_means_after_a_long_history_keep_their_precision():
+    # A long run of large values (traded values, years of a big
+    # symbol) before a flat symbol: its windows must still average to
+    # its price, not pick up rounding from the rows before them
+    rng = np.random.default_rng(5)
+    values = np.concatenate([rng.uniform(1e8, 1e9, 200_000), np.full(300, 12.35)])
+    starts = np.array([0, 200_000])
+
+    for window in (20, 50, 200):
+        means = equity_features.rolling_mean(values, starts, window)[200_000:]
+
+        np.testing.assert_allclose(means[window - 1:], 12.35, rtol=1e-12)
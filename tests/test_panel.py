@@ -0,0 +1,20 @@
+import numpy as np
+from scripts import panel
+from scripts.store import load_equity
+
+
+def test_every_row_lands_in_its_own_cell(stores):
+    panel.build_panel()
+    data = panel.load_panel()
+
+    rows = load_equity(columns=["symbol", "trade_date"] + panel.FIELDS)
+
+    date_index = np.searchsorted(data["dates"], rows["trade_date"].to_numpy(dtype="datetime64[D]"))
+    symbol_index = panel.symbol_positions(data, rows["symbol"].astype(str))
+
+    for field in panel.FIELDS:
+        np.testing.assert_array_equal(
+            data[field][date_index, symbol_index],
+            rows[field].to_numpy(dtype=np.float64, na_value=np.nan).astype(panel.DTYPE),
+            err_msg=field,
+        )
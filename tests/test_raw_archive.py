@@ -0,0 +1,58 @@
+import pytest
+from scripts import raw_archive
+
+
+@pytest.fixture
+def index_files(tmp_path, monkeypatch):
+    """
+    Loose index files of 2022 and 2023 in a scratch raw tree.
+    """
+    raw_dir = tmp_path / "raw" / "index"
+    raw_dir.mkdir(parents=True)
+
+    monkeypatch.setattr(raw_archive, "ARCHIVE_DIR", tmp_path / "raw" / "archive")
+    monkeypatch.setattr(raw_archive, "MANIFEST_DIR", tmp_path / "metadata")
+    monkeypatch.setitem(
+        raw_archive.DATASETS, "index", {"dir": raw_dir, "pattern": "ind_close_all_*.csv"}
+    )
+
+    for day in ("01062022", "02062022", "01062023", "02062023"):
+        (raw_dir / f"ind_close_all_{day}.csv").write_text(
+            f"Index Name,Closing Index Value\nNifty 50,{day}\n"
+        )
+
+    return raw_dir
+
+
+def test_failed_year_keeps_the_manifest_in_step(index_files, monkeypatch):
+    pack_year = raw_archive.pack_year
+
+    def failing(dataset, year, paths, manifest):
+        if year == 2023:
+            raise OSError("disk full")
+        return pack_year(dataset, year, paths, manifest)
+
+    monkeypatch.setattr(raw_archive, "pack_year", failing)
+
+    with pytest.raises(RuntimeError, match="2023"):
+        raw_archive.repack("index", before_year=2024)
+
+    manifest = raw_archive.load_manifest("index")
+    archived = {name: entry["archive"] for name, entry in manifest.items()}
+
+    assert archived == {
+        "ind_close_all_01062022.csv": "index_2022.zip",
+        "ind_close_all_02062022.csv": "index_2022.zip",
+        "ind_close_all_01062023.csv": None,
+        "ind_close_all_02062023.csv": None,
+    }
+    assert [path.name for path in raw_archive.archives("index")] == ["index_2022.zip"]
+    assert sorted(path.name for path in index_files.iterdir()) == [
+        "ind_close_all_01062023.csv", "ind_close_all_02062023.csv"
+    ]
+
+    # The failed year is packed by the next run
+    monkeypatch.setattr(raw_archive, "pack_year", pack_year)
+
+    assert raw_archive.repack("index", before_year=2024) == {2023: 2}
+    assert raw_archive.verify("index") == {"archives": 2, "files": 4, "bad": []}
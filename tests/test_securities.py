@@ -0,0 +1,64 @@
+import pandas as pd
+from scripts import merge_bhavcopy, securities, store
+from scripts.build_parquet import build_parquet
+from scripts.config import PROCESSED_DIR
+from conftest import SYNTHETIC_YEAR
+
+
+def test_unsaved_merge_leaves_the_master_alone(home):
+    merged = merge_bhavcopy.merge_years(SYNTHETIC_YEAR, SYNTHETIC_YEAR, save=False)
+
+    assert merged[SYNTHETIC_YEAR]["security_id"].notna().all()
+    assert not securities.SECURITIES_FILE.exists()
+
+    merge_bhavcopy.merge_years(SYNTHETIC_YEAR, SYNTHETIC_YEAR)
+    saved = pd.read_csv(PROCESSED_DIR / "equity" / "yearly" / f"nse_{SYNTHETIC_YEAR}.csv")
+
+    # The saved merge assigns the same ids the unsaved one did
+    assert saved["security_id"].tolist() == merged[SYNTHETIC_YEAR]["security_id"].tolist()
+
+
+def test_yearly_files_without_ids_are_backfilled(home):
+    merge_bhavcopy.merge_years(SYNTHETIC_YEAR, SYNTHETIC_YEAR)
+
+    path = PROCESSED_DIR / "equity" / "yearly" / f"nse_{SYNTHETIC_YEAR}.csv"
+    merged = pd.read_csv(path)
+
+    merged.drop(columns="security_id").to_csv(path, index=False)
+    securities.SECURITIES_FILE.unlink()
+
+    assert build_parquet()["equity"] == 1
+
+    assert pd.read_csv(path)["security_id"].tolist() == merged["security_id"].tolist()
+    assert store.load_equity(columns=["security_id"])["security_id"].notna().all()
+    assert merge_bhavcopy.backfill_security_ids() == 0
+
+
+def test_securities_without_isin_stay_apart_after_a_reload(home):
+    day = pd.Timestamp(f"{SYNTHETIC_YEAR}-01-01")
+    first = pd.DataFrame({
+        "isin": [None, None, "INE000A01010"],
+        "symbol": ["NOISIN1", "NOISIN2", "LISTED"],
+        "trade_date": day,
+    })
+
+    ids, spells = securities.register_security_ids(first, securities.load_securities())
+    securities.save_securities(spells)
+
+    # Missing ISINs come back from the master as NaN
+    spells = securities.load_securities()
+    assert spells["isin"].isna().sum() == 2
+
+    later = pd.DataFrame({
+        "isin": [None, None],
+        "symbol": ["NOISIN1", "NOISIN3"],
+        "trade_date": day + pd.Timedelta(days=1),
+    })
+    later_ids, spells = securities.register_security_ids(later, spells)
+
+    assert later_ids[0] == ids[0]
+    assert later_ids[1] not in ids
+
+    # One spell per (security_id, isin, symbol): the reload did not split NOISIN1's
+    assert len(spells) == 4
+    assert spells.loc[spells["symbol"] == "NOISIN1", "last_date"].tolist() == [day + pd.Timedelta(days=1)]
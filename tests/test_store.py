@@ -0,0 +1,107 @@
+import pandas as pd
+import pytest
+from scripts import store
+from scripts.build_parquet import build_dataset
+from scripts.store import (
+    DATASETS, load_index, master_sections, partition_files, write_dataset, write_master
+)
+
+
+def index_rows(dates, close):
+    return pd.DataFrame({
+        "trade_date": pd.to_datetime(dates),
+        "index_name": "Nifty 50",
+        "close": float(close),
+    })
+
+
+def test_failed_rebuild_keeps_the_old_dataset(home, monkeypatch):
+    root = DATASETS["index"]["root"]
+    write_dataset("index", index_rows(["2022-06-01", "2023-06-01"], 100))
+
+    written = []
+
+    def failing(kind, values, df, root=None):
+        if written:
+            raise OSError("disk full")
+        written.append(values)
+        write_partition(kind, values, df, root)
+
+    write_partition = store.write_partition
+    monkeypatch.setattr(store, "write_partition", failing)
+
+    with pytest.raises(OSError):
+        write_dataset("index", index_rows(["2022-06-02", "2023-06-02"], 200))
+
+    assert load_index()["close"].tolist() == [100.0, 100.0]
+    assert sorted(path.name for path in root.parent.iterdir()) == [root.name]
+
+    monkeypatch.undo()
+    write_dataset("index", index_rows(["2024-06-03"], 300))
+
+    assert load_index()["close"].tolist() == [300.0]
+    assert [path.parent.name for path in partition_files("index")] == ["year=2024"]
+    assert not list(root.rglob("*.tmp"))
+
+
+def test_failed_year_aborts_the_rebuild(home, tmp_path):
+    root = DATASETS["index"]["root"]
+    write_dataset("index", index_rows(["2022-06-01", "2023-06-01"], 100))
+
+    corrupt = tmp_path / "nifty50_index_2023.csv"
+    corrupt.write_text("not,a,yearly,file\n1,2,3,4\n")
+
+    with pytest.raises(Exception):
+        build_dataset("index", [index_rows(["2022-06-02"], 200), corrupt], "index_yearly")
+
+    assert load_index()["close"].tolist() == [100.0, 100.0]
+    assert sorted(path.name for path in root.parent.iterdir()) == [root.name]
+
+
+def test_failed_year_keeps_the_old_master(home, tmp_path):
+    master_path = tmp_path / "master.parquet"
+    csv_path = tmp_path / "master.csv"
+
+    def section(close):
+        return store.to_arrow(index_rows(["2022-06-01"], close), "index")
+
+    write_master([(2022, section(100))], "index_yearly", master_path, csv_path)
+
+    corrupt = tmp_path / "nifty50_index_2023.csv"
+    corrupt.write_text("not,a,yearly,file\n1,2,3,4\n")
+
+    with pytest.raises(Exception):
+        write_master(
+            [(2022, section(200)), (2023, corrupt)], "index_yearly", master_path, csv_path
+        )
+
+    assert [path.name for path in master_sections(master_path)] == ["2022-0.parquet"]
+    assert pd.read_parquet(master_path)["close"].tolist() == [100.0]
+    assert pd.read_csv(csv_path)["close"].tolist() == [100.0]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "master.csv", "master.parquet", "nifty50_index_2023.csv"
+    ]
+
+
+def test_replace_year_swaps_in_the_new_year(home, monkeypatch):
+    root = DATASETS["index"]["root"]
+    write_dataset("index", index_rows(["2022-06-01", "2023-06-01"], 100))
+
+    def failing(kind, values, df, root=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "write_partition", failing)
+
+    with pytest.raises(OSError):
+        store.replace_year("index", 2023, index_rows(["2023-06-02"], 200))
+
+    assert load_index()["close"].tolist() == [100.0, 100.0]
+
+    monkeypatch.undo()
+    store.replace_year("index", 2023, index_rows(["2023-06-02"], 200))
+
+    assert load_index()["close"].tolist() == [100.0, 200.0]
+    assert sorted(path.name for path in root.parent.iterdir()) == [root.name]
+
+    store.replace_year("index", 2023, None)
+    assert [path.parent.name for path in partition_files("index")] == ["year=2022"]
@@ -0,0 +1,31 @@
+import pandas as pd
+from scripts import store, universe
+from scripts.universe import UNIVERSES
+
+
+def test_incremental_matches_full_build(stores):
+    """
+    Universes cut back to November and brought up to date again
+    equal their full build, constituents spells included.
+    """
+    universe.CONSTITUENTS_DIR.mkdir(parents=True, exist_ok=True)
+    universe.constituents_path("nifty50").write_text(
+        "symbol,start_date,end_date\n"
+        "SYM0001,2024-01-01,\n"
+        "sym0002 ,2024-01-01,2024-11-20\n"
+        "SYM0003,2024-12-02,\n"
+    )
+
+    universe.build(full=True)
+    full = {name: store.load_universe(name) for name in UNIVERSES}
+    assert full["nifty50"].num_rows
+
+    cut = pd.Timestamp("2024-11-15")
+    for name in UNIVERSES:
+        store.write_universe(name, store.load_universe(name, end=cut), universe.spec(name))
+
+    written = universe.build()
+
+    for name, table in full.items():
+        assert written[name] == table.num_rows - store.load_universe(name, end=cut).num_rows
+        assert store.load_universe(name).equals(table), name
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scripts import validate_pipeline
+from scripts.store import write_dataset
+
+
+def equity_rows(symbol, dates, closes):
+    close = np.asarray(closes, dtype=float)
+    return pd.DataFrame({
+        "symbol": symbol,
+        "trade_date": pd.to_datetime(dates),
+        "open": close,
+        "high": close,
+        "low": close,
+        "close": close,
+        "prevclose": close,
+        "tottrdqty": 100,
+        "tottrdval": 100 * close,
+        "totaltrades": 10,
+    })
+
+
+def with_values(df, rows, **values):
+    df = df.copy()
+    for column, value in values.items():
+        df.loc[rows, column] = value
+    return df
+
+
+def rule_counts(kind, df):
+    arrays = validate_pipeline.table_arrays(kind, validate_pipeline.to_arrow(df, kind))
+    results = validate_pipeline.validate_arrays(kind, arrays)["rules"]
+    return {rule: result["count"] for rule, result in results.items()}
+
+
+# Rule -> frame with one offending row. Closes rise by 1 per day and
+# prevclose equals close, so the clean frame breaks no rule.
+OFFENCES = {
+    "duplicate_keys": lambda df: pd.concat([df, df.iloc[[3]]], ignore_index=True),
+    "null_values": lambda df: with_values(df, 4, close=np.nan),
+    "ohlc_inconsistent": lambda df: with_values(df, 2, high=df.loc[2, "close"] - 1),
+    "negative_volume": lambda df: with_values(df, 9, tottrdqty=-1),
+    "close_jump": lambda df: with_values(df, 6, prevclose=df.loc[6, "close"] / 1.5),
+    "stale_price": lambda df: with_values(
+        df, slice(1, 5), **dict.fromkeys(["open", "high", "low", "close", "prevclose"], 60.0)
+    ),
+}
+
+
+@pytest.mark.parametrize("rule", [None, *OFFENCES])
+def test_each_rule_flags_its_row(rule):
+    days = pd.bdate_range("2024-03-04", periods=8)
+    df = pd.concat([
+        equity_rows("A", days, np.arange(8) + 50),
+        equity_rows("B", days, np.arange(8) + 80),
+    ], ignore_index=True)
+
+    if rule is not None:
+        df = OFFENCES[rule](df)
+
+    assert rule_counts("equity", df) == {
+        name: int(name == rule) for name in validate_pipeline.RULES
+    }
+
+
+def test_index_rules_derive_prevclose_from_points_change():
+    close = np.array([100.0, 101.0, 102.0, 140.0, 141.0])
+    df = pd.DataFrame({
+        "trade_date": pd.bdate_range("2024-03-04", periods=5),
+        "index_name": "Nifty 50",
+        "open_index_value": close,
+        "high_index_value": close,
+        "low_index_value": close,
+        "closing_index_value": close,
+        "points_change": np.diff(close, prepend=99.0),
+        "volume": 1000,
+        "turnover_(rs._cr.)": 10.0,
+    })
+
+    assert rule_counts("index", df) == {
+        name: int(name == "close_jump") for name in validate_pipeline.RULES
+    }
+
+    counts = rule_counts("index", pd.concat([df, df.iloc[[2]]], ignore_index=True))
+    assert counts["duplicate_keys"] == 1
+
+
+def test_stale_price_runs_across_partitions(home):
+    """
+    Three identical closes at the end of March and three at the start
+    of April are one run of six: its 5th and 6th rows (in the April
+    partition) are stale.
+    """
+    days = pd.bdate_range("2023-03-27", "2023-04-05")
+    closes = [100, 101, 105, 105, 105, 105, 105, 105]
+    assert len(days) == len(closes)
+
+    df = pd.concat([
+        equity_rows("STALE", days, closes),
+        equity_rows("MOVES", days, np.arange(len(days)) + 50),
+    ], ignore_index=True)
+
+    write_dataset("equity", df)
+
+    state, validated = validate_pipeline.validate_dataset("equity", {})
+    assert validated == 2
+
+    stale = {name: entry["rules"]["stale_price"] for name, entry in state.items()}
+    assert stale["year=2023/month=3"]["count"] == 0
+    assert stale["year=2023/month=4"]["count"] == 2
+    assert {key["symbol"] for key in stale["year=2023/month=4"]["offending_keys"]} == {"STALE"}
+
+    # The same run counted in one pass over the whole table
+    arrays = validate_pipeline.table_arrays("equity", validate_pipeline.to_arrow(df, "equity"))
+    whole = validate_pipeline.validate_arrays("equity", arrays)
+    assert whole["rules"]["stale_price"]["count"] == 2
+
+    # Rows of the previous partition are context only
+    assert sum(entry["rows"] for entry in state.values()) == len(df)
+    assert state["year=2023/month=4"]["dates"] == [str(day.date()) for day in days if day.month == 4]
+
+    # Unchanged partitions are reused. A rewritten one revalidates the
+    # next only when the runs it carries into it change.
+    _, validated = validate_pipeline.validate_dataset("equity", state)
+    assert validated == 0
+
+    march = df[df["trade_date"].dt.month == 3]
+    write_dataset("equity", march, overwrite=False)
+    state, validated = validate_pipeline.validate_dataset("equity", state)
+    assert validated == 1
+
+    last = march.index[march["symbol"] == "STALE"][-1]
+    prices = ["open", "high", "low", "close", "prevclose"]
+    write_dataset("equity", with_values(march, last, **dict.fromkeys(prices, 104.0)), overwrite=False)
+    state, validated = validate_pipeline.validate_dataset("equity", state)
+    assert validated == 2
+    assert state["year=2023/month=4"]["rules"]["stale_price"]["count"] == 0
+
+
+def test_stale_price_runs_across_a_short_partition(home):
+    """
+    A run of seven identical closes over March (two rows), April (two
+    rows, fewer than the run rule looks back) and May (three rows):
+    its 5th to 7th rows, all in May, are stale.
+    """
+    days = pd.to_datetime([
+        "2023-03-30", "2023-03-31", "2023-04-27", "2023-04-28",
+        "2023-05-02", "2023-05-03", "2023-05-04",
+    ])
+    df = pd.concat([
+        equity_rows("STALE", days, [105] * 7),
+        equity_rows("MOVES", days, np.arange(7) + 50),
+        # Trades only in March: its run is carried through April and May
+        equity_rows("GONE", days[:2], [70, 70]),
+    ], ignore_index=True)
+
+    write_dataset("equity", df)
+
+    state, validated = validate_pipeline.validate_dataset("equity", {})
+    assert validated == 3
+
+    stale = {name: entry["rules"]["stale_price"]["count"] for name, entry in state.items()}
+    assert stale == {"year=2023/month=3": 0, "year=2023/month=4": 0, "year=2023/month=5": 3}
+
+    arrays = validate_pipeline.table_arrays("equity", validate_pipeline.to_arrow(df, "equity"))
+    assert validate_pipeline.validate_arrays("equity", arrays)["rules"]["stale_price"]["count"] == 3
+
+    carried = state["year=2023/month=5"]["carry"]
+    assert dict(zip(carried["labels"], carried["runs"])) == {"GONE": 2, "MOVES": 1, "STALE": 4}